@@ -1,8 +1,23 @@
-import json, time, math, io
+import time, io, uuid, json, dataclasses
+from typing import List, Dict, Set, Optional, Callable
 import pandas as pd
-import requests
 import streamlit as st
-from typing import List, Dict, Set
+
+from buho.catalog import CatalogCache, ListDirectory, CATALOG_PATH
+from buho.pagination import iter_pages, BackgroundPages, LoaderRegistry
+from buho.http import ZohoHttp
+from buho.ingest import content_hash, compact_frame, iter_slices
+from buho.csvcache import CsvCache, ParsedCsv, parse_full, parse_streaming
+from buho.jobs import JobRunner, IMPORT_JOBS
+from buho.journal import ImportJournal, STAGE_BULK, STAGE_ENRICH
+from buho.emails import PreflightStats, preflight_frames
+from buho.fingerprints import FingerprintStore
+from buho.deadletter import DeadLetterStore
+from buho.engine import rate_eta_text, ENRICH_BATCH
+from buho.pipeline import ImportSpec, run_import, run_retry, preflight_text, delta_rows
+from buho.fanout import FanoutTarget, run_fanout, connection_pool_size, FANOUT_LISTS
+from buho.planner import Workload, STRATEGY_LABELS, STRATEGY_BULK, workload_from_rows, observed_latency, plan_import, duration_text
+from buho.zoho import ZohoClient, LISTS_PAGE_SIZE, TEMPLATES_PAGE_SIZE, BATCH_UPSERT_ENABLED
 
 # =========================
 # CONFIG FIJA (sin sidebar)
@@ -15,163 +30,67 @@ DC            = "com"  # MX -> "com"
 # Si ya conoces una lista fija, colócala aquí (si está vacío se mostrará selector)
 FIXED_LIST_KEY = ""
 
-# Rendimiento / rate-limit
-BATCH_SIZE    = 10         # Zoho permite 1..10
-SLEEP_BULK    = 0.2        # segundos entre lotes
-SLEEP_SINGLE  = 0.05       # segundos por upsert
-RETRY_429_MAX = 5          # reintentos exponenciales
-
-ACCOUNTS = f"https://accounts.zoho.{DC}"
-BASE     = f"https://campaigns.zoho.{DC}/api/v1.1"
+# Rendimiento (tasas y workers de carga: ver buho/engine.py)
+STREAM_THRESHOLD_MB = 200  # CSVs más grandes se leen por chunks (modo streaming); el límite de subida está en .streamlit/config.toml
+CSV_CACHE_MB  = 2048       # memoria para CSV ya parseados (LRU compartido entre reruns)
+FANOUT_MAX_VALUES = 50     # valores de la columna de partición que se ofrecen para repartir
+# Conexiones keep-alive por host: el JobRunner corre hasta IMPORT_JOBS cargas sobre el mismo ZohoHttp,
+# cada una quizá un fan-out con todos sus workers en vuelo
+HTTP_POOL_SIZE = IMPORT_JOBS * connection_pool_size(FANOUT_LISTS)
+HTTP_RETRIES  = 3          # reintentos de transporte (conexión, 502/503/504)
+CATALOG_TTL   = 600        # segundos que se reutilizan campos y listas de Zoho
+CATALOG_PERSIST = True     # guardar también en disco (sobrevive reinicios)
 
 # =========================
-# Funciones de API
+# Cliente de API (uno por proceso)
 # =========================
-def get_access_token() -> str:
-    r = requests.post(
-        f"{ACCOUNTS}/oauth/v2/token",
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        data={
-            "refresh_token": REFRESH_TOKEN,
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
-            "grant_type": "refresh_token",
-        },
-        timeout=30,
-    )
-    r.raise_for_status()
-    data = r.json()
-    tok = data.get("access_token")
-    if not tok:
-        raise RuntimeError(f"No access_token: {data}")
-    return tok
-
-def get_all_fields(access_token: str) -> Set[str]:
-    r = requests.get(
-        f"{BASE}/contact/allfields?type=json",
-        headers={"Authorization": f"Zoho-oauthtoken {access_token}"},
-        timeout=30,
+@st.cache_resource
+def zoho_client() -> ZohoClient:
+    # Pool de conexiones, token y catálogo compartidos por sesiones y workers
+    return ZohoClient(
+        CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN, dc=DC,
+        http=ZohoHttp(pool_maxsize=HTTP_POOL_SIZE, retries=HTTP_RETRIES),
+        catalog=CatalogCache(ttl=CATALOG_TTL, path=CATALOG_PATH if CATALOG_PERSIST else None),
     )
-    if r.status_code == 401:
-        return {"Contact Email", "First Name", "Last Name", "Full Name", "Title", "Job Title"}
-    r.raise_for_status()
-    data = r.json()
-    names = set()
-    for f in data.get("response", {}).get("fieldnames", {}).get("fieldname", []):
-        dn = f.get("DISPLAY_NAME")
-        if dn:
-            names.add(dn)
-    if not names:
-        names = {"Contact Email", "First Name", "Last Name", "Full Name"}
-    return names
-
-def get_mailing_lists(access_token: str, start: int = 1, range_: int = 200) -> List[Dict]:
-    url = f"{BASE}/getmailinglists?resfmt=JSON&fromindex={start}&range={range_}&sort=asc"
-    r = requests.get(url, headers={"Authorization": f"Zoho-oauthtoken {access_token}"}, timeout=30)
-    r.raise_for_status()
-    data = r.json()
-    items = data.get("list_of_details", [])
-    return [{"listname": it.get("listname"), "listkey": it.get("listkey"), "is_public": it.get("is_public")} for it in items]
-
-def create_list_and_contacts(access_token: str, listname: str, description: str, emails_first_batch: List[str], signupform: str = "private") -> str:
-    headers = {"Authorization": f"Zoho-oauthtoken {access_token}", "Content-Type": "application/x-www-form-urlencoded"}
-    params = {
-        "resfmt": "JSON",
-        "listname": listname,
-        "signupform": signupform,   # "private" recomendado (evita confirmaciones)
-        "mode": "newlist",
-        "listdescription": description or "",
-        "emailids": ",".join(emails_first_batch) if emails_first_batch else "",
-    }
-    r = requests.post(f"{BASE}/addlistandcontacts", headers=headers, data=params, timeout=60)
-    if r.status_code == 400:
-        st.error(f"❌ Error al crear lista: {r.text}")
-    r.raise_for_status()
-    data = r.json()
-
-    if data.get("status") == "success" and data.get("listkey"):
-        return data["listkey"]
-
-    if data.get("code") in ("2205", 2205):
-        lists = get_mailing_lists(access_token)
-        for it in lists:
-            if (it.get("listname") or "").strip().lower() == listname.strip().lower():
-                return it["listkey"]
-
-    raise RuntimeError(f"No se pudo obtener listkey. Respuesta: {data}")
-
-def bulk_add_emails(access_token: str, listkey: str, emails: List[str]) -> Dict:
-    assert 1 <= len(emails) <= 10
-    headers = {"Authorization": f"Zoho-oauthtoken {access_token}", "Content-Type": "application/x-www-form-urlencoded"}
-    payload = {"listkey": listkey, "resfmt": "JSON", "emailids": json.dumps(emails)}
-    retries = 0
-    while True:
-        r = requests.post(f"{BASE}/addlistsubscribersinbulk", headers=headers, data=payload, timeout=60)
-        if r.status_code == 429 and retries < RETRY_429_MAX:
-            wait = 2 ** retries
-            st.warning(f"[429] Rate limit. Reintentando en {wait}s…")
-            time.sleep(wait); retries += 1
-            continue
-        if r.status_code == 401:
-            raise RuntimeError("401 en bulk; renueva token y reintenta.")
-        r.raise_for_status()
-        return r.json()
-
-def upsert_contact_fields(access_token: str, listkey: str, contactinfo: Dict) -> Dict:
-    headers = {"Authorization": f"Zoho-oauthtoken {access_token}", "Content-Type": "application/x-www-form-urlencoded"}
-    payload = {"listkey": listkey, "resfmt": "JSON", "contactinfo": json.dumps(contactinfo, ensure_ascii=False)}
-    r = requests.post(f"{BASE}/json/listsubscribe", headers=headers, data=payload, timeout=60)
-    r.raise_for_status()
-    return r.json()
 
-# =========================
-# Helpers Email API (Templates v2)
-# =========================
-EMAILAPI_BASE = f"https://campaigns.zoho.{DC}/emailapi/v2"
+ZOHO = zoho_client()
+
+@st.cache_resource
+def csv_cache() -> CsvCache:
+    return CsvCache(max_bytes=CSV_CACHE_MB * 2**20)
 
-def _auth_headers(access_token: str):
-    return {
-        "Authorization": f"Zoho-oauthtoken {access_token}",
-        "Accept": "application/json",
-    }
+def parsed_csv(uploaded, streaming: bool) -> ParsedCsv:
+    # El hash del contenido se calcula una vez por archivo subido; con él, el
+    # mismo CSV (aunque se vuelva a subir) no se reparsea en cada rerun
+    hkey = f"csv_hash_{uploaded.file_id}"
+    if hkey not in st.session_state:
+        st.session_state[hkey] = content_hash(uploaded)
+    parse = parse_streaming if streaming else parse_full
+    return csv_cache().get_or_parse((st.session_state[hkey], streaming), lambda: parse(uploaded))
 
-def list_templates(access_token: str, start_index: int = 1, end_index: int = 200):
+@st.cache_resource
+def page_loaders() -> LoaderRegistry:
+    return LoaderRegistry()
+
+def stream_catalog(key: str, fetch_page: Callable[[int, int], List], page_size: int, wrap: Optional[Callable] = None) -> BackgroundPages:
     """
-    Devuelve [{'template_id','template_name', ...}] o lanza Exception con detalle
-    si la respuesta no es JSON (p.ej. HTML por 401/403/404).
+    Como get_* pero sin bloquear: si no está en caché, arranca (o reutiliza)
+    una carga de fondo cuyas páginas se pueden ir mostrando; al terminar queda
+    cacheada bajo `key`.
     """
-    url = f"{EMAILAPI_BASE}/templates?start_index={start_index}&end_index={end_index}"
-    r = requests.get(url, headers=_auth_headers(access_token), timeout=30)
-
-    # Guarda datos útiles para depurar
-    status = r.status_code
-    ctype = r.headers.get("Content-Type", "")
+    cached = ZOHO.catalog.peek(key, wrap)
+    if cached is not None:
+        return BackgroundPages.finished(cached)
+    return page_loaders().get(key, lambda: BackgroundPages(
+        iter_pages(fetch_page, page_size),
+        on_done=lambda items: ZOHO.catalog.put(key, items, wrap),
+    ))
 
-    if not r.ok:
-        # Levanta error pero con cuerpo adjunto
-        raise RuntimeError(f"HTTP {status} {url}\nContent-Type: {ctype}\nBody:\n{r.text[:800]}")
+def stream_mailing_lists() -> BackgroundPages:
+    return stream_catalog("lists:all", ZOHO.fetch_mailing_lists_page, LISTS_PAGE_SIZE, wrap=ListDirectory)
 
-    # Intenta parsear JSON; si no, muestra "body" crudo
-    try:
-        data = r.json()
-    except ValueError:
-        raise RuntimeError(f"Respuesta no-JSON (HTTP {status}, {ctype}). Body (primeros 800 chars):\n{r.text[:800]}")
-
-    templates = data.get("templates", [])
-    return templates or []
-
-def get_template_html(access_token: str, template_id: str) -> str:
-    url = f"{EMAILAPI_BASE}/templates/{template_id}"
-    r = requests.get(url, headers=_auth_headers(access_token), timeout=30)
-    status = r.status_code
-    ctype = r.headers.get("Content-Type", "")
-    if not r.ok:
-        raise RuntimeError(f"HTTP {status} {url}\nContent-Type: {ctype}\nBody:\n{r.text[:800]}")
-    try:
-        info = r.json()
-    except ValueError:
-        raise RuntimeError(f"Respuesta no-JSON (HTTP {status}, {ctype}). Body:\n{r.text[:800]}")
-    return info.get("content") if info.get("content_type") == "html" else ""
+def stream_templates() -> BackgroundPages:
+    return stream_catalog("templates:all", ZOHO.fetch_templates_page, TEMPLATES_PAGE_SIZE)
 
 
 # =========================
@@ -184,6 +103,29 @@ with st.expander("¿Cómo evitar confirmaciones?"):
     st.markdown("- Crea la lista como **PRIVATE** (esta app lo hace por defecto al crearla).")
     st.markdown("- Si cargas en listas **públicas**, Zoho puede enviar confirmaciones según su configuración.")
 
+@st.cache_resource
+def get_journal() -> ImportJournal:
+    # Una sola bitácora por proceso, compartida por todas las sesiones
+    return ImportJournal()
+
+@st.cache_resource
+def get_fingerprints() -> FingerprintStore:
+    return FingerprintStore()
+
+@st.cache_resource
+def get_deadletters() -> DeadLetterStore:
+    return DeadLetterStore()
+
+@st.cache_resource
+def job_runner() -> JobRunner:
+    # Las cargas viven en el proceso, no en la sesión: un rerun no las interrumpe
+    return JobRunner()
+
+def session_id() -> str:
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    return st.session_state["session_id"]
+
 # Estado para campos extra — ahora arranca VACÍO
 if "extra_maps" not in st.session_state:
     st.session_state["extra_maps"] = []  # sin filas al inicio
@@ -194,15 +136,24 @@ if "mapeo_ok" not in st.session_state:
 st.header("① Cargar CSV")
 uploaded = st.file_uploader("Sube tu CSV de contactos", type=["csv"])
 df = None
+streaming = False      # True: `df` es solo una muestra y el CSV se recorre por chunks
+csv_encoding = None
+total_rows_est = 0
 if uploaded:
     try:
-        raw = uploaded.read()
-        try:
-            df = pd.read_csv(io.BytesIO(raw))
-        except Exception:
-            df = pd.read_csv(io.BytesIO(raw), encoding="latin-1")
-        df = df.fillna("")
-        st.success(f"CSV: {uploaded.name} — {len(df)} filas")
+        streaming = st.checkbox(
+            "Modo streaming (leer el CSV por partes, para archivos muy grandes)",
+            # Por debajo del límite de subida aunque se configure uno menor
+            value=uploaded.size > min(STREAM_THRESHOLD_MB, st.get_option("server.maxUploadSize") // 2) * 2**20,
+        )
+        parsed = parsed_csv(uploaded, streaming)
+        df, csv_encoding, total_rows_est = parsed.df, parsed.encoding, parsed.total_rows
+        if streaming:
+            st.success(f"CSV: {uploaded.name} — ~{total_rows_est} filas (streaming, {csv_encoding}; vista previa de {len(df)})")
+        else:
+            st.success(f"CSV: {uploaded.name} — {len(df)} filas")
+            if parsed.nbytes > csv_cache().max_bytes:
+                st.caption(f"El CSV ocupa más que la caché ({CSV_CACHE_MB} MB): se vuelve a leer en cada interacción. Conviene el modo streaming.")
         st.dataframe(df.head(20), width='stretch')
     except Exception as e:
         st.error(f"No se pudo leer el CSV: {e}")
@@ -211,8 +162,7 @@ if uploaded:
 valid_display_names: Set[str] = set()
 if df is not None and len(df) > 0:
     try:
-        access_preview = get_access_token()
-        valid_display_names = get_all_fields(access_preview)
+        valid_display_names = ZOHO.get_all_fields()
     except Exception as e:
         st.warning(f"No se pudieron leer campos de Zoho (se usará catálogo mínimo): {e}")
         valid_display_names = {"Contact Email", "First Name", "Last Name", "Full Name"}
@@ -221,12 +171,10 @@ if df is not None and len(df) > 0:
 if df is not None and len(df) > 0:
     st.header("② Mapear columnas")
 
-    cols_lc = {c.strip().lower(): c for c in df.columns}
-    # Heurística simple (detector aproximado por alias comunes)
-    detected_email = cols_lc.get("work email (enterprise)") or cols_lc.get("email") or cols_lc.get("work email")
-    detected_fn    = cols_lc.get("first name") or cols_lc.get("nombre") or cols_lc.get("name")
-    detected_ln    = cols_lc.get("last name")  or cols_lc.get("apellido") or cols_lc.get("surname")
-    detected_full  = cols_lc.get("full name")  or cols_lc.get("nombre completo")
+    # Columnas y detección por alias comunes, memorizadas con el CSV parseado
+    csv_cols = parsed.columns
+    detected = parsed.detected
+    csv_opts = ["(ninguna)"] + csv_cols
 
     with st.form("form_mapeo"):
         st.subheader("2.1 Selección de columnas fijas")
@@ -235,24 +183,24 @@ if df is not None and len(df) > 0:
         with c1:
             col_email = st.selectbox(
                 "Columna EMAIL (obligatoria)",
-                df.columns.tolist(),
-                index=(df.columns.get_loc(detected_email) if detected_email in df.columns else 0),
+                csv_cols,
+                index=(csv_cols.index(detected["email"]) if detected["email"] else 0),
             )
             col_last_name = st.selectbox(
                 "Last Name (opcional)",
-                ["(ninguna)"] + df.columns.tolist(),
-                index=(0 if not detected_ln else df.columns.get_loc(detected_ln)+1),
+                csv_opts,
+                index=csv_opts.index(detected["last"]) if detected["last"] else 0,
             )
         with c2:
             col_first_name = st.selectbox(
                 "First Name (opcional)",
-                ["(ninguna)"] + df.columns.tolist(),
-                index=(0 if not detected_fn else df.columns.get_loc(detected_fn)+1),
+                csv_opts,
+                index=csv_opts.index(detected["first"]) if detected["first"] else 0,
             )
             col_full_name = st.selectbox(
                 "Full Name (opcional)",
-                ["(ninguna)"] + df.columns.tolist(),
-                index=(0 if not detected_full else df.columns.get_loc(detected_full)+1),
+                csv_opts,
+                index=csv_opts.index(detected["full"]) if detected["full"] else 0,
             )
 
         st.markdown("---")
@@ -285,7 +233,6 @@ if df is not None and len(df) > 0:
                 key=f"extra_zoho_sel_{i}",
             )
             # Columna CSV
-            csv_cols = df.columns.tolist()
             idx_csv = csv_cols.index(row["csv"]) if row.get("csv") in csv_cols else 0
             sel_csv = ccol.selectbox(
                 f"Columna CSV #{i+1}",
@@ -331,8 +278,8 @@ if df is not None and len(df) > 0 and st.session_state.get("mapeo_ok"):
 
     # Conectar a Zoho "real"
     try:
-        access = get_access_token()
-        valid_display_names = get_all_fields(access)
+        ZOHO.get_access_token()   # valida credenciales (token cacheado)
+        valid_display_names = ZOHO.get_all_fields()
     except Exception as e:
         st.error(f"Error autenticando con Zoho: {e}")
         st.stop()
@@ -344,60 +291,113 @@ if df is not None and len(df) > 0 and st.session_state.get("mapeo_ok"):
     m_full  = st.session_state.get("map_col_full")
     extra_maps: List[Dict[str, str]] = st.session_state.get("extra_maps", [])
 
-    def enrich_all(listkey: str):
-        st.subheader("Enriqueciendo campos por contacto…")
-        updated, errors = 0, 0
-        has_full_name = "Full Name" in valid_display_names if valid_display_names else False
-        prog2 = st.progress(0.0, text="Enriqueciendo…")
-        total_rows = len(df)
-        for idx, row in df.iterrows():
-            email = str(row.get(m_email, "")).strip()
-            if not email or "@" not in email:
-                prog2.progress((idx+1)/total_rows, text="Enriqueciendo…")
-                continue
-
-            ci = {"Contact Email": email}
-
-            if m_first:
-                v = str(row.get(m_first, "")).strip()
-                if v: ci["First Name"] = v
-            if m_last:
-                v = str(row.get(m_last, "")).strip()
-                if v: ci["Last Name"] = v
-            if m_full and has_full_name:
-                v = str(row.get(m_full, "")).strip()
-                if v: ci["Full Name"] = v
-
-            # Campos extra
-            for m in extra_maps:
-                zf, cf = m["zoho"], m["csv"]
-                if zf == "Contact Email":
-                    continue
-                val = str(row.get(cf, "")).strip()
-                if val:
-                    ci[zf] = val
-
-            try:
-                upsert_contact_fields(access, listkey, ci)
-                updated += 1
-            except requests.HTTPError as e:
-                if e.response is not None and e.response.status_code == 401:
-                    new_access = get_access_token()
-                    upsert_contact_fields(new_access, listkey, ci)
-                    updated += 1
-                else:
-                    errors += 1
-            time.sleep(SLEEP_SINGLE)
-            prog2.progress((idx+1)/total_rows, text="Enriqueciendo…")
-
-        # ahora devolvemos los números para que el caller arme el mensaje final
-        return updated, errors
-
+    has_full_name = "Full Name" in valid_display_names if valid_display_names else False
+
+    def import_spec(**target) -> ImportSpec:
+        return ImportSpec(
+            csv_name=uploaded.name,
+            # Solo streaming relee el archivo; el modo normal usa el df cacheado
+            source=io.BytesIO(uploaded.getvalue()) if streaming else None,
+            csv_hash=st.session_state[f"csv_hash_{uploaded.file_id}"],
+            df=None if streaming else df,
+            encoding=csv_encoding,
+            total_rows=total_rows_est if streaming else len(df),
+            total_emails=count_valid_emails(),
+            m_email=m_email, m_first=m_first, m_last=m_last, m_full=m_full,
+            extra_maps=list(extra_maps), has_full_name=has_full_name,
+            resume=resume, delta=delta, enrich_batch=ENRICH_BATCH if batch_enrich else 0, **target,
+        )
+
+    def preflight_summary() -> Optional[PreflightStats]:
+        # Sin streaming se calcula una vez por archivo y columna de email
+        if streaming:
+            return None
+        key = f"preflight_{uploaded.file_id}_{m_email}"
+        if key not in st.session_state:
+            stats = PreflightStats()
+            for _ in preflight_frames(iter_slices(compact_frame(df, [m_email])), m_email, stats):
+                pass
+            st.session_state[key] = stats
+        return st.session_state[key]
+
+    def count_valid_emails() -> int:
+        # En streaming no se recorre el archivo solo para contar: se estima
+        if streaming:
+            return total_rows_est
+        return preflight_summary().kept
+
+    def launch(spec: ImportSpec, title: str, targets: Optional[List[FanoutTarget]] = None, partition_col: Optional[str] = None):
+        # La carga corre en el JobRunner del proceso: sobrevive a reruns y a
+        # recargas del navegador, y su avance se ve en "Cargas en curso"
+        stores = (get_journal(), get_fingerprints(), get_deadletters())
+        if targets:
+            status = job_runner().submit(title, run_fanout, ZOHO, spec, targets, *stores, partition_col, owner=session_id())
+        else:
+            status = job_runner().submit(title, run_import, ZOHO, spec, *stores, owner=session_id())
+        st.session_state.setdefault("my_jobs", []).append(status.id)
+        st.success(f"Carga encolada ({status.id}). Sigue su avance abajo; puedes seguir usando la app.")
+
+    def workload(listkey: Optional[str]) -> Workload:
+        # Una pasada de payloads + delta por archivo, mapeo, lista y modo; en
+        # streaming se cuenta la vista previa y se extrapola al total estimado
+        key = "workload_" + json.dumps([
+            st.session_state[f"csv_hash_{uploaded.file_id}"], m_email, m_first, m_last, m_full, extra_maps,
+            has_full_name, listkey, delta, len(st.session_state.get("my_jobs", [])),
+        ])
+        if key not in st.session_state:
+            spec = import_spec(listkey=listkey)
+            with st.spinner("Planificando la carga…"):
+                w = workload_from_rows(delta_rows(dataclasses.replace(spec, df=df), get_fingerprints(), listkey))
+            if streaming:
+                w = w.scaled(total_rows_est / max(len(df), 1))
+            st.session_state[key] = w
+        return st.session_state[key]
+
+    def plan_panel(listkey: Optional[str]) -> Dict:
+        """Muestra la estrategia recomendada y deja elegir otra; devuelve los kwargs de ImportSpec."""
+        w = workload(listkey)
+        plan = plan_import(w, ENRICH_BATCH if batch_enrich else 0, observed_latency(ZOHO.http.endpoint_stats()))
+        by_strategy = {p.strategy: p for p in plan.alternatives}
+        options = [plan.strategy] + [s for s in by_strategy if s != plan.strategy]
+        chosen = by_strategy[st.selectbox(
+            "Estrategia de carga", options, format_func=lambda s: STRATEGY_LABELS[s] + (" (recomendada)" if s == plan.strategy else ""),
+            help="Crear la suscripción por upsert ya la incluye: el bulk previo solo conviene para contactos sin campos.",
+        )]
+        approx = "~" if w.estimated else ""
+        st.caption(
+            f"{approx}{w.contacts} contactos a enviar ({approx}{w.email_only} sin campos, {approx}{w.same} sin cambios) · "
+            f"{chosen.bulk_requests} lotes + {chosen.upsert_requests} upserts = {chosen.requests} peticiones · "
+            f"~{duration_text(chosen.seconds)}"
+        )
+        if chosen.strategy == STRATEGY_BULK and w.email_only < w.contacts:
+            st.warning("Con solo bulk no se cargan los campos de los contactos que los traen.")
+        with st.expander("Comparar estrategias"):
+            st.dataframe(pd.DataFrame([
+                {"Estrategia": p.label, "Lotes": p.bulk_requests, "Upserts": p.upsert_requests,
+                 "Peticiones": p.requests, "Duración": duration_text(p.seconds)}
+                for p in plan.alternatives
+            ]), hide_index=True, width='stretch')
+        return {"strategy": chosen.strategy, "workload": w}
+
+    if not streaming:
+        st.caption(preflight_text(preflight_summary()))
+    resume = st.checkbox("Reanudar cargas interrumpidas (saltar lo ya confirmado por Zoho)", value=True)
+    delta = st.checkbox(
+        "Sincronización incremental (enviar solo contactos nuevos o con cambios)", value=True,
+        help="Compara cada fila con lo que esta app ya cargó a la lista. Desmárcalo para forzar una carga completa.",
+    )
+    # Import multi-contacto sin verificar contra la API real: solo con BUHO_BATCH_UPSERT=1
+    batch_enrich = BATCH_UPSERT_ENABLED and st.checkbox(
+        f"Enriquecer en bloque ({ENRICH_BATCH} contactos por petición, experimental)", value=False,
+        help="Agrupa contactos con los mismos campos en un import multi-contacto. Las filas que Zoho rechace, "
+             "o toda la carga si la cuenta no acepta el import, se envían una por una.",
+    )
 
     # Elección de modo
-    mode = st.radio("¿Qué deseas hacer?", ["Crear lista nueva", "Usar una existente"], horizontal=True)
+    mode = st.radio("¿Qué deseas hacer?", ["Crear lista nueva", "Usar una existente", "Repartir en varias listas"], horizontal=True)
 
     if mode == "Crear lista nueva":
+        planned = plan_panel(None)
         with st.form("form_crear_lista"):
             listname = st.text_input("Nombre de la nueva lista", value="")
             description = st.text_area("Descripción (opcional)", value="")
@@ -408,52 +408,70 @@ if df is not None and len(df) > 0 and st.session_state.get("mapeo_ok"):
             if not listname.strip():
                 st.error("Debes indicar un nombre de lista.")
                 st.stop()
-
-            emails_all = df[m_email].astype(str).str.strip()
-            emails_valid = emails_all[emails_all.str.contains("@")].tolist()
-            first_batch = emails_valid[:min(len(emails_valid), 10)]
-            signupform = "private" if private else "public"
-
-            try:
-                with st.spinner("Creando lista en Zoho…"):
-                    lk = create_list_and_contacts(access, listname.strip(), description.strip(), first_batch, signupform=signupform)
-                st.success(f"Lista creada/obtenida ✅")
-
-
-                remaining_emails = emails_valid[len(first_batch):]
-                total_batches = math.ceil(len(remaining_emails) / BATCH_SIZE) if remaining_emails else 0
-                if total_batches > 0:
-                    prog = st.progress(0.0, text="Cargando emails en lotes…")
-                    for i in range(total_batches):
-                        batch = remaining_emails[i*BATCH_SIZE:(i+1)*BATCH_SIZE]
-                        if not batch: break
-                        try:
-                            resp = bulk_add_emails(access, lk, batch)
-                            st.write(f"Lote {i+1}/{total_batches} OK: {resp.get('message') or resp.get('status') or resp}")
-                        except RuntimeError as e:
-                            if "401 en bulk" in str(e):
-                                st.info("401 en bulk: renovando token…")
-                                access = get_access_token()
-                                resp = bulk_add_emails(access, lk, batch)
-                                st.write(f"Lote {i+1}/{total_batches} OK tras renovar: {resp.get('message') or resp}")
-                            else:
-                                st.warning(f"Lote {i+1} FALLÓ: {e} — continúo…")
-                        except requests.HTTPError as e:
-                            st.warning(f"Lote {i+1} FALLÓ: {e} — continúo…")
-                        time.sleep(SLEEP_BULK)
-                        prog.progress((i+1)/total_batches, text="Cargando emails en lotes…")
+            new_list = {
+                "listname": listname.strip(),
+                "description": description.strip(),
+                "signupform": "private" if private else "public",
+            }
+            launch(import_spec(new_list=new_list, **planned), f"{uploaded.name} → nueva lista «{listname.strip()}»")
+
+    elif mode == "Repartir en varias listas":
+        st.caption(
+            f"Las listas se cargan a la vez ({FANOUT_LISTS} como máximo), cada una con la estrategia que el planificador "
+            "estime para sus filas; todas comparten el límite de peticiones de la cuenta."
+        )
+        try:
+            with st.spinner("Cargando listas…"):
+                directory = ZOHO.get_mailing_lists()
+        except Exception as e:
+            st.error(f"No se pudieron obtener listas: {e}")
+            st.stop()
+        name_to_key = {f"{it['listname']} (public={it.get('is_public')})": it["listkey"] for it in directory}
+        routing = st.radio("Filas de cada lista", ["Todas las filas a cada lista", "Según el valor de una columna"], horizontal=True)
+        targets: List[FanoutTarget] = []
+        partition_col = None
+        if routing == "Todas las filas a cada lista":
+            chosen = st.multiselect("Listas destino", list(name_to_key))
+            targets = [FanoutTarget(name, listkey=name_to_key[name]) for name in chosen]
+        else:
+            partition_col = st.selectbox("Columna de partición (región, segmento…)", csv_cols)
+            counts = df[partition_col].str.strip().value_counts()
+            if streaming:
+                st.caption("Valores tomados de la vista previa: las filas con otros valores no se cargan.")
+            if len(counts) > FANOUT_MAX_VALUES:
+                st.warning(f"La columna tiene {len(counts)} valores distintos; se muestran los {FANOUT_MAX_VALUES} más frecuentes.")
+                counts = counts.head(FANOUT_MAX_VALUES)
+            skip, new = "(no cargar)", "➕ Lista nueva"
+            routes = st.data_editor(
+                pd.DataFrame({"Valor": counts.index, "Filas": counts.values, "Lista": skip}),
+                column_config={
+                    "Valor": st.column_config.TextColumn(disabled=True),
+                    "Filas": st.column_config.NumberColumn(disabled=True),
+                    "Lista": st.column_config.SelectboxColumn(options=[skip, new] + list(name_to_key), required=True),
+                },
+                hide_index=True, width='stretch', key=f"fanout_routes_{partition_col}",
+            )
+            prefix = st.text_input("Prefijo del nombre de las listas nuevas", value=uploaded.name.rsplit(".", 1)[0] + " - ")
+            private = st.checkbox("Crear las listas nuevas como PRIVATE (evita confirmaciones)", value=True)
+            # Varios valores pueden ir a la misma lista: una parte por destino
+            groups: Dict[tuple, List[str]] = {}
+            for value, dest in zip(routes["Valor"], routes["Lista"]):
+                if dest == new:
+                    groups.setdefault((new, f"{prefix}{value}".strip()), []).append(value)
+                elif dest != skip:
+                    groups.setdefault((dest, dest), []).append(value)
+            for (dest, name), values in groups.items():
+                if dest == new:
+                    new_list = {
+                        "listname": name,
+                        "description": f"{partition_col}: {', '.join(values)}",
+                        "signupform": "private" if private else "public",
+                    }
+                    targets.append(FanoutTarget(f"nueva «{name}»", new_list=new_list, values=values))
                 else:
-                    st.info("No hay correos restantes para cargar en bulk.")
-
-                updated, errors = enrich_all(lk)
-
-                st.success("Contactos cargados exitosamente.")
-                st.write(f"Contactos cargados = {updated}")
-                st.write(f"Errores = {errors}")
-
-
-            except Exception as e:
-                st.error(f"Error en creación/carga: {e}")
+                    targets.append(FanoutTarget(f"{name} ← {', '.join(values)}", listkey=name_to_key[name], values=values))
+        if st.button(f"Cargar contactos a {len(targets)} listas", type="primary", disabled=not targets):
+            launch(import_spec(), f"{uploaded.name} → {len(targets)} listas", targets, partition_col)
 
     else:
         lk_selected = None
@@ -461,88 +479,243 @@ if df is not None and len(df) > 0 and st.session_state.get("mapeo_ok"):
             st.info("Usando FIXED_LIST_KEY configurado en el código.")
             lk_selected = FIXED_LIST_KEY.strip()
         else:
-            try:
-                lists = get_mailing_lists(access)
-                if not lists:
+            if st.button("🔄 Refrescar listas", help=f"El directorio se reutiliza {CATALOG_TTL // 60} min"):
+                ZOHO.catalog.invalidate("lists:")
+                page_loaders().discard("lists:all")
+            lists_loading = not stream_mailing_lists().done
+
+            # Las páginas llegan en segundo plano: el fragmento se redibuja cada
+            # segundo con lo cargado hasta el momento, sin bloquear el resto
+            @st.fragment(run_every=1.0 if lists_loading else None)
+            def list_picker():
+                bg = stream_mailing_lists()
+                if bg.error:
+                    st.error(f"No se pudieron obtener listas: {bg.error}")
+                elif bg.done and not bg.items:
                     st.warning("No hay listas creadas. Crea una nueva en la pestaña anterior.")
-                else:
-                    name_to_key = {f"{it['listname']} (public={it.get('is_public')})": it["listkey"] for it in lists}
-                    opt = st.selectbox("Elige una lista", list(name_to_key.keys()))
-                    lk_selected = name_to_key.get(opt)
-            except Exception as e:
-                st.error(f"No se pudieron obtener listas: {e}")
+                if bg.items:
+                    name_to_key = {f"{it['listname']} (public={it.get('is_public')})": it["listkey"] for it in bg.items}
+                    st.session_state["lists_name_to_key"] = name_to_key
+                    st.selectbox("Elige una lista", list(name_to_key.keys()), key="list_choice",
+                                 on_change=lambda: st.session_state.update(list_choice_changed=True))
+                    if st.session_state.pop("list_choice_changed", False):
+                        # El plan y el botón de carga están fuera del fragmento
+                        st.rerun(scope="app")
+                if not bg.done:
+                    st.caption(f"Cargando listas… {len(bg.items)} hasta ahora")
+                elif lists_loading:
+                    st.rerun()   # terminó la carga: rerun completo para apagar el auto-refresco
+
+            list_picker()
+            lk_selected = st.session_state.get("lists_name_to_key", {}).get(st.session_state.get("list_choice"))
 
         if lk_selected:
+            planned = plan_panel(lk_selected)
             if st.button("Cargar contactos a la lista seleccionada", type="primary"):
-                try:
-                    emails_all = df[m_email].astype(str).str.strip()
-                    remaining_emails = emails_all[emails_all.str.contains("@")].tolist()
-                    total_batches = math.ceil(len(remaining_emails) / BATCH_SIZE) if remaining_emails else 0
-
-                    if total_batches == 0:
-                        st.info("No hay emails válidos para cargar.")
-                    else:
-                        prog = st.progress(0.0, text="Cargando emails en lotes…")
-                        for i in range(total_batches):
-                            batch = remaining_emails[i*BATCH_SIZE:(i+1)*BATCH_SIZE]
-                            if not batch: break
-                            try:
-                                resp = bulk_add_emails(access, lk_selected, batch)
-                                st.write(f"Lote {i+1}/{total_batches} OK: {resp.get('message') or resp.get('status') or resp}")
-                            except RuntimeError as e:
-                                if "401 en bulk" in str(e):
-                                    st.info("401 en bulk: renovando token…")
-                                    access = get_access_token()
-                                    resp = bulk_add_emails(access, lk_selected, batch)
-                                    st.write(f"Lote {i+1}/{total_batches} OK tras renovar: {resp.get('message') or resp}")
-                                else:
-                                    st.warning(f"Lote {i+1} FALLÓ: {e} — continúo…")
-                            except requests.HTTPError as e:
-                                st.warning(f"Lote {i+1} FALLÓ: {e} — continúo…")
-                            time.sleep(SLEEP_BULK)
-                            prog.progress((i+1)/total_batches, text="Cargando emails en lotes…")
-
-                    updated, errors = enrich_all(lk_selected)
-
-                    st.success("Contactos cargados exitosamente.")
-                    st.write(f"Contactos cargados = {updated}")
-                    st.write(f"Errores = {errors}")
-
-
-                except Exception as e:
-                    st.error(f"Error cargando a lista existente: {e}")
+                choice = st.session_state.get("list_choice") or lk_selected
+                launch(import_spec(listkey=lk_selected, **planned), f"{uploaded.name} → {choice}")
+
+
+# ========= Cargas en curso (se ejecutan en segundo plano) =========
+my_jobs = [j for j in (job_runner().get(i) for i in st.session_state.get("my_jobs", [])) if j]
+if my_jobs:
+    st.header("Cargas en curso")
+    jobs_running = any(j.running for j in my_jobs)
+
+    # Solo lee el estado que publica cada carga: el fragmento se refresca cada
+    # segundo mientras haya alguna activa, sin tocar el resto de la página
+    @st.fragment(run_every=1.0 if jobs_running else None)
+    def jobs_panel():
+        still_running = False
+        for j in reversed(my_jobs):
+            still_running |= j.running
+            c = j.counters()
+            with st.container(border=True):
+                st.markdown(f"**{j.title}** · `{j.id}` · {j.state} · {j.elapsed():.0f}s")
+                if j.running:
+                    st.caption(j.phase)
+                if c.get("lists_total"):
+                    # Fan-out: los contadores de abajo suman los de todas las listas
+                    st.progress(min(c.get("lists_done", 0) / c["lists_total"], 1.0), text=f"Listas terminadas {c.get('lists_done', 0):.0f}/{c['lists_total']:.0f}")
+                    st.dataframe(pd.DataFrame([
+                        {"Lista": p.title, "Estado": p.state, "Fase": p.phase, "Lotes": f"{pc.get('bulk_done', 0):.0f}/{pc.get('bulk_total', 0):.0f}",
+                         "Upserts OK": int(pc.get("enrich_ok", 0)), "Errores": int(pc.get("enrich_errors", 0))}
+                        for p, pc in ((p, p.counters()) for p in j.parts())
+                    ]), hide_index=True, width='stretch')
+                if c.get("bulk_total"):
+                    done, total = c.get("bulk_done", 0), c["bulk_total"]
+                    st.progress(min(done / total, 1.0), text=rate_eta_text("Cargando emails en lotes…", done, total, time.monotonic() - j.stage_elapsed(STAGE_BULK)))
+                if c.get("enrich_total"):
+                    done, total = c.get("enrich_done", 0), c["enrich_total"]
+                    # Ritmo y ETA desde que empezó el enriquecimiento, no la carga
+                    text = rate_eta_text("Enriqueciendo…", done, total, time.monotonic() - j.stage_elapsed(STAGE_ENRICH))
+                    text += f" · {c.get('enrich_ok', 0)} OK · {c.get('enrich_errors', 0)} errores"
+                    if c.get("enrich_fallback"):
+                        text += f" · {c['enrich_fallback']} uno por uno"
+                    st.progress(min(done / total, 1.0), text=text)
+                with st.expander("Registro", expanded=j.running):
+                    for ts, level, msg in j.tail(20):
+                        st.text(f"{time.strftime('%H:%M:%S', time.localtime(ts))} {level.upper():7} {msg}")
+                if j.running:
+                    if st.button("Cancelar", key=f"cancel_{j.id}", disabled=j.cancelled):
+                        j.cancel()
+                elif j.error:
+                    st.error(f"Error en la carga: {j.error}")
+                elif j.result:
+                    st.success("Contactos cargados exitosamente." if j.state == "done" else "Carga cancelada.")
+                    st.write(f"Contactos cargados = {j.result.get('updated', 0)}")
+                    st.write(f"Errores = {j.result.get('errors', 0)}")
+                    if j.result.get("failed_lists"):
+                        st.error(f"{j.result['failed_lists']} listas fallaron: ver el registro.")
+        if jobs_running and not still_running:
+            st.rerun()   # todas terminaron: rerun completo para apagar el auto-refresco
+
+    jobs_panel()
+
+
+# ========= Fallos pendientes (cola de reintentos) =========
+failures = get_deadletters().summary()
+if failures:
+    st.header("Fallos pendientes")
+    st.caption("Contactos que Zoho rechazó (lote o upsert), con el status y la respuesta. Se reintentan solo ellos, sin volver a cargar el CSV.")
+    retry_rps = st.number_input("Peticiones por segundo del reintento", min_value=0.5, max_value=50.0, value=2.0, step=0.5)
+    retry_batch = BATCH_UPSERT_ENABLED and st.checkbox(f"Reintentar el enriquecimiento en bloque ({ENRICH_BATCH} contactos por petición, experimental)", value=False)
+    for f in failures:
+        lk = f["listkey"]
+        with st.container(border=True):
+            st.markdown(
+                f"**{f['csv']}** → `{lk}` · {f['bulk']} del bulk · {f['enrich']} del enriquecimiento · "
+                f"último {time.strftime('%Y-%m-%d %H:%M', time.localtime(f['updated']))}"
+            )
+            c1, c2 = st.columns(2)
+            if c1.button("🔁 Reintentar fallos", key=f"retry_{lk}"):
+                status = job_runner().submit(
+                    f"Reintento de fallos → {lk}", run_retry, ZOHO, get_deadletters(), get_fingerprints(), lk,
+                    retry_rps, ENRICH_BATCH if retry_batch else 0, owner=session_id(),
+                )
+                st.session_state.setdefault("my_jobs", []).append(status.id)
+                st.rerun()   # el panel de «Cargas en curso» está arriba: que ya lo muestre
+            # El CSV se arma solo a pedido: la cola puede tener muchas filas
+            if c2.button("Preparar CSV de fallos", key=f"dlq_prep_{lk}"):
+                st.session_state[f"dlq_csv_{lk}"] = get_deadletters().to_csv(lk)
+            if f"dlq_csv_{lk}" in st.session_state:
+                c2.download_button("⬇️ Fallos (CSV)", st.session_state[f"dlq_csv_{lk}"], file_name=f"fallos_{lk}.csv", mime="text/csv", key=f"dlq_dl_{lk}")
 
 
 # ========= PASO 4: Plantillas guardadas (solo listado/desplegable) =========
 st.header("④ Plantillas guardadas (Templates API v2)")
 
 try:
-    # Reutiliza 'access' si ya existe; si no, renueva
-    access_tpl = access if 'access' in locals() else get_access_token()
-
-    c1, c2 = st.columns([1, 1])
-    with c1:
-        start_idx = st.number_input("start_index", min_value=1, value=1, step=1)
-    with c2:
-        end_idx = st.number_input("end_index", min_value=start_idx, value=start_idx + 199, step=1)
-
+    # Se recorren todas las páginas (ya no hace falta indicar un rango)
     if st.button("Listar plantillas"):
-        try:
-            templates = list_templates(access_tpl, start_index=start_idx, end_index=end_idx)
-            if not templates:
-                st.info("No se encontraron plantillas en ese rango.")
-            else:
+        st.session_state["tpl_listar"] = True
+        ZOHO.catalog.invalidate("templates:")
+        page_loaders().discard("templates:all")
+
+    if st.session_state.get("tpl_listar"):
+        tpl_loading = not stream_templates().done
+
+        @st.fragment(run_every=1.0 if tpl_loading else None)
+        def template_picker():
+            bg = stream_templates()
+            if bg.error:
+                st.error(f"Error listando plantillas:\n{bg.error}")
+            elif bg.done and not bg.items:
+                st.info("No se encontraron plantillas.")
+            if bg.items:
                 options = {
                     f"{t.get('template_name','(sin nombre)')} — ID: {t.get('template_id')}": t.get('template_id')
-                    for t in templates
+                    for t in bg.items
                 }
-                sel = st.selectbox("Selecciona una plantilla", list(options.keys()))
-                st.success("Plantillas cargadas.")
-        except Exception as e:
-            st.error(f"Error listando plantillas:\n{e}")
+                sel = st.selectbox("Selecciona una plantilla", list(options.keys()), key="tpl_choice")
+            if not bg.done:
+                st.caption(f"Cargando plantillas… {len(bg.items)} hasta ahora")
+            elif tpl_loading:
+                st.rerun()
+            elif bg.items:
+                st.success(f"Plantillas cargadas: {len(bg.items)}")
+
+        template_picker()
 
 
-except requests.HTTPError as e:
-    st.error(f"Error {e.response.status_code if e.response is not None else '?'} autenticando para templates: {getattr(e.response,'text',e)}")
 except Exception as e:
     st.error(f"No se pudo preparar la sección de plantillas: {e}")
+
+
+# ========= Diagnóstico: conexiones y latencia por endpoint =========
+with st.expander("📡 Diagnóstico HTTP"):
+    conn = ZOHO.http.connection_stats()
+    d1, d2, d3 = st.columns(3)
+    d1.metric("Peticiones", conn["requests"])
+    d2.metric("Conexiones nuevas", conn["new_connections"])
+    d3.metric("Reutilización", f"{conn['reuse_rate']:.0%}")
+    ep = ZOHO.http.endpoint_stats()
+    if ep:
+        st.dataframe(pd.DataFrame(ep), width='stretch', hide_index=True)
+    else:
+        st.caption("Aún no hay peticiones en este proceso.")
+
+# ========= Telemetría: ¿en qué se va el tiempo de la carga? =========
+LATENCY_BINS_MS = [0, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
+with st.expander("📈 Telemetría de cargas", expanded=bool(my_jobs) and any(j.running for j in my_jobs)):
+    tele = ZOHO.telemetry
+    scope = st.radio("Ventana", ["Última carga", "Todo el proceso"], horizontal=True, key="tele_scope")
+    last_job = my_jobs[-1] if my_jobs else None
+    since = (last_job.started or last_job.created) if scope == "Última carga" and last_job else 0.0
+
+    # Se redibuja cada 2 s mientras alguna carga de esta sesión siga activa
+    @st.fragment(run_every=2.0 if any(j.running for j in my_jobs) else None)
+    def telemetry_panel():
+        ev = pd.DataFrame(tele.events(since))
+        if ev.empty:
+            st.caption("Aún no hay eventos en esta ventana.")
+            return
+        http = ev[ev["kind"] == "http"]
+        waits = ev[ev["kind"] == "wait"]
+        span = max((ev["ts"] + ev["seconds"]).max() - ev["ts"].min(), 1e-6)
+
+        m1, m2, m3, m4, m5 = st.columns(5)
+        m1.metric("Peticiones", f"{len(http):,}")
+        m2.metric("Peticiones/s", f"{len(http) / span:.1f}")
+        m3.metric("Enviado", f"{http['bytes_sent'].sum() / 2**20:.1f} MB")
+        sleeps = waits[waits["name"].str.startswith("sleep")]
+        m4.metric("Espera en limitador", f"{sleeps['seconds'].sum():.0f} s", help="Suma por worker del tiempo bloqueado en el RateLimiter")
+        backoff = waits[waits["name"].str.startswith("429")]
+        m5.metric("Pausas por 429", f"{len(backoff)}", f"{backoff['seconds'].sum():.0f} s", delta_color="inverse")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            st.caption("Throughput (peticiones OK/s por endpoint)")
+            ok = http[http["status"] < 400]
+            if not ok.empty:
+                sec = (ok["ts"] - ev["ts"].min()).astype(int)
+                st.line_chart(ok.groupby([sec, "name"]).size().unstack(fill_value=0), height=220)
+        with c2:
+            st.caption("Histograma de latencia HTTP (ms)")
+            ms = pd.cut(http["seconds"] * 1000, LATENCY_BINS_MS, right=False)
+            hist = ms.value_counts(sort=False)
+            hist.index = [f"<{b.right:g}" if b.right != float("inf") else f"≥{b.left:g}" for b in hist.index]
+            st.bar_chart(hist, height=220)
+
+        st.caption("Tiempo por etapa (segundos acumulados; red y esperas suman en paralelo entre workers)")
+        by_stage = ev.groupby(["kind", "name"]).agg(eventos=("seconds", "size"), segundos=("seconds", "sum"),
+                                                    p50_ms=("seconds", lambda s: s.median() * 1000),
+                                                    p99_ms=("seconds", lambda s: s.quantile(0.99) * 1000))
+        st.dataframe(by_stage.round(1).sort_values("segundos", ascending=False), width='stretch')
+        if last_job and scope == "Última carga":
+            phases = pd.Series(last_job.phase_times(), name="segundos (reloj)").round(1)
+            st.dataframe(phases, width='stretch')
+        codes = http["status"].fillna(0).astype(int).value_counts().rename(index={0: "sin respuesta"})
+        st.caption("Códigos HTTP: " + " · ".join(f"{k}: {v:,}" for k, v in codes.items()))
+
+    telemetry_panel()
+
+    # Exportar en crudo: se arma solo a pedido (con 200k eventos no es gratis)
+    if st.button("Preparar exportación de tiempos"):
+        st.session_state["tele_export"] = (tele.to_csv(since), tele.to_json(since))
+    if "tele_export" in st.session_state:
+        raw_csv, raw_json = st.session_state["tele_export"]
+        e1, e2 = st.columns(2)
+        e1.download_button("⬇️ CSV", raw_csv, file_name="telemetria.csv", mime="text/csv")
+        e2.download_button("⬇️ JSON", raw_json, file_name="telemetria.json", mime="application/json")
@@ -0,0 +1,121 @@
+"""
+Benchmark de fan-out: un CSV repartido por región en varias listas, contra el
+Zoho simulado de mock_zoho.py.
+
+Compara dos formas de cargar las mismas particiones:
+
+- serie:   una carga por lista, una tras otra (el flujo anterior: repetir ③
+           por lista). Cada carga tiene todo el presupuesto, pero con latencia
+           alta sus workers no llegan a usarlo.
+- fan-out: buho.fanout.run_fanout, las listas a la vez bajo un SendBudget
+           compartido.
+
+El servidor simulado aplica a la cuenta el mismo límite que el cliente
+(--account-rps en listsubscribe): con el presupuesto compartido el fan-out
+no debería recibir 429 por límite de tasa aunque cargue varias listas a la vez.
+
+Uso:
+    python benchmarks/bench_fanout.py                      # 10k filas, 4 regiones
+    python benchmarks/bench_fanout.py 50000 --regions 6 --latency 0.08 --account-rps 200
+    python benchmarks/bench_fanout.py 20000 --copies       # todas las filas a cada lista
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("BUHO_DATA_DIR", tempfile.mkdtemp(prefix="buho-bench-"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+import buho.engine as engine  # noqa: E402
+from buho.deadletter import DeadLetterStore  # noqa: E402
+from buho.fanout import FANOUT_LISTS, FanoutTarget, connection_pool_size, import_part, part_spec, run_fanout  # noqa: E402
+from buho.fingerprints import FingerprintStore  # noqa: E402
+from buho.http import ZohoHttp  # noqa: E402
+from buho.ingest import content_hash, detect_encoding, estimate_rows  # noqa: E402
+from buho.jobs import JobStatus  # noqa: E402
+from buho.journal import ImportJournal  # noqa: E402
+from buho.pipeline import ImportSpec  # noqa: E402
+from buho.zoho import ZohoClient  # noqa: E402
+from mock_zoho import MockConfig, MockZoho  # noqa: E402
+
+EXTRA_MAPS = [{"zoho": "Job Title", "csv": "cargo"}]
+
+
+def write_csv(n: int, path: str, regions: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    ids = pd.Series(np.arange(n).astype(str))
+    pd.DataFrame({
+        "email": "user" + ids + "@example.com",
+        "nombre": "Nombre " + ids,
+        "cargo": np.where(rng.random(n) < 0.2, "", "Cargo"),
+        "region": np.array([f"Región {k}" for k in range(regions)])[rng.integers(0, regions, n)],
+    }).to_csv(path, index=False)
+
+
+def run(variant: str, path: str, args) -> None:
+    cfg = MockConfig(latency=args.latency, jitter=args.jitter, rate_limits={"listsubscribe": args.account_rps}, seed=1)
+    with MockZoho(cfg) as mock:
+        client = ZohoClient("bench", "secret", "refresh", accounts_url=mock.url, campaigns_url=mock.url, http=ZohoHttp(pool_maxsize=connection_pool_size(args.lists)))
+        lists = {f"Región {k}": client.create_list_and_contacts(f"bench-{variant}-{k}", "", []) for k in range(args.regions)}
+        targets = [FanoutTarget(name, listkey=lk, values=None if args.copies else [name]) for name, lk in lists.items()]
+        partition_col = None if args.copies else "region"
+        with open(path, "rb") as source:
+            spec = ImportSpec(
+                csv_name=path, source=source, df=None, encoding=detect_encoding(source),
+                total_rows=estimate_rows(source), total_emails=0, csv_hash=content_hash(source),
+                m_email="email", m_first="nombre", extra_maps=EXTRA_MAPS, resume=False, delta=False,
+            )
+            journal, fp_store, deadletters = ImportJournal(), FingerprintStore(), DeadLetterStore()
+            status = JobStatus(variant)
+            status.started = time.time()
+            t0 = time.perf_counter()
+            if variant == "fan-out":
+                result = run_fanout(status, client, spec, targets, journal, fp_store, deadletters, partition_col, lists=args.lists)
+                updated = result["updated"]
+            else:
+                # Una carga completa por lista, cada una con sus propios limitadores
+                updated = 0
+                for t in targets:
+                    budget = engine.SendBudget.create(client.telemetry)
+                    r = import_part(status.add_part(t.label), client, part_spec(spec, t, partition_col), journal, fp_store, deadletters, budget, True)
+                    updated += r["updated"]
+            elapsed = time.perf_counter() - t0
+        srv = mock.stats()
+        loaded = sum(srv["lists"][lk]["contacts"] for lk in lists.values())
+        requests = sum(row["requests"] for row in client.http.endpoint_stats())
+        inj = srv["injected"]
+        print(f"   {variant:<8} {elapsed:>8.1f} {loaded / elapsed:>12,.0f} {requests / elapsed:>10,.0f} "
+              f"{inj.get('429_rate', 0):>10,} {loaded:>10,} {updated:>10,}")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Fan-out a varias listas: en serie vs. concurrente con presupuesto compartido.")
+    p.add_argument("rows", nargs="?", type=int, default=10_000)
+    p.add_argument("--regions", type=int, default=4, help="listas destino (una por región)")
+    p.add_argument("--copies", action="store_true", help="todas las filas a cada lista (sin columna de partición)")
+    p.add_argument("--lists", type=int, default=FANOUT_LISTS, help="listas a la vez en el fan-out")
+    p.add_argument("--latency", type=float, default=0.05, help="segundos por petición en el servidor simulado")
+    p.add_argument("--jitter", type=float, default=0.01)
+    p.add_argument("--account-rps", type=float, default=300.0, help="límite de upserts/s de la cuenta (cliente y servidor)")
+    args = p.parse_args(argv)
+
+    engine.ENRICH_RPS = args.account_rps
+    engine.BULK_RPS = args.account_rps
+    with tempfile.TemporaryDirectory(prefix="buho-bench-csv-") as workdir:
+        path = os.path.join(workdir, f"fanout_{args.rows}.csv")
+        write_csv(args.rows, path, args.regions)
+        print(f"{args.rows:,} filas · {args.regions} listas ({'copias' if args.copies else 'por región'}) · "
+              f"latencia {args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms · cuenta {args.account_rps:g} upserts/s · "
+              f"{engine.ENRICH_WORKERS} workers por lista · {args.lists} listas a la vez")
+        print(f"   {'variante':<8} {'seg':>8} {'contactos/s':>12} {'pet./s':>10} {'429 tasa':>10} {'en listas':>10} {'upserts':>10}")
+        for variant in ("serie", "fan-out"):
+            run(variant, path, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark de memoria: RSS de una sesión con un CSV cargado (modo normal) y
+pico durante una pasada completa del pipeline (pre-chequeo + payloads), sin red.
+
+Compara dos variantes, cada una en un proceso aparte para medir RSS limpio:
+
+- legacy:  pd.read_csv + fillna("") (columnas object, todas las del CSV) y una
+           sola pasada sobre el DataFrame entero, con listas de Python de
+           todos los emails y payloads (el flujo anterior).
+- compact: csvcache.parse_full (strings Arrow) y pipeline.delta_rows, que
+           proyecta las columnas mapeadas y las recorre en rebanadas sin copia.
+
+Los bytes crudos del archivo (lo que guarda st.file_uploader) se cargan antes
+de la línea base: son iguales en ambas variantes.
+
+Uso:
+    python benchmarks/bench_memory.py              # 1M filas
+    python benchmarks/bench_memory.py 200000 --extra-cols 12
+"""
+import argparse
+import gc
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("BUHO_DATA_DIR", tempfile.mkdtemp(prefix="buho-bench-"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+MAPPED = {"m_email": "email", "m_first": "nombre", "m_last": "apellido",
+          "extra_maps": [{"zoho": "Job Title", "csv": "cargo"}]}
+
+
+def write_csv(n: int, path: str, extra_cols: int) -> None:
+    """Columnas mapeadas + `extra_cols` columnas que nadie mapea (notas, ids, etc.)."""
+    ids = np.arange(n).astype(str)
+    cols = {
+        "email": np.char.add(np.char.add("user", ids), "@example.com"),
+        "nombre": np.char.add("Nombre ", ids),
+        "apellido": np.char.add("Apellido ", ids),
+        "cargo": np.where(np.arange(n) % 5 == 0, "", "Gerente de ventas"),
+    }
+    for k in range(extra_cols):
+        cols[f"extra_{k}"] = np.char.add(f"valor {k} de la fila ", ids)
+    pd.DataFrame(cols).to_csv(path, index=False)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_mb() -> float:
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def reset_peak() -> bool:
+    # Linux: escribir 5 en clear_refs reinicia VmHWM (pico de RSS)
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def legacy_load(raw: bytes) -> pd.DataFrame:
+    try:
+        df = pd.read_csv(io.BytesIO(raw))
+    except Exception:
+        df = pd.read_csv(io.BytesIO(raw), encoding="latin-1")
+    return df.fillna("")
+
+
+def legacy_pass(df: pd.DataFrame) -> int:
+    from buho.emails import PreflightStats, preflight_frames
+    from buho.fingerprints import fingerprint
+    from buho.payloads import build_contactinfo_payloads
+
+    n = 0
+    for f in preflight_frames(iter([df]), MAPPED["m_email"], PreflightStats()):
+        payloads = build_contactinfo_payloads(f, MAPPED["m_email"], MAPPED["m_first"], MAPPED["m_last"], None, MAPPED["extra_maps"])
+        emails = f[MAPPED["m_email"]].loc[payloads.index].tolist()
+        plist = payloads.tolist()
+        fps = [fingerprint(p) for p in plist]
+        for _ in zip(payloads.index.tolist(), emails, plist, fps):
+            n += 1
+    return n
+
+
+def compact_load(raw: bytes) -> pd.DataFrame:
+    from buho.csvcache import parse_full
+    return parse_full(io.BytesIO(raw)).df
+
+
+def compact_pass(df: pd.DataFrame) -> int:
+    from buho.pipeline import ImportSpec, delta_rows
+
+    spec = ImportSpec(csv_name="bench", source=None, df=df, encoding=None, total_rows=len(df), total_emails=0,
+                      resume=False, delta=False, **MAPPED)
+    return sum(1 for _ in delta_rows(spec, None, None))
+
+
+def measure(variant: str, path: str) -> dict:
+    """Corre en un subproceso: carga, RSS retenido y pico de la pasada del pipeline."""
+    for mod in ("buho.csvcache", "buho.pipeline"):   # importes fuera de la medición
+        importlib.import_module(mod)
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    gc.collect()
+    base = rss_mb()
+    load, run = (legacy_load, legacy_pass) if variant == "legacy" else (compact_load, compact_pass)
+
+    t0 = time.perf_counter()
+    df = load(raw)
+    t_load = time.perf_counter() - t0
+    gc.collect()
+    held = rss_mb() - base
+    frame_mb = df.memory_usage(index=True, deep=True).sum() / 2**20
+
+    can_reset = reset_peak()
+    before = rss_mb()
+    t0 = time.perf_counter()
+    rows = run(df)
+    t_pass = time.perf_counter() - t0
+    return {
+        "variant": variant, "load_s": t_load, "held_mb": held, "frame_mb": frame_mb,
+        "pass_s": t_pass, "pass_peak_mb": (peak_mb() - before) if can_reset else float("nan"), "rows": rows,
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="RSS por sesión: DataFrame object vs columnas Arrow.")
+    p.add_argument("rows", nargs="?", type=int, default=1_000_000)
+    p.add_argument("--extra-cols", type=int, default=4, help="columnas del CSV que no se mapean")
+    p.add_argument("--measure", nargs=2, metavar=("VARIANTE", "CSV"), help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="buho-bench-csv-") as workdir:
+        path = os.path.join(workdir, f"mem_{args.rows}.csv")
+        write_csv(args.rows, path, args.extra_cols)
+        size = os.path.getsize(path) / 2**20
+        print(f"{args.rows:,} filas · {4 + args.extra_cols} columnas (4 mapeadas) · {size:.0f} MB en disco")
+        print(f"   {'variante':<8} {'carga s':>8} {'RSS sesión MB':>14} {'frame MB':>9} {'pasada s':>9} {'pico pasada MB':>15}")
+        results = {}
+        for variant in ("legacy", "compact"):
+            out = subprocess.run([sys.executable, __file__, "--measure", variant, path], capture_output=True, text=True, check=True)
+            r = results[variant] = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"   {variant:<8} {r['load_s']:>8.2f} {r['held_mb']:>14.0f} {r['frame_mb']:>9.0f} {r['pass_s']:>9.2f} {r['pass_peak_mb']:>15.0f}")
+        old, new = results["legacy"], results["compact"]
+        assert old["rows"] == new["rows"], (old["rows"], new["rows"])
+        print(f"   RSS por sesión: {old['held_mb']:.0f} → {new['held_mb']:.0f} MB "
+              f"({1 - new['held_mb'] / max(old['held_mb'], 1e-9):.0%} menos) · "
+              f"pico del pipeline: {old['pass_peak_mb']:.0f} → {new['pass_peak_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark: armado de payloads `contactinfo` fila por fila (iterrows, como
+lo hacía enrich_all) vs. el constructor columnar de buho.payloads.
+
+Uso:
+    python benchmarks/bench_payloads.py                # 100k y 1M filas
+    python benchmarks/bench_payloads.py 10000 50000    # tamaños a medida
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from buho.payloads import build_contactinfo_payloads  # noqa: E402
+
+EXTRA_MAPS = [{"zoho": "Job Title", "csv": "cargo"}, {"zoho": "Company", "csv": "empresa"}]
+
+
+def synthetic_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """CSV sintético: ~5% de emails inválidos y ~20% de celdas opcionales vacías."""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(n).astype(str)
+    email = pd.Series("  user" + ids + "@example.com ")
+    email[rng.random(n) < 0.05] = "sin-email"
+
+    def optional(prefix):
+        col = pd.Series(prefix + ids)
+        col[rng.random(n) < 0.2] = ""
+        return col
+
+    return pd.DataFrame({
+        "email": email,
+        "nombre": optional("Nombre "),
+        "apellido": optional("Apellido "),
+        "cargo": optional("Cargo "),
+        "empresa": optional("Empresa \"S.A.\" "),
+    })
+
+
+def legacy_payloads(df: pd.DataFrame) -> list:
+    """Copia del bucle original de enrich_all, sin la parte de red."""
+    out = []
+    for _, row in df.iterrows():
+        email = str(row.get("email", "")).strip()
+        if not email or "@" not in email:
+            continue
+        ci = {"Contact Email": email}
+        v = str(row.get("nombre", "")).strip()
+        if v: ci["First Name"] = v
+        v = str(row.get("apellido", "")).strip()
+        if v: ci["Last Name"] = v
+        for m in EXTRA_MAPS:
+            val = str(row.get(m["csv"], "")).strip()
+            if val:
+                ci[m["zoho"]] = val
+        out.append(json.dumps(ci, ensure_ascii=False))
+    return out
+
+
+def columnar_payloads(df: pd.DataFrame) -> list:
+    return build_contactinfo_payloads(df, "email", "nombre", "apellido", None, EXTRA_MAPS).tolist()
+
+
+def timed(fn, df):
+    t0 = time.perf_counter()
+    res = fn(df)
+    return time.perf_counter() - t0, res
+
+
+def main(sizes):
+    print(f"{'filas':>10} {'iterrows (s)':>14} {'columnar (s)':>14} {'speedup':>9}")
+    for n in sizes:
+        df = synthetic_frame(n)
+        t_old, old = timed(legacy_payloads, df)
+        t_new, new = timed(columnar_payloads, df)
+        if old != new:
+            raise SystemExit(f"Resultados distintos con {n} filas")
+        print(f"{n:>10} {t_old:>14.2f} {t_new:>14.2f} {t_old / t_new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100_000, 1_000_000])
@@ -0,0 +1,185 @@
+"""
+Benchmark de punta a punta: CSV sintético → crear lista → bulk → enriquecimiento,
+contra el Zoho simulado de mock_zoho.py (sin tocar producción).
+
+Reporta contactos/s, latencia p50/p99 por endpoint, reintentos por 429 y
+renovaciones de token, y verifica que la lista simulada termine con todos los
+emails válidos. Las perillas del cliente son las de buho.engine (BULK_RPS,
+ENRICH_RPS, *_WORKERS; reemplazan a los antiguos SLEEP_BULK/SLEEP_SINGLE) y
+RETRY_429_MAX de buho.zoho.
+
+Uso:
+    python benchmarks/bench_pipeline.py                       # 10k, 100k y 1M filas (~40 min)
+    python benchmarks/bench_pipeline.py 10000 --enrich-rps 500 --enrich-workers 16
+    python benchmarks/bench_pipeline.py 100000 --batch-enrich 50 --p-row-fail 0.01
+    python benchmarks/bench_pipeline.py 10000 --blank-fields 0.5 --strategy hybrid
+    python benchmarks/bench_pipeline.py 10000 --p500 0.01 --retry-rps 50   # cola de fallos + reintento
+    python benchmarks/bench_pipeline.py 10000 --latency 0.03 --p429 0.02 \\
+        --rate-limit listsubscribe=200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Estado local (bitácora, huellas) en una carpeta temporal, antes de importar buho
+os.environ.setdefault("BUHO_DATA_DIR", tempfile.mkdtemp(prefix="buho-bench-"))
+# El import multi-contacto (--batch-enrich) sin verificar solo se prueba contra el simulado
+os.environ.setdefault("BUHO_BATCH_UPSERT", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+import buho.engine as engine  # noqa: E402
+import buho.zoho as zoho  # noqa: E402
+from buho import DATA_DIR  # noqa: E402
+from buho.deadletter import DeadLetterStore  # noqa: E402
+from buho.fingerprints import FingerprintStore  # noqa: E402
+from buho.http import ZohoHttp  # noqa: E402
+from buho.ingest import detect_encoding, estimate_rows  # noqa: E402
+from buho.jobs import JobStatus  # noqa: E402
+from buho.journal import ImportJournal  # noqa: E402
+from buho.pipeline import ImportSpec, delta_rows, plan_text, run_import, run_retry  # noqa: E402
+from buho.planner import duration_text, estimate, plan_import, workload_from_rows  # noqa: E402
+from mock_zoho import MockConfig, MockZoho, _rate_limits  # noqa: E402
+
+EXTRA_MAPS = [{"zoho": "Job Title", "csv": "cargo"}, {"zoho": "Company", "csv": "empresa"}]
+
+
+def write_csv(n: int, path: str, seed: int = 0, blank: float = 0.0) -> int:
+    """
+    CSV sintético con ~3% de emails inválidos y ~2% repetidos; una fracción
+    `blank` de filas trae solo el email. Devuelve los emails válidos únicos.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(n)
+    dup = rng.random(n) < 0.02
+    ids[dup] = rng.integers(0, n, dup.sum())
+    email = pd.Series("user" + ids.astype(str) + "@example.com")
+    bad = rng.random(n) < 0.03
+    email[bad] = "sin-email-" + pd.Series(ids[bad].astype(str))
+    df = pd.DataFrame({
+        "email": email,
+        "nombre": "Nombre " + pd.Series(ids.astype(str)),
+        "apellido": "Apellido " + pd.Series(ids.astype(str)),
+        "cargo": np.where(rng.random(n) < 0.2, "", "Cargo"),
+        "empresa": "Empresa S.A.",
+    })
+    df.loc[rng.random(n) < blank, ["nombre", "apellido", "cargo", "empresa"]] = ""
+    df.to_csv(path, index=False)
+    return email[~bad].nunique()
+
+
+def run(n: int, args, workdir: str) -> None:
+    path = os.path.join(workdir, f"bench_{n}.csv")
+    expected = write_csv(n, path, blank=args.blank_fields)
+    cfg = MockConfig(
+        latency=args.latency, jitter=args.jitter, p429=args.p429, p401=args.p401, p500=args.p500, token_ttl=args.token_ttl,
+        batch_upsert=not args.no_batch_upsert, p_row_fail=args.p_row_fail,
+        rate_limits=_rate_limits(args.rate_limit), seed=n,
+    )
+    with MockZoho(cfg) as mock:
+        client = zoho.ZohoClient(
+            "bench", "secret", "refresh", accounts_url=mock.url, campaigns_url=mock.url,
+            http=ZohoHttp(pool_maxsize=max(args.bulk_workers, args.enrich_workers) + 2),
+        )
+        with open(path, "rb") as source:
+            enc = detect_encoding(source)
+            total_rows = estimate_rows(source)
+            spec = ImportSpec(
+                csv_name=path, source=source, df=None, encoding=enc,
+                total_rows=total_rows, total_emails=total_rows,
+                m_email="email", m_first="nombre", m_last="apellido", extra_maps=EXTRA_MAPS,
+                resume=False, delta=False, enrich_batch=args.batch_enrich,
+                new_list={"listname": f"bench-{n}-{time.time():.0f}", "description": "", "signupform": "private"},
+            )
+            # Pasada de planificación (fuera del tiempo medido, como el pre-chequeo de la app)
+            t0 = time.perf_counter()
+            spec.workload = workload_from_rows(delta_rows(spec, None, None))
+            t_plan = time.perf_counter() - t0
+            if args.strategy == "auto":
+                plan = plan_import(spec.workload, spec.enrich_batch)
+            else:
+                plan = estimate(args.strategy, spec.workload, spec.enrich_batch)
+            spec.strategy = plan.strategy
+            status = JobStatus(f"bench {n}")
+            status.started = time.time()
+            t0 = time.perf_counter()
+            deadletters, fp_store = DeadLetterStore(), FingerprintStore()
+            result = run_import(status, client, spec, ImportJournal(), fp_store, deadletters)
+            elapsed = time.perf_counter() - t0
+            status.finished = time.time()
+            failed = len(deadletters.pending(result["listkey"]))
+            if failed and args.retry_rps:
+                # Sin fallos inyectados en el reintento: mide el camino de recuperación
+                mock.state.config.p500 = 0.0
+                t0 = time.perf_counter()
+                retry = run_retry(JobStatus("retry"), client, deadletters, fp_store, result["listkey"], args.retry_rps, spec.enrich_batch)
+                t_retry = time.perf_counter() - t0
+
+        srv = mock.stats()
+        loaded = srv["lists"][result["listkey"]]["contacts"]
+        ok = "lista completa" if loaded == expected else f"FALTAN {expected - loaded} en la lista"
+        print(f"\n== {n:,} filas · {expected:,} contactos válidos · {elapsed:.1f}s · "
+              f"{loaded / elapsed:,.0f} contactos/s · {ok}")
+        print(f"   {plan_text(plan)} · estimado ~{duration_text(plan.seconds)} · planificación {t_plan:.1f}s · "
+              f"peticiones reales {sum(row['requests'] for row in client.http.endpoint_stats()):,}")
+        print("   fases: " + " · ".join(f"{k.rstrip('…')} {v:.1f}s" for k, v in status.phase_times().items()))
+        c = status.counters()
+        print(f"   lotes {c.get('bulk_done', 0):.0f} ({c.get('bulk_failed', 0):.0f} fallidos) · "
+              f"upserts OK {result['updated']:,} · errores {result['errors']:,} · "
+              f"reintentados uno por uno {c.get('enrich_fallback', 0):,.0f}")
+        if failed:
+            print(f"   cola de fallos: {failed:,} contactos" + (
+                f" · reintento a {args.retry_rps:g} rps: {retry['updated']:,} recuperados, {retry['errors']:,} siguen fallando en {t_retry:.1f}s"
+                if args.retry_rps else ""))
+        inj = srv["injected"]
+        print(f"   reintentos 429: {inj.get('429', 0) + inj.get('429_rate', 0):,} "
+              f"({inj.get('429_rate', 0):,} por límite de tasa) · 401: {inj.get('401', 0):,} · 500: {inj.get('500', 0):,} "
+              f"· tokens emitidos: {client.tokens.refreshes}")
+        print(f"   {'endpoint':<42} {'peticiones':>10} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+        for row in client.http.endpoint_stats():
+            print(f"   {row['endpoint']:<42} {row['requests']:>10,} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark de carga completa contra Zoho simulado.")
+    p.add_argument("sizes", nargs="*", type=int, default=[10_000, 100_000, 1_000_000])
+    srv = p.add_argument_group("servidor simulado")
+    srv.add_argument("--latency", type=float, default=0.0, help="segundos por petición")
+    srv.add_argument("--jitter", type=float, default=0.0)
+    srv.add_argument("--p429", type=float, default=0.0, help="probabilidad de 429 espurio")
+    srv.add_argument("--p401", type=float, default=0.0, help="probabilidad de revocar el token")
+    srv.add_argument("--p500", type=float, default=0.0, help="probabilidad de error 500 (va a la cola de fallos)")
+    srv.add_argument("--token-ttl", type=int, default=3600)
+    srv.add_argument("--no-batch-upsert", action="store_true", help="el import multi-contacto responde 404")
+    srv.add_argument("--p-row-fail", type=float, default=0.0, help="probabilidad de rechazar un contacto en un import")
+    srv.add_argument("--rate-limit", action="append", metavar="ENDPOINT=RPS", help="límite por clave, p.ej. listsubscribe=200")
+    cli = p.add_argument_group("cliente (buho.engine / buho.zoho)")
+    # Sin límite real por defecto: se mide el techo del pipeline, no el de Zoho
+    cli.add_argument("--bulk-rps", type=float, default=1000.0)
+    cli.add_argument("--bulk-workers", type=int, default=engine.BULK_WORKERS)
+    cli.add_argument("--enrich-rps", type=float, default=5000.0)
+    cli.add_argument("--enrich-workers", type=int, default=engine.ENRICH_WORKERS)
+    cli.add_argument("--retry-429-max", type=int, default=zoho.RETRY_429_MAX)
+    cli.add_argument("--batch-enrich", type=int, default=0, metavar="N", help="enriquecer en grupos de N (0: uno por contacto)")
+    cli.add_argument("--retry-rps", type=float, default=0.0, help="reintentar la cola de fallos a esta tasa (0: no)")
+    cli.add_argument("--strategy", choices=["auto", "bulk", "upsert", "hybrid"], default="auto", help="ver buho.planner")
+    p.add_argument("--blank-fields", type=float, default=0.0, metavar="P", help="fracción de filas con solo el email")
+    args = p.parse_args(argv)
+
+    engine.BULK_RPS, engine.BULK_WORKERS = args.bulk_rps, args.bulk_workers
+    engine.ENRICH_RPS, engine.ENRICH_WORKERS = args.enrich_rps, args.enrich_workers
+    zoho.RETRY_429_MAX = args.retry_429_max
+    print(f"bulk {args.bulk_rps:g} rps × {args.bulk_workers} workers · enrich {args.enrich_rps:g} rps × "
+          f"{args.enrich_workers} workers · latencia {args.latency * 1000:.0f}+{args.jitter * 1000:.0f} ms · "
+          f"p429 {args.p429:g} · p401 {args.p401:g} · bloque {args.batch_enrich or 'no'} · estado en {DATA_DIR}")
+    with tempfile.TemporaryDirectory(prefix="buho-bench-csv-") as workdir:
+        for n in args.sizes:
+            run(n, args, workdir)
+
+
+if __name__ == "__main__":
+    main()
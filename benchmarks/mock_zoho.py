@@ -0,0 +1,373 @@
+"""
+Servidor local que imita los endpoints de Zoho Campaigns que usa buho, para
+medir y ajustar la carga sin tocar producción.
+
+Endpoints: oauth/v2/token, contact/allfields, getmailinglists,
+addlistandcontacts, addlistsubscribersinbulk, json/listsubscribe, el import
+multi-contacto (BATCH_UPSERT_PATH de buho.zoho) y emailapi/v2/templates
+(listado y detalle). Los contactos quedan en memoria.
+
+Fallos configurables (ver MockConfig): latencia con jitter, 429 y 401
+aleatorios, límite de peticiones/s por clave de API y endpoint (429 al
+excederlo) y expiración de tokens.
+
+Uso como servidor suelto, p.ej. para probar el CLI:
+    python benchmarks/mock_zoho.py --port 8765 --latency 0.05 --p429 0.01
+    ZOHO_ACCOUNTS_URL=http://127.0.0.1:8765 ZOHO_CAMPAIGNS_URL=http://127.0.0.1:8765 \\
+    ZOHO_CLIENT_ID=x ZOHO_CLIENT_SECRET=x ZOHO_REFRESH_TOKEN=x \\
+        python -m buho contactos.csv --mapping mapeo.json --new-list Prueba
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from buho.zoho import BATCH_UPSERT_PATH  # noqa: E402
+
+FIELDS = ["Contact Email", "First Name", "Last Name", "Full Name", "Job Title", "Company", "Phone", "City"]
+TEMPLATES = 450   # plantillas de ejemplo (varias páginas de 200)
+BATCH_MAX = 500   # contactos por import multi-contacto
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.0         # segundos por petición (mínimo)
+    jitter: float = 0.0          # + uniforme en [0, jitter)
+    p429: float = 0.0            # probabilidad de 429 espurio por petición
+    p401: float = 0.0            # probabilidad de revocar el token de la petición
+    p500: float = 0.0            # probabilidad de 500 (no se reintenta: va a la cola de fallos)
+    token_ttl: int = 3600        # expires_in de los tokens emitidos
+    batch_upsert: bool = True    # False: el import multi-contacto responde 404
+    p_row_fail: float = 0.0      # probabilidad de rechazar un contacto dentro de un import
+    # peticiones/s permitidas por clave de API (client_id) y endpoint; excederlo da 429
+    rate_limits: Dict[str, float] = field(default_factory=dict)
+    seed: Optional[int] = None
+
+
+class _Bucket:
+    def __init__(self, rate: float):
+        self.rate, self.tokens, self.last = rate, rate, time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class MockState:
+    """Listas, contactos, tokens y contadores del servidor (thread-safe)."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.tokens: Dict[str, Tuple[str, float]] = {}   # token -> (client_id, expira)
+        self.lists: Dict[str, Dict] = {}                  # listkey -> {listname, is_public, contacts}
+        self.buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self.requests: Counter = Counter()                # endpoint -> peticiones
+        self.injected: Counter = Counter()                # "429"/"401"/"429_rate" -> respuestas
+        self._ids = itertools.count(1)
+
+    # --- helpers ---
+    def issue_token(self, client_id: str) -> Dict:
+        with self.lock:
+            tok = f"mock.{next(self._ids)}.{self.rng.getrandbits(32):08x}"
+            self.tokens[tok] = (client_id, time.time() + self.config.token_ttl)
+        return {"access_token": tok, "expires_in": self.config.token_ttl, "token_type": "Bearer"}
+
+    def check(self, endpoint: str, auth: str) -> Optional[Tuple[int, Dict]]:
+        """Autenticación y fallos inyectados; devuelve (status, cuerpo) si la petición se rechaza."""
+        tok = auth.replace("Zoho-oauthtoken ", "", 1)
+        with self.lock:
+            entry = self.tokens.get(tok)
+            if entry is None or entry[1] < time.time():
+                self.injected["401"] += 1
+                return 401, {"code": "1007", "message": "Invalid OAuth token"}
+            if self.rng.random() < self.config.p401:
+                del self.tokens[tok]   # revocado: el cliente debe renovarlo
+                self.injected["401"] += 1
+                return 401, {"code": "1007", "message": "Invalid OAuth token"}
+            if self.rng.random() < self.config.p429:
+                self.injected["429"] += 1
+                return 429, {"code": "2006", "message": "Too many requests"}
+            if self.rng.random() < self.config.p500:
+                self.injected["500"] += 1
+                return 500, {"status": "error", "code": "500", "message": "Internal error"}
+            rate = self.config.rate_limits.get(endpoint)
+            if rate:
+                bucket = self.buckets.setdefault((entry[0], endpoint), _Bucket(rate))
+                if not bucket.take():
+                    self.injected["429_rate"] += 1
+                    return 429, {"code": "2006", "message": "Rate limit exceeded"}
+        return None
+
+    def list_by_name(self, name: str) -> Optional[str]:
+        for lk, it in self.lists.items():
+            if it["listname"] == name:
+                return lk
+        return None
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "injected": dict(self.injected),
+                "lists": {lk: {"listname": it["listname"], "contacts": len(it["contacts"])} for lk, it in self.lists.items()},
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, como Zoho
+    disable_nagle_algorithm = True  # cabeceras y cuerpo van en dos write(): sin esto, +40 ms por delayed ACK
+    server: "MockZoho._Server"
+
+    def log_message(self, *args):   # sin una línea por petición en stderr
+        pass
+
+    def _send(self, status: int, body: Dict) -> None:
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _form(self) -> Dict[str, str]:
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n).decode() if n else ""
+        return {k: v[0] for k, v in parse_qs(raw, keep_blank_values=True).items()}
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        state = self.server.state
+        cfg = state.config
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip("/")
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        form = self._form() if method == "POST" else {}
+        endpoint = re.sub(r"/\d+$", "/{id}", path)
+        with state.lock:
+            state.requests[f"{method} {endpoint}"] += 1
+        if cfg.latency or cfg.jitter:
+            time.sleep(cfg.latency + state.rng.random() * cfg.jitter)
+
+        if path == "/oauth/v2/token":
+            if form.get("grant_type") != "refresh_token" or not form.get("refresh_token"):
+                return self._send(400, {"error": "invalid_code"})
+            return self._send(200, state.issue_token(form.get("client_id", "")))
+
+        name = endpoint.rsplit("/", 1)[-1] if "{id}" not in endpoint else "templates/{id}"
+        rejected = state.check(name, self.headers.get("Authorization", ""))
+        if rejected:
+            return self._send(*rejected)
+
+        route = _ROUTES.get((method, endpoint))
+        if route is None:
+            return self._send(404, {"status": "error", "message": f"No mock for {method} {endpoint}"})
+        return self._send(*route(state, {**query, **form}, path))
+
+
+# --- endpoints: (state, params, path) -> (status, cuerpo) ---
+def _allfields(state: MockState, p: Dict, path: str):
+    return 200, {"response": {"fieldnames": {"fieldname": [{"DISPLAY_NAME": f} for f in FIELDS]}}}
+
+
+def _getmailinglists(state: MockState, p: Dict, path: str):
+    start, range_ = int(p.get("fromindex", 1)), int(p.get("range", 20))
+    with state.lock:
+        items = sorted(state.lists.items(), key=lambda kv: kv[1]["listname"])[start - 1:start - 1 + range_]
+        details = [{"listkey": lk, "listname": it["listname"], "is_public": it["is_public"]} for lk, it in items]
+    return 200, {"status": "success", "list_of_details": details}
+
+
+def _emails(raw: str):
+    raw = raw.strip()
+    return json.loads(raw) if raw.startswith("[") else [e for e in raw.split(",") if e]
+
+
+def _addlistandcontacts(state: MockState, p: Dict, path: str):
+    name = p.get("listname", "").strip()
+    if not name:
+        return 400, {"status": "error", "message": "listname is required"}
+    with state.lock:
+        if state.list_by_name(name):
+            return 200, {"status": "error", "code": "2205", "message": "List name already exists"}
+        lk = f"mocklist{next(state._ids)}"
+        state.lists[lk] = {"listname": name, "is_public": p.get("signupform") == "public", "contacts": {}}
+        for e in _emails(p.get("emailids", "")):
+            state.lists[lk]["contacts"].setdefault(e, {})
+    return 200, {"status": "success", "code": 0, "listkey": lk, "message": "List created"}
+
+
+def _addlistsubscribersinbulk(state: MockState, p: Dict, path: str):
+    emails = _emails(p.get("emailids", ""))
+    if not 1 <= len(emails) <= 10:
+        return 400, {"status": "error", "code": "2501", "message": "emailids must have 1..10 emails"}
+    with state.lock:
+        lst = state.lists.get(p.get("listkey", ""))
+        if lst is None:
+            return 200, {"status": "error", "code": "2502", "message": "Invalid listkey"}
+        for e in emails:
+            lst["contacts"].setdefault(e, {})
+    return 200, {"status": "success", "code": 0, "message": "Contacts added to the list"}
+
+
+def _listsubscribe(state: MockState, p: Dict, path: str):
+    try:
+        info = json.loads(p.get("contactinfo", ""))
+    except ValueError:
+        return 400, {"status": "error", "code": "2003", "message": "contactinfo is not JSON"}
+    email = info.get("Contact Email")
+    with state.lock:
+        lst = state.lists.get(p.get("listkey", ""))
+        if lst is None or not email:
+            return 200, {"status": "error", "code": "2502", "message": "Invalid listkey or email"}
+        lst["contacts"][email] = info
+    return 200, {"status": "success", "code": "0", "message": "User successfully subscribed."}
+
+
+def _importcontacts(state: MockState, p: Dict, path: str):
+    if not state.config.batch_upsert:
+        return 404, {"status": "error", "message": "Not found"}
+    try:
+        infos = json.loads(p.get("contactinfo", ""))
+    except ValueError:
+        return 400, {"status": "error", "code": "2003", "message": "contactinfo is not a JSON array"}
+    if not isinstance(infos, list) or not 1 <= len(infos) <= BATCH_MAX:
+        return 400, {"status": "error", "code": "2501", "message": f"contactinfo must have 1..{BATCH_MAX} contacts"}
+    failed = []
+    with state.lock:
+        lst = state.lists.get(p.get("listkey", ""))
+        if lst is None:
+            return 200, {"status": "error", "code": "2502", "message": "Invalid listkey"}
+        for info in infos:
+            email = info.get("Contact Email", "")
+            if "@" not in email or state.rng.random() < state.config.p_row_fail:
+                failed.append(email)
+            else:
+                lst["contacts"][email] = info
+    return 200, {"status": "success", "code": "0", "imported": len(infos) - len(failed), "failed": failed}
+
+
+def _templates(state: MockState, p: Dict, path: str):
+    start, end = int(p.get("start_index", 1)), int(p.get("end_index", 200))
+    ids = range(start, min(end, TEMPLATES) + 1)
+    return 200, {"templates": [{"template_id": str(100000 + i), "template_name": f"Plantilla {i}"} for i in ids]}
+
+
+def _template(state: MockState, p: Dict, path: str):
+    tid = path.rsplit("/", 1)[-1]
+    return 200, {"template_id": tid, "content_type": "html", "content": f"<html><body>Plantilla {tid}</body></html>"}
+
+
+_ROUTES = {
+    ("GET", "/api/v1.1/contact/allfields"): _allfields,
+    ("GET", "/api/v1.1/getmailinglists"): _getmailinglists,
+    ("POST", "/api/v1.1/addlistandcontacts"): _addlistandcontacts,
+    ("POST", "/api/v1.1/addlistsubscribersinbulk"): _addlistsubscribersinbulk,
+    ("POST", "/api/v1.1/json/listsubscribe"): _listsubscribe,
+    ("POST", f"/api/v1.1/{BATCH_UPSERT_PATH}"): _importcontacts,
+    ("GET", "/emailapi/v2/templates"): _templates,
+    ("GET", "/emailapi/v2/templates/{id}"): _template,
+}
+
+
+class MockZoho:
+    """
+    Servidor simulado en un hilo de fondo. Como context manager:
+
+        with MockZoho(MockConfig(latency=0.02)) as mock:
+            client = ZohoClient("id", "secret", "refresh", accounts_url=mock.url, campaigns_url=mock.url)
+    """
+
+    class _Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 128
+        state: MockState
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.state = MockState(config or MockConfig())
+        self._server = self._Server((host, port), _Handler)
+        self._server.state = self.state
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockZoho":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-zoho", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockZoho":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stats(self) -> Dict:
+        return self.state.stats()
+
+
+def _rate_limits(specs) -> Dict[str, float]:
+    # "addlistsubscribersinbulk=10" -> {"addlistsubscribersinbulk": 10.0}
+    return {k: float(v) for k, v in (s.split("=", 1) for s in specs or [])}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.0)
+    p.add_argument("--jitter", type=float, default=0.0)
+    p.add_argument("--p429", type=float, default=0.0)
+    p.add_argument("--p401", type=float, default=0.0)
+    p.add_argument("--p500", type=float, default=0.0)
+    p.add_argument("--token-ttl", type=int, default=3600)
+    p.add_argument("--no-batch-upsert", action="store_true", help="responder 404 al import multi-contacto")
+    p.add_argument("--p-row-fail", type=float, default=0.0)
+    p.add_argument("--rate-limit", action="append", metavar="ENDPOINT=RPS", help="p.ej. listsubscribe=20 (repetible)")
+    a = p.parse_args(argv)
+    cfg = MockConfig(
+        latency=a.latency, jitter=a.jitter, p429=a.p429, p401=a.p401, p500=a.p500, token_ttl=a.token_ttl,
+        batch_upsert=not a.no_batch_upsert, p_row_fail=a.p_row_fail, rate_limits=_rate_limits(a.rate_limit),
+    )
+    mock = MockZoho(cfg, a.host, a.port)
+    print(f"Zoho simulado en {mock.url} (Ctrl+C para salir)")
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock._server.server_close()
+        print(json.dumps(mock.stats()["requests"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""Lógica de carga a Zoho Campaigns reutilizable fuera de la UI de Streamlit."""
+import os
+
+# Carpeta para estado local (bitácora de cargas, caché de catálogos…)
+DATA_DIR = os.environ.get("BUHO_DATA_DIR", ".buho")
@@ -0,0 +1,5 @@
+import sys
+
+from buho.cli import main
+
+sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Caché de access tokens OAuth de Zoho compartida por todo el proceso.
+
+Zoho limita los canjes de refresh token, así que el token se reutiliza hasta
+poco antes de que expire (según el `expires_in` que devuelve el endpoint) y,
+si varios hilos lo necesitan a la vez, solo uno hace el canje.
+"""
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+REFRESH_SKEW = 300   # segundos antes de expirar en que se renueva proactivamente
+
+
+class TokenCache:
+    """
+    `fetch()` debe devolver (access_token, expires_in_segundos).
+
+    - get(): token vigente; lo renueva si falta o está por expirar.
+    - invalidate(token): tras un 401, descarta ese token (si nadie lo renovó
+      ya) para que el próximo get() haga el canje.
+    """
+
+    def __init__(self, fetch: Callable[[], Tuple[str, float]], skew: float = REFRESH_SKEW):
+        self._fetch = fetch
+        self._skew = skew
+        # (token, expira_en) en una sola tupla: get() la lee sin lock y una
+        # asignación es atómica, así nunca ve el token de un canje con la
+        # expiración de otro, ni un None que invalidate() dejó en medio
+        self._entry: Tuple[Optional[str], float] = (None, 0.0)
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def _fresh(self, entry: Tuple[Optional[str], float]) -> bool:
+        token, expires_at = entry
+        return token is not None and time.monotonic() < expires_at - self._skew
+
+    def get(self) -> str:
+        entry = self._entry
+        if self._fresh(entry):
+            return entry[0]
+        # Un solo canje en vuelo: el resto espera el lock y reutiliza el resultado
+        with self._lock:
+            if not self._fresh(self._entry):
+                token, expires_in = self._fetch()
+                # Tokens de vida muy corta: no dejar que el margen los anule
+                self._skew = min(self._skew, float(expires_in) / 2)
+                self._entry = (token, time.monotonic() + float(expires_in))
+                self.refreshes += 1
+            return self._entry[0]
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            if self._entry[0] == token:
+                self._entry = (None, 0.0)
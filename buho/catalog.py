@@ -0,0 +1,138 @@
+"""
+Caché de endpoints de catálogo (campos de contacto, directorio de listas).
+
+Son respuestas casi estáticas: se guardan en memoria con un TTL y,
+opcionalmente, en un JSON en disco para sobrevivir reinicios. Crear una
+lista invalida el directorio explícitamente.
+"""
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from buho import DATA_DIR
+
+CATALOG_TTL  = 600   # segundos
+CATALOG_PATH = os.path.join(DATA_DIR, "catalog.json")
+
+
+class CatalogCache:
+    """
+    get_or_load(key, loader, wrap): devuelve el valor vigente de `key` o lo
+    carga con `loader()`. Un loader que devuelve None (p.ej. 401) no se cachea.
+    `wrap` convierte el valor crudo (el que se persiste en JSON) en el objeto
+    que se guarda en memoria, p.ej. un índice.
+
+    El loader corre fuera del lock: una carga lenta no bloquea las demás
+    claves. Si otro hilo ya está cargando la misma clave, se espera su
+    resultado en vez de repetir la petición.
+    """
+
+    def __init__(self, ttl: float = CATALOG_TTL, path: Optional[str] = None):
+        self.ttl = ttl
+        self.path = path
+        self._mem: Dict[str, tuple] = {}     # key -> (guardado_en_epoch, valor en memoria)
+        self._disk: Dict[str, dict] = self._read_disk()
+        self._lock = threading.RLock()
+        self._loading: Dict[str, threading.Event] = {}   # key -> carga en vuelo
+        self._generation = 0   # sube con cada invalidate()
+
+    def _read_disk(self) -> Dict[str, dict]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_disk(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self._disk, fh, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _fresh(self, at: float) -> bool:
+        return time.time() - at < self.ttl
+
+    def peek(self, key: str, wrap: Optional[Callable] = None):
+        """Valor vigente de `key` (memoria o disco) sin cargarlo; None si no hay."""
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and self._fresh(hit[0]):
+                return hit[1]
+            disk = self._disk.get(key)
+            if disk and self._fresh(disk["at"]):
+                value = wrap(disk["value"]) if wrap else disk["value"]
+                self._mem[key] = (disk["at"], value)
+                return value
+            return None
+
+    def put(self, key: str, raw, wrap: Optional[Callable] = None):
+        at = time.time()
+        value = wrap(raw) if wrap else raw
+        with self._lock:
+            self._mem[key] = (at, value)
+            if self.path:
+                self._disk[key] = {"at": at, "value": raw}
+                self._write_disk()
+        return value
+
+    def get_or_load(self, key: str, loader: Callable, wrap: Optional[Callable] = None):
+        while True:
+            with self._lock:
+                value = self.peek(key, wrap)
+                if value is not None:
+                    return value
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = threading.Event()
+                    generation = self._generation
+                    break
+            # Otro hilo la está cargando: al terminar se relee (o se carga si falló)
+            pending.wait()
+        try:
+            raw = loader()
+            if raw is None:
+                return None
+            with self._lock:
+                # Invalidada mientras cargaba (p.ej. se creó una lista): el
+                # resultado sirve a quien lo pidió, pero no se guarda
+                if self._generation != generation:
+                    return wrap(raw) if wrap else raw
+                return self.put(key, raw, wrap)
+        finally:
+            with self._lock:
+                del self._loading[key]
+            pending.set()
+
+    def invalidate(self, prefix: str = "") -> None:
+        """Descarta las claves que empiezan con `prefix` (todas si es "")."""
+        with self._lock:
+            self._generation += 1
+            for store in (self._mem, self._disk):
+                for k in [k for k in store if k.startswith(prefix)]:
+                    del store[k]
+            self._write_disk()
+
+
+class ListDirectory(list):
+    """
+    Lista de listas de correo (sigue siendo una list de dicts) con índice
+    nombre (sin mayúsculas/espacios) → listkey.
+    """
+
+    def __init__(self, lists: List[Dict]):
+        super().__init__(lists)
+        self._by_name = {}
+        for it in self:
+            name = (it.get("listname") or "").strip().lower()
+            # Si hay nombres repetidos gana el primero, como la búsqueda lineal anterior
+            self._by_name.setdefault(name, it["listkey"])
+
+    def lookup(self, listname: str) -> Optional[str]:
+        return self._by_name.get(listname.strip().lower())
@@ -0,0 +1,211 @@
+"""
+Carga de contactos desde la línea de comandos (cron, scripts), sin Streamlit.
+
+    python -m buho contactos.csv --mapping mapeo.json --listkey 3z…
+    python -m buho contactos.csv --mapping mapeo.json --new-list "Clientes 2026"
+    python -m buho contactos.csv --mapping mapeo.json --fanout-lists 3z…,3z…
+    python -m buho contactos.csv --mapping mapeo.json --partition-col region \
+        --route Norte=3z… --route Sur=3z…
+
+Credenciales en ZOHO_CLIENT_ID, ZOHO_CLIENT_SECRET, ZOHO_REFRESH_TOKEN y
+ZOHO_DC; el estado local (bitácora, huellas, catálogo) en BUHO_DATA_DIR. La
+carga usa la misma bitácora que la app: se puede reanudar desde cualquiera.
+
+El mapeo es un JSON con la misma forma que guarda la app:
+    {"email": "correo", "first": "nombre", "last": "apellido", "full": null,
+     "extra": [{"zoho": "Job Title", "csv": "cargo"}]}
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Dict, List, Optional
+
+log = logging.getLogger("buho")
+
+PROGRESS_EVERY = 5.0   # segundos entre líneas de avance
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m buho", description="Carga un CSV de contactos a una lista de Zoho Campaigns.")
+    p.add_argument("csv", help="ruta del CSV de contactos")
+    p.add_argument("--mapping", required=True, help="JSON con el mapeo de columnas (ver ayuda del módulo)")
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument("--listkey", help="listkey de una lista existente")
+    target.add_argument("--new-list", metavar="NOMBRE", help="crear una lista nueva con este nombre")
+    target.add_argument("--fanout-lists", metavar="LISTKEYS", help="todas las filas a cada una de estas listas (separadas por coma)")
+    target.add_argument("--partition-col", metavar="COLUMNA", help="repartir las filas en listas según esta columna (ver --route)")
+    p.add_argument("--route", action="append", default=[], metavar="VALOR=LISTKEY", help="con --partition-col: las filas con VALOR van a LISTKEY (repetible)")
+    p.add_argument("--lists-at-once", type=int, default=None, metavar="N", help="en fan-out, listas que se cargan a la vez")
+    p.add_argument("--description", default="", help="descripción de la lista nueva")
+    p.add_argument("--public", action="store_true", help="crear la lista como pública (por defecto PRIVATE)")
+    p.add_argument("--no-resume", action="store_true", help="no reanudar: reenviar lo ya confirmado por Zoho")
+    p.add_argument("--full-sync", action="store_true", help="enviar todos los contactos, no solo nuevos o con cambios")
+    p.add_argument("--batch-enrich", type=int, default=0, metavar="N", help="enriquecer en grupos de N contactos por petición (0: uno por contacto; experimental, requiere BUHO_BATCH_UPSERT=1)")
+    p.add_argument("--strategy", choices=["auto", "bulk", "upsert", "hybrid"], default="auto", help="cómo enviar los contactos (auto: la que estima el planificador)")
+    p.add_argument("--failures-csv", metavar="RUTA", help="al terminar, guardar aquí los contactos que Zoho rechazó")
+    p.add_argument("--progress-every", type=float, default=PROGRESS_EVERY, metavar="SEG", help="segundos entre líneas de avance")
+    p.add_argument("-v", "--verbose", action="store_true", help="log de cada lote")
+    args = p.parse_args(argv)
+    if bool(args.partition_col) != bool(args.route):
+        p.error("--partition-col y --route van juntos")
+    if any("=" not in r for r in args.route):
+        p.error("--route espera VALOR=LISTKEY")
+    return args
+
+
+def parse_routes(routes: List[str]) -> Dict[str, List[str]]:
+    """["Norte=lk1", "Centro=lk1", "Sur=lk2"] → {lk1: ["Norte", "Centro"], lk2: ["Sur"]}."""
+    out: Dict[str, List[str]] = {}
+    for r in routes:
+        value, listkey = r.rsplit("=", 1)
+        out.setdefault(listkey.strip(), []).append(value.strip())
+    return out
+
+
+def load_mapping(path: str, columns: List[str]) -> Dict:
+    with open(path, encoding="utf-8") as fh:
+        mapping = json.load(fh)
+    if not mapping.get("email"):
+        raise ValueError("El mapeo debe indicar la columna 'email'.")
+    cols = [mapping.get(k) for k in ("email", "first", "last", "full")] + [m.get("csv") for m in mapping.get("extra", [])]
+    missing = [c for c in cols if c and c not in columns]
+    if missing:
+        raise ValueError(f"Columnas del mapeo que no están en el CSV: {', '.join(missing)}")
+    return mapping
+
+
+def progress_line(status) -> str:
+    c = status.counters()
+    parts = [status.phase]
+    if c.get("bulk_total"):
+        parts.append(f"lotes {c.get('bulk_done', 0):.0f}/{c['bulk_total']:.0f}")
+    if c.get("enrich_total"):
+        parts.append(f"filas {c.get('enrich_done', 0):.0f}/{c['enrich_total']:.0f} ({c.get('enrich_errors', 0):.0f} errores)")
+    if c.get("lists_total"):
+        parts.append(f"listas {c.get('lists_done', 0):.0f}/{c['lists_total']:.0f}")
+    return " · ".join(parts)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+    # El log por lote es muy ruidoso para cron; con -v se ve completo
+    logging.getLogger("buho.jobs").setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    # pandas y el resto del pipeline se importan tras validar argumentos:
+    # `--help` y los errores de uso responden al instante
+    from buho.catalog import CATALOG_PATH, CatalogCache
+    from buho.deadletter import DeadLetterStore
+    from buho.emails import PreflightStats
+    from buho.fanout import FANOUT_LISTS, FanoutTarget, connection_pool_size, run_fanout
+    from buho.fingerprints import FingerprintStore
+    from buho.http import ZohoHttp
+    from buho.ingest import content_hash, detect_encoding, estimate_rows, read_csv_sample
+    from buho.jobs import DONE, FAILED, JobRunner
+    from buho.journal import ImportJournal
+    from buho.pipeline import ImportSpec, delta_rows, plan_text, preflight_text, run_import
+    from buho.planner import STRATEGY_BULK, duration_text, estimate, plan_import, workload_from_rows
+    from buho.zoho import BATCH_UPSERT_ENABLED, ZohoClient
+
+    fanout = bool(args.fanout_lists or args.partition_col)
+    try:
+        if args.batch_enrich and not BATCH_UPSERT_ENABLED:
+            raise ValueError("--batch-enrich usa un endpoint sin verificar: actívalo con BUHO_BATCH_UPSERT=1")
+        # En un fan-out, conexiones para los workers de todas las listas a la vez
+        http = ZohoHttp(pool_maxsize=connection_pool_size(args.lists_at_once or FANOUT_LISTS)) if fanout else None
+        client = ZohoClient.from_env(catalog=CatalogCache(path=CATALOG_PATH), http=http)
+        encoding = detect_encoding(args.csv)
+        columns = list(read_csv_sample(args.csv, encoding, nrows=0).columns)
+        mapping = load_mapping(args.mapping, columns)
+        if args.partition_col and args.partition_col not in columns:
+            raise ValueError(f"La columna de partición no está en el CSV: {args.partition_col}")
+    except (OSError, ValueError, RuntimeError) as e:
+        log.error("%s", e)
+        return 2
+
+    with open(args.csv, "rb") as source:
+        spec = ImportSpec(
+            csv_name=args.csv,
+            source=source,
+            df=None,   # siempre por chunks: memoria acotada sea cual sea el tamaño
+            encoding=encoding,
+            total_rows=estimate_rows(source),
+            total_emails=0,
+            csv_hash=content_hash(source),
+            m_email=mapping["email"],
+            m_first=mapping.get("first"),
+            m_last=mapping.get("last"),
+            m_full=mapping.get("full"),
+            extra_maps=mapping.get("extra", []),
+            resume=not args.no_resume,
+            delta=not args.full_sync,
+            enrich_batch=args.batch_enrich,
+            listkey=args.listkey,
+            new_list={
+                "listname": args.new_list,
+                "description": args.description,
+                "signupform": "public" if args.public else "private",
+            } if args.new_list else None,
+        )
+        try:
+            spec.has_full_name = "Full Name" in client.get_all_fields()
+        except Exception as e:
+            log.warning("No se pudieron leer campos de Zoho (se usará catálogo mínimo): %s", e)
+        fp_store, deadletters = FingerprintStore(), DeadLetterStore()
+        runner = JobRunner(max_workers=1)
+        if fanout:
+            if args.fanout_lists:
+                targets = [FanoutTarget(lk, listkey=lk) for lk in (x.strip() for x in args.fanout_lists.split(",")) if lk]
+            else:
+                targets = [FanoutTarget(f"{lk} ({', '.join(values)})", listkey=lk, values=values) for lk, values in parse_routes(args.route).items()]
+            # Cada lista hace su propia pasada de planificación dentro de la carga
+            if args.strategy != "auto":
+                spec.strategy = args.strategy
+            status = runner.submit(
+                f"{args.csv} → {len(targets)} listas", run_fanout, client, spec, targets, ImportJournal(), fp_store, deadletters,
+                args.partition_col, args.strategy == "auto", args.lists_at_once or FANOUT_LISTS,
+            )
+        else:
+            # Una pasada previa da el total exacto de emails para el avance y lo
+            # que el planificador necesita: cuántos contactos y cuántos sin campos
+            stats = PreflightStats()
+            spec.workload = workload_from_rows(delta_rows(spec, fp_store, args.listkey, stats))
+            spec.total_emails = stats.kept
+            log.info(preflight_text(stats))
+            if args.strategy == "auto":
+                plan = plan_import(spec.workload, spec.enrich_batch)
+            else:
+                plan = estimate(args.strategy, spec.workload, spec.enrich_batch)
+            spec.strategy = plan.strategy
+            if spec.strategy == STRATEGY_BULK and spec.workload.email_only < spec.workload.contacts:
+                log.warning("Estrategia bulk con contactos que traen campos: esos campos no se cargarán.")
+            log.info("%s · ~%s", plan_text(plan), duration_text(plan.seconds))
+            status = runner.submit(f"{args.csv} → {args.listkey or args.new_list}", run_import, client, spec, ImportJournal(), fp_store, deadletters)
+        try:
+            next_report = time.monotonic() + args.progress_every
+            while status.running:
+                time.sleep(0.2)
+                if time.monotonic() >= next_report:
+                    next_report += args.progress_every
+                    log.info(progress_line(status))
+        except KeyboardInterrupt:
+            # Corta entre envíos; lo confirmado queda en la bitácora para reanudar
+            log.warning("Cancelando… (lo ya confirmado por Zoho se salta al reanudar)")
+            status.cancel()
+            while status.running:
+                time.sleep(0.2)
+
+    if status.state == FAILED:
+        log.error("La carga falló: %s", status.error)
+        return 1
+    listkeys = [r["listkey"] for r in status.result.get("lists", []) if r["listkey"]] or [status.result.get("listkey")]
+    if args.failures_csv and all(listkeys):
+        with open(args.failures_csv, "wb") as fh:
+            fh.write(deadletters.to_csv(*listkeys))
+    print(json.dumps({"state": status.state, "seconds": round(status.elapsed(), 1), **status.result}, ensure_ascii=False))
+    if status.result.get("failed_lists"):
+        log.error("%d listas fallaron (ver el log)", status.result["failed_lists"])
+        return 1
+    return 0 if status.state == DONE else 130
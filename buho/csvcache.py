@@ -0,0 +1,190 @@
+"""
+Caché de CSV ya parseados, compartida entre reruns y sesiones de Streamlit.
+
+Cada interacción con el mapeo vuelve a ejecutar la app entera; sin caché eso
+relee y reparsea el archivo completo. Aquí se guarda, por hash del contenido,
+el DataFrame (o la vista previa en streaming) junto con sus columnas y la
+detección automática del mapeo, en un LRU acotado por memoria.
+
+Los DataFrames cacheados se comparten: no se modifican en el lugar.
+"""
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from buho.ingest import CsvSource, _open, detect_encoding, estimate_rows, read_csv_sample
+from buho.payloads import STR_DTYPE
+
+CSV_CACHE_BYTES = 2 << 30   # memoria total de los frames cacheados
+SIZE_SAMPLE_ROWS = 10_000   # filas medidas a fondo para estimar la memoria de un frame
+
+# Alias por campo, en orden de preferencia (nombre de columna en minúsculas)
+COLUMN_ALIASES = {
+    "email": ["work email (enterprise)", "email", "work email"],
+    "first": ["first name", "nombre", "name"],
+    "last": ["last name", "apellido", "surname"],
+    "full": ["full name", "nombre completo"],
+}
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """
+    Memoria aproximada de `df`. memory_usage(deep=True) recorre cada string;
+    en frames grandes se mide una muestra y se extrapola.
+    """
+    if len(df) <= SIZE_SAMPLE_ROWS:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    sample = df.sample(SIZE_SAMPLE_ROWS, random_state=0)
+    return int(sample.memory_usage(index=False, deep=True).sum() * len(df) / SIZE_SAMPLE_ROWS + df.index.memory_usage())
+
+
+def detect_columns(columns: List[str]) -> Dict[str, Optional[str]]:
+    """Heurística simple: columna sugerida para email/first/last/full (o None)."""
+    cols_lc = {c.strip().lower(): c for c in columns}
+    return {k: next((cols_lc[a] for a in aliases if a in cols_lc), None) for k, aliases in COLUMN_ALIASES.items()}
+
+
+@dataclass
+class ParsedCsv:
+    df: pd.DataFrame                  # CSV completo, o la vista previa en streaming
+    encoding: Optional[str]           # solo en streaming (el modo normal lo deduce pandas)
+    total_rows: int                   # filas del CSV (estimadas en streaming)
+    columns: List[str] = field(default_factory=list)
+    detected: Dict[str, Optional[str]] = field(default_factory=dict)
+    nbytes: int = 0
+
+    def __post_init__(self):
+        self.total_rows = self.total_rows or len(self.df)
+        self.columns = self.df.columns.tolist()
+        self.detected = detect_columns(self.columns)
+        self.nbytes = frame_bytes(self.df)
+
+
+def _dedup_names(names: List[str]) -> List[str]:
+    # Como pandas: la segunda "email" pasa a "email.1"
+    seen: Dict[str, int] = {}
+    out = []
+    for n in names:
+        k = seen.get(n, 0)
+        seen[n] = k + 1
+        out.append(n if k == 0 else f"{n}.{k}")
+    return out
+
+
+def _read_arrow(raw: bytes, encoding: str) -> pd.DataFrame:
+    """
+    Parser CSV de Arrow: todas las columnas como string (sin inferir números,
+    así "007" sigue siendo "007") y celdas vacías como "". Las columnas quedan
+    en buffers Arrow, no como un objeto de Python por celda.
+    """
+    names = _dedup_names(pacsv.open_csv(io.BytesIO(raw), read_options=pacsv.ReadOptions(encoding=encoding)).schema.names)
+    table = pacsv.read_csv(
+        io.BytesIO(raw),
+        read_options=pacsv.ReadOptions(encoding=encoding, column_names=names, skip_rows=1),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types={n: pa.string() for n in names},
+            null_values=[], strings_can_be_null=False, quoted_strings_can_be_null=False,
+        ),
+    )
+    df = table.to_pandas(types_mapper={pa.string(): STR_DTYPE}.get)
+    # El parser deja bloques libres en el pool de Arrow: se devuelven al SO
+    pa.default_memory_pool().release_unused()
+    return df
+
+
+def parse_full(src: CsvSource) -> ParsedCsv:
+    """
+    Todo el CSV en memoria como strings Arrow (utf-8 y, si falla, latin-1),
+    celdas vacías como "". Lo que el parser de Arrow no acepta (p.ej. filas
+    con menos columnas) se lee con pandas, con el mismo resultado.
+    """
+    with _open(src) as fh:
+        raw = fh.read()
+    for encoding in ("utf-8", "latin-1"):
+        try:
+            return ParsedCsv(_read_arrow(raw, encoding), None, 0)
+        except pa.ArrowInvalid:
+            continue
+    try:
+        df = pd.read_csv(io.BytesIO(raw), dtype=STR_DTYPE, keep_default_na=False)
+    except UnicodeDecodeError:
+        df = pd.read_csv(io.BytesIO(raw), dtype=STR_DTYPE, keep_default_na=False, encoding="latin-1")
+    return ParsedCsv(df, None, 0)
+
+
+def parse_streaming(src: CsvSource) -> ParsedCsv:
+    """Codificación, vista previa y filas estimadas; el archivo se recorre luego por chunks."""
+    encoding = detect_encoding(src)
+    return ParsedCsv(read_csv_sample(src, encoding), encoding, estimate_rows(src))
+
+
+class CsvCache:
+    """
+    LRU de ParsedCsv acotado a `max_bytes` (memoria de los DataFrames). Un
+    archivo que por sí solo supera el límite se parsea pero no se guarda.
+    Dos sesiones que piden la misma clave a la vez esperan un solo parseo.
+    """
+
+    def __init__(self, max_bytes: int = CSV_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, ParsedCsv]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[ParsedCsv]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+            return item
+
+    def put(self, key: Hashable, item: ParsedCsv) -> None:
+        with self._lock:
+            if item.nbytes > self.max_bytes:
+                return
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._items[key] = item
+            self._bytes += item.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def get_or_parse(self, key: Hashable, parse: Callable[[], ParsedCsv]) -> ParsedCsv:
+        item = self.get(key)
+        if item is not None:
+            return item
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            item = self.get(key)   # otra sesión pudo terminar mientras esperábamos
+            if item is None:
+                with self._lock:
+                    self.misses += 1
+                item = parse()
+                self.put(key, item)
+        with self._lock:
+            self._loading.pop(key, None)
+        return item
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,145 @@
+"""
+Cola de fallos (dead-letter) persistente: cada fila que Zoho no aceptó.
+
+Por contacto fallido se guarda la carga, la etapa (bulk o enriquecimiento),
+la fila del CSV, el payload enviado, el status HTTP y el cuerpo de la
+respuesta. Así se pueden reintentar solo esos contactos (ver
+buho.pipeline.run_retry) o descargarlos como CSV, sin volver a correr el
+archivo completo.
+
+Una carga vuelve a enviar sus filas no confirmadas al reanudarse, por eso al
+empezar se descartan sus fallos anteriores: la cola refleja la última corrida.
+"""
+import csv
+import io
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from buho import DATA_DIR
+
+DEADLETTER_PATH = os.path.join(DATA_DIR, "deadletter.sqlite")
+
+BODY_MAX = 2000   # caracteres del cuerpo de respuesta que se guardan
+
+FIELDS = ["listkey", "csv", "stage", "row", "email", "payload", "http_status", "body", "error", "attempts", "updated"]
+
+
+def error_details(err: Exception) -> Tuple[Optional[int], str]:
+    """(status HTTP, cuerpo) de una excepción de requests; sin respuesta, (None, mensaje)."""
+    resp = getattr(err, "response", None)
+    if resp is not None:
+        return resp.status_code, (resp.text or "")[:BODY_MAX]
+    return None, str(err)[:BODY_MAX]
+
+
+class DeadLetterStore:
+    """Tabla de contactos fallidos en SQLite; thread-safe, escrituras en buffer."""
+
+    def __init__(self, path: str = DEADLETTER_PATH, flush_every: int = 200):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS failures (
+                job_id      TEXT NOT NULL,
+                listkey     TEXT NOT NULL,
+                csv         TEXT NOT NULL,
+                stage       TEXT NOT NULL,
+                email       TEXT NOT NULL,
+                row         INTEGER,
+                payload     TEXT NOT NULL,
+                fp          TEXT NOT NULL,
+                http_status INTEGER,
+                body        TEXT NOT NULL,
+                error       TEXT NOT NULL,
+                attempts    INTEGER NOT NULL,
+                updated     REAL NOT NULL,
+                PRIMARY KEY (job_id, stage, email)
+            ) WITHOUT ROWID
+        """)
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._buf: List[tuple] = []
+        self._flush_every = flush_every
+
+    def add(self, job_id: str, listkey: str, csv_name: str, stage: str, rows: Iterable[Tuple[Optional[int], str, str, str]], err: Exception) -> None:
+        """Registra (fila, email, payload, fingerprint) que fallaron con `err`."""
+        status, body = error_details(err)
+        now = time.time()
+        with self._lock:
+            self._buf.extend(
+                (job_id, listkey, csv_name, stage, email, row, payload, fp, status, body, f"{type(err).__name__}: {err}"[:BODY_MAX], now)
+                for row, email, payload, fp in rows
+            )
+            due = len(self._buf) >= self._flush_every
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._buf:
+                self._db.executemany(
+                    "INSERT INTO failures (job_id, listkey, csv, stage, email, row, payload, fp, http_status, body, error, attempts, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT(job_id, stage, email) DO UPDATE SET payload = excluded.payload, fp = excluded.fp, "
+                    "http_status = excluded.http_status, body = excluded.body, error = excluded.error, "
+                    "attempts = attempts + 1, updated = excluded.updated",
+                    self._buf,
+                )
+                self._db.commit()
+                self._buf = []
+
+    def discard_job(self, job_id: str) -> None:
+        """Olvida los fallos de una carga (se van a reenviar en esta corrida)."""
+        self.flush()
+        with self._lock:
+            self._db.execute("DELETE FROM failures WHERE job_id = ?", (job_id,))
+            self._db.commit()
+
+    def resolve(self, listkey: str, stage: str, emails: Iterable[str]) -> None:
+        """Quita de la cola los contactos que un reintento logró cargar."""
+        self.flush()
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM failures WHERE listkey = ? AND stage = ? AND email = ?",
+                [(listkey, stage, e) for e in emails],
+            )
+            self._db.commit()
+
+    # --- lectura ---
+    def pending(self, listkey: str, stage: Optional[str] = None) -> List[Dict]:
+        """Fallos de una lista (uno por email y etapa, el más reciente), en orden de fila."""
+        self.flush()
+        cols = FIELDS + ["fp", "job_id"]
+        sql = f"SELECT {', '.join(cols)} FROM failures WHERE listkey = ?" + (" AND stage = ?" if stage else "")
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY updated", [listkey, stage] if stage else [listkey]).fetchall()
+        latest = {(r[2], r[4]): dict(zip(cols, r)) for r in rows}
+        return sorted(latest.values(), key=lambda r: (r["stage"], r["row"] if r["row"] is not None else -1))
+
+    def summary(self) -> List[Dict]:
+        """Una fila por lista: contactos fallidos por etapa y último fallo."""
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT listkey, GROUP_CONCAT(DISTINCT csv), stage, COUNT(DISTINCT email), MAX(updated) "
+                "FROM failures GROUP BY listkey, stage ORDER BY MAX(updated) DESC"
+            ).fetchall()
+        out: Dict[str, Dict] = {}
+        for listkey, csv_names, stage, n, updated in rows:
+            s = out.setdefault(listkey, {"listkey": listkey, "csv": csv_names, "bulk": 0, "enrich": 0, "updated": updated})
+            s[stage] = n
+            s["updated"] = max(s["updated"], updated)
+        return list(out.values())
+
+    def to_csv(self, *listkeys: str) -> bytes:
+        buf = io.StringIO()
+        w = csv.DictWriter(buf, fieldnames=FIELDS, extrasaction="ignore")
+        w.writeheader()
+        for listkey in listkeys:
+            w.writerows(self.pending(listkey))
+        return buf.getvalue().encode("utf-8")
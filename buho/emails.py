@@ -0,0 +1,99 @@
+"""
+Pre-chequeo de emails antes de subir: normaliza, valida y deduplica.
+
+Zoho rechaza o fusiona por su cuenta los emails inválidos o repetidos, pero
+cada uno ya gastó una llamada con rate-limit. Filtrarlos aquí, de forma
+vectorizada, ahorra esas llamadas.
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Set, Tuple
+
+import pandas as pd
+
+from buho.payloads import STR_DTYPE
+
+# Sintaxis práctica (no RFC 5322 completa): local@dominio.tld, sin espacios
+EMAIL_RE = re.compile(
+    r"^[a-z0-9.!#$%&'*+/=?^_`{|}~-]+"
+    r"@[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?"
+    r"(?:\.[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?)+$"
+)
+
+
+def normalize_emails(values: pd.Series) -> pd.Series:
+    """Minúsculas y sin espacios (tampoco internos, p.ej. "ana @x.com")."""
+    return values.astype(STR_DTYPE).fillna("").str.replace(r"\s+", "", regex=True).str.lower()
+
+
+def email_digests(emails: pd.Series) -> List[int]:
+    """
+    Huella de 64 bits de cada email (vectorizada). Es lo que guarda el set de
+    vistos: tamaño fijo por email, sin retener los strings de cada chunk. Con
+    n emails únicos la probabilidad de que dos compartan huella es ~n²/2⁶⁵.
+    """
+    return pd.util.hash_pandas_object(emails, index=False).tolist()
+
+
+@dataclass
+class PreflightStats:
+    rows: int = 0
+    legacy_sendable: int = 0   # filas que antes se enviaban (solo se pedía "@")
+    invalid: int = 0
+    duplicates: int = 0
+    kept: int = 0
+
+    def __iadd__(self, other: "PreflightStats") -> "PreflightStats":
+        self.rows += other.rows
+        self.legacy_sendable += other.legacy_sendable
+        self.invalid += other.invalid
+        self.duplicates += other.duplicates
+        self.kept += other.kept
+        return self
+
+    def calls_saved(self, batch_size: int, enrich: bool = True) -> int:
+        """Llamadas que ya no se hacen: lotes de bulk y, si hay enriquecimiento, upserts."""
+        saved = math.ceil(self.legacy_sendable / batch_size) - math.ceil(self.kept / batch_size)
+        if enrich:
+            saved += self.legacy_sendable - self.kept
+        return max(saved, 0)
+
+
+def preflight(frame: pd.DataFrame, email_col: str, seen: Set[int]) -> Tuple[pd.DataFrame, PreflightStats]:
+    """
+    Devuelve `frame` con la columna de email normalizada, solo con filas de
+    email válido y no visto antes (se conserva la primera aparición). `seen`
+    (huellas de email_digests) se actualiza, así que se puede usar a lo largo
+    de varios chunks.
+    """
+    raw = frame[email_col].astype(STR_DTYPE).fillna("")
+    emails = normalize_emails(raw)
+    valid = emails.str.match(EMAIL_RE).fillna(False).astype(bool)
+    out = frame.assign(**{email_col: emails})[valid]
+
+    # Set de Python: O(1) por email y sirve entre chunks (duplicated() no)
+    first = [not (h in seen or seen.add(h)) for h in email_digests(out[email_col])]
+    out = out[first]
+
+    stats = PreflightStats(
+        rows=len(frame),
+        legacy_sendable=int(raw.str.strip().str.contains("@", regex=False).sum()),
+        invalid=int((~valid).sum()),
+        duplicates=len(first) - len(out),
+        kept=len(out),
+    )
+    return out, stats
+
+
+def preflight_frames(frames: Iterable[pd.DataFrame], email_col: str, stats: PreflightStats) -> Iterator[pd.DataFrame]:
+    """
+    preflight() sobre cada frame/chunk, con un único set de vistos; acumula en
+    `stats`. Es lo único que crece con el archivo: unos 70 bytes por email
+    único (~70 MB por millón), no las filas ni los strings.
+    """
+    seen: Set[int] = set()
+    for f in frames:
+        out, s = preflight(f, email_col, seen)
+        stats += s
+        yield out
@@ -0,0 +1,323 @@
+"""
+Motor de carga concurrente: limitador de tasa compartido y pools de workers
+que envían lotes (bulk) y upserts (enriquecimiento) con un ZohoClient.
+"""
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import requests
+
+from buho.telemetry import WAIT, Telemetry
+from buho.zoho import ZohoClient
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE     = 10     # Zoho permite 1..10 emails por lote
+BULK_RPS       = 5.0    # peticiones/s de bulk (compartidas por todos los workers)
+BULK_WORKERS   = 4      # lotes en vuelo simultáneamente
+ENRICH_RPS     = 20.0   # upserts/s (presupuesto global del enriquecimiento)
+ENRICH_WORKERS = 8      # upserts en vuelo simultáneamente
+ENRICH_BATCH   = 50     # contactos por petición en el enriquecimiento en bloque
+
+
+class RateLimiter:
+    """
+    Token bucket thread-safe compartido por todos los workers.
+
+    - acquire(): bloquea hasta que haya un token disponible.
+    - throttle(wait): ante un 429, congela el bucket `wait` segundos para
+      todos los workers y reduce la tasa a la mitad (mínimo `min_rate`), una
+      sola vez por pausa: los 429 de peticiones que ya estaban en vuelo solo
+      alargan la pausa.
+    - success(): tras una respuesta 2xx, recupera la tasa poco a poco hasta
+      la nominal.
+
+    Con `parent` (p.ej. el limitador de la cuenta), cada petición necesita
+    además un token del padre, y los 429 y los éxitos también le llegan: un
+    tope propio más bajo dentro del presupuesto compartido.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        min_rate: float = 0.5,
+        name: str = "limiter",
+        telemetry: Optional[Telemetry] = None,
+        parent: Optional["RateLimiter"] = None,
+    ):
+        self.max_rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.rate = self.max_rate
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.name = name
+        self.telemetry = telemetry
+        self.parent = parent
+
+    def acquire(self) -> None:
+        t0 = time.perf_counter()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+        waited = time.perf_counter() - t0
+        if self.telemetry and waited > 1e-3:
+            self.telemetry.record(WAIT, f"sleep {self.name}", waited)
+        if self.parent:
+            self.parent.acquire()
+
+    def throttle(self, wait: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._paused_until:
+                self.rate = max(self.min_rate, self.rate / 2)
+            until = now + wait
+            if until > self._paused_until:
+                self._paused_until = until
+                self._tokens = 0.0
+                self._last = until
+        if self.parent:
+            self.parent.throttle(wait)
+
+    def success(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                # Incremento aditivo: ~10% de la tasa nominal por petición OK
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+        if self.parent:
+            self.parent.success()
+
+
+@dataclass
+class SendBudget:
+    """
+    Limitadores de una cuenta de Zoho. Varias cargas simultáneas (cargas de
+    distintas sesiones, las listas de un fan-out, reintentos) que usan el mismo
+    SendBudget se reparten BULK_RPS y ENRICH_RPS, y un 429 frena a todas, no
+    solo a la que lo recibió. SendBudget.of(client) es el de la cuenta de un
+    cliente: el que usan las cargas que no reciben uno.
+    """
+    bulk: RateLimiter
+    enrich: RateLimiter
+
+    @classmethod
+    def create(cls, telemetry: Optional[Telemetry] = None) -> "SendBudget":
+        return cls(
+            RateLimiter(BULK_RPS, burst=BULK_WORKERS, name="bulk", telemetry=telemetry),
+            RateLimiter(ENRICH_RPS, burst=ENRICH_WORKERS, name="enrich", telemetry=telemetry),
+        )
+
+    @classmethod
+    def of(cls, client: ZohoClient) -> "SendBudget":
+        with _budgets_lock:
+            budget = _budgets.get(client)
+            if budget is None:
+                budget = _budgets[client] = cls.create(client.telemetry)
+            return budget
+
+
+# Un SendBudget por ZohoClient (una cuenta), mientras el cliente exista
+_budgets: "weakref.WeakKeyDictionary[ZohoClient, SendBudget]" = weakref.WeakKeyDictionary()
+_budgets_lock = threading.Lock()
+
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    """Parte cualquier iterable en listas de `size` elementos (la última puede ser menor)."""
+    buf = []
+    for it in items:
+        buf.append(it)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def run_pool(
+    func: Callable,
+    items: Iterable,
+    workers: int,
+    name: str = "pool",
+) -> Iterator[Tuple[int, object, object, Optional[Exception]]]:
+    """
+    Ejecuta `func(item)` en un pool de `workers` hilos y produce
+    (índice, item, resultado, error) en el orden ORIGINAL de `items`.
+
+    Como mucho hay 2*workers items encolados: `items` se consume de forma
+    perezosa, así que puede ser un generador arbitrariamente largo que se va
+    produciendo mientras los workers envían lo anterior.
+    """
+    pending = deque()
+
+    def settle():
+        i, item, fut = pending.popleft()
+        try:
+            return i, item, fut.result(), None
+        except Exception as e:
+            return i, item, None, e
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+    try:
+        for i, item in enumerate(items):
+            pending.append((i, item, pool.submit(func, item)))
+            if len(pending) >= workers * 2:
+                yield settle()
+        while pending:
+            yield settle()
+    finally:
+        # Si el consumidor corta (st.stop, excepción), no seguir enviando
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def upload_batches(
+    client: ZohoClient,
+    listkey: str,
+    batches: Iterable[List[str]],
+    workers: Optional[int] = None,
+    limiter: Optional[RateLimiter] = None,
+    skip: Set[int] = frozenset(),
+) -> Iterator[Tuple[int, List[str], Optional[Dict], Optional[Exception]]]:
+    """
+    Sube lotes con `bulk_add_emails` usando un pool de `workers` hilos y un
+    RateLimiter compartido (en vez de dormir SLEEP fijo entre lotes).
+
+    Produce (índice, lote, respuesta, error) en el orden ORIGINAL de los lotes,
+    aunque terminen desordenados (ver run_pool). Los índices en `skip` (lotes
+    ya confirmados en una corrida anterior) no se envían ni se producen.
+    """
+    workers = workers or BULK_WORKERS
+    limiter = limiter or RateLimiter(BULK_RPS, burst=workers, name="bulk", telemetry=client.telemetry)
+    todo = ((i, b) for i, b in enumerate(batches) if i not in skip)
+    results = run_pool(lambda ib: client.bulk_add_emails(listkey, ib[1], limiter), todo, workers, name="bulk")
+    return ((i, b, resp, err) for _, (i, b), resp, err in results)
+
+
+def enrich_contacts(
+    client: ZohoClient,
+    listkey: str,
+    contacts: Iterable,
+    workers: Optional[int] = None,
+    limiter: Optional[RateLimiter] = None,
+) -> Iterator[Tuple[int, object, Optional[Dict], Optional[Exception]]]:
+    """
+    Envía cada contactinfo con `upsert_contact_fields` desde un pool de workers
+    bajo un presupuesto global de ENRICH_RPS peticiones/s.
+
+    `contacts` produce tuplas (clave, contactinfo) donde contactinfo es un dict
+    o un payload ya codificado en JSON; la clave se devuelve intacta
+    para que el caller sepa a qué fila corresponde cada resultado.
+    """
+    workers = workers or ENRICH_WORKERS
+    limiter = limiter or RateLimiter(ENRICH_RPS, burst=workers, name="enrich", telemetry=client.telemetry)
+    return run_pool(lambda item: client.upsert_contact_fields(listkey, item[1], limiter), contacts, workers, name="enrich")
+
+
+def group_by_fields(contacts: Iterable, size: int) -> Iterator[List]:
+    """
+    Agrupa tuplas (clave, contactinfo JSON, …) por conjunto de campos no
+    vacíos, en grupos de hasta `size`. Los grupos incompletos salen al final.
+    """
+    groups: Dict[tuple, List] = {}
+    for item in contacts:
+        key = tuple(json.loads(item[1]))
+        group = groups.setdefault(key, [])
+        group.append(item)
+        if len(group) >= size:
+            yield groups.pop(key)
+    yield from groups.values()
+
+
+def enrich_contacts_batched(
+    client: ZohoClient,
+    listkey: str,
+    contacts: Iterable,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    limiter: Optional[RateLimiter] = None,
+) -> Iterator[Tuple[object, bool, Optional[Exception]]]:
+    """
+    Como enrich_contacts, pero envía grupos de contactos con el mismo conjunto
+    de campos en una sola petición (client.upsert_contacts). Solo las filas que
+    Zoho rechaza, o todo el grupo si la petición falla, se reintentan una por
+    una con upsert_contact_fields. Si la cuenta no acepta el import
+    multi-contacto, el resto de la carga sigue por contacto.
+
+    El import multi-contacto se deja de usar ante el primer fallo que no es
+    pasajero (endpoint ausente, cuerpo con error, respuesta que no se
+    entiende): se repetiría en cada grupo. Tras un 5xx o un error de red solo
+    ese grupo va por contacto.
+
+    Produce (item, por_contacto, error) por cada contacto, en orden de grupo
+    (no en el orden original de las filas).
+    """
+    batch_size = batch_size or ENRICH_BATCH
+    workers = workers or ENRICH_WORKERS
+    limiter = limiter or RateLimiter(ENRICH_RPS, burst=workers, name="enrich", telemetry=client.telemetry)
+    batch_ok = threading.Event()
+    batch_ok.set()
+    lock = threading.Lock()
+
+    def disable(err: Exception) -> None:
+        with lock:
+            if batch_ok.is_set():
+                batch_ok.clear()
+                log.warning("Import multi-contacto desactivado; se sigue contacto por contacto: %s", err)
+
+    def single(item):
+        try:
+            client.upsert_contact_fields(listkey, item[1], limiter)
+            return item, True, None
+        except Exception as e:
+            return item, True, e
+
+    def send(group: List) -> List:
+        if batch_ok.is_set():
+            try:
+                failed = set(client.upsert_contacts(listkey, [it[1] for it in group], limiter))
+                return [single(it) if i in failed else (it, False, None) for i, it in enumerate(group)]
+            except Exception as e:
+                if not _transient(e):
+                    disable(e)
+        return [single(it) for it in group]
+
+    for _, _group, results, _err in run_pool(send, group_by_fields(contacts, batch_size), workers, name="enrich"):
+        yield from results
+
+
+def _transient(err: Exception) -> bool:
+    """Un 5xx o un fallo de red; un 4xx, un rechazo en el cuerpo o un JSON inválido se repetirían."""
+    if isinstance(err, requests.HTTPError):
+        return err.response is None or err.response.status_code >= 500
+    return isinstance(err, requests.RequestException) and not isinstance(err, ValueError)
+
+
+def rate_eta_text(label: str, done: int, total: int, t0: float) -> str:
+    """Texto de progreso con throughput (filas/s) y ETA desde `t0` (time.monotonic)."""
+    elapsed = max(time.monotonic() - t0, 1e-6)
+    rate = done / elapsed
+    if rate > 0 and total > done:
+        eta = int((total - done) / rate)
+        eta_txt = f"ETA {eta // 3600:d}:{eta % 3600 // 60:02d}:{eta % 60:02d}"
+    else:
+        eta_txt = "ETA —"
+    return f"{label} {done}/{total} · {rate:.1f} filas/s · {eta_txt}"
@@ -0,0 +1,135 @@
+"""
+Fan-out: el mismo CSV, o particiones de él según una columna (región,
+segmento…), a varias listas de Zoho en una sola carga.
+
+Cada lista destino es una parte de la carga con su propio ImportSpec: todas
+las filas, o solo las de ciertos valores de la columna de partición. Las
+partes corren a la vez (hasta FANOUT_LISTS) bajo un único SendBudget: el
+límite de peticiones de la cuenta se reparte entre las listas en vez de
+multiplicarse por ellas. El avance de la carga es la suma del de sus partes
+(ver JobStatus.add_part) y cada parte tiene su propia bitácora y cola de fallos.
+"""
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from buho.deadletter import DeadLetterStore
+from buho.emails import PreflightStats
+from buho.engine import BULK_WORKERS, ENRICH_WORKERS, SendBudget
+from buho.fingerprints import FingerprintStore
+from buho.ingest import content_hash, own_source
+from buho.jobs import CANCELLED, FAILED, JobStatus
+from buho.journal import ImportJournal
+from buho.pipeline import ImportSpec, delta_rows, plan_text, run_import
+from buho.planner import duration_text, observed_latency, plan_import, workload_from_rows
+from buho.zoho import ZohoClient
+
+FANOUT_LISTS = 3   # listas que se cargan a la vez
+
+
+def connection_pool_size(lists: int = FANOUT_LISTS) -> int:
+    """
+    Conexiones keep-alive por host para cargar `lists` listas a la vez, cada
+    una con sus workers de bulk y de enriquecimiento. Con un pool menor,
+    urllib3 descarta las conexiones que sobran y las peticiones siguientes
+    abren conexiones (y handshakes TLS) nuevas.
+    """
+    return max(lists, 1) * (BULK_WORKERS + ENRICH_WORKERS)
+
+
+@dataclass
+class FanoutTarget:
+    """Una lista destino (existente o a crear) y las filas que recibe."""
+    label: str
+    listkey: Optional[str] = None
+    new_list: Optional[Dict[str, str]] = None   # {"listname", "description", "signupform"}
+    values: Optional[List[str]] = None          # valores de la columna de partición; None: todas las filas
+
+
+def part_spec(spec: ImportSpec, target: FanoutTarget, partition_col: Optional[str] = None) -> ImportSpec:
+    """El ImportSpec de una lista: su destino, sus filas y su propia lectura del CSV."""
+    return dataclasses.replace(
+        spec,
+        listkey=target.listkey,
+        new_list=target.new_list,
+        partition_col=partition_col if target.values is not None else None,
+        partition_values=list(target.values or []),
+        source=own_source(spec.source) if spec.source is not None else None,
+        workload=None,
+    )
+
+
+def import_part(
+    status: JobStatus,
+    client: ZohoClient,
+    spec: ImportSpec,
+    journal: ImportJournal,
+    fp_store: FingerprintStore,
+    deadletters: Optional[DeadLetterStore],
+    budget: SendBudget,
+    plan: bool,
+) -> Dict:
+    """Una lista del fan-out: (planificar sus filas) → run_import bajo el presupuesto compartido."""
+    if plan:
+        status.set_phase("Planificando…")
+        stats = PreflightStats()
+        spec.workload = workload_from_rows(delta_rows(spec, fp_store, spec.listkey, stats))
+        spec.total_emails = stats.kept
+        p = plan_import(spec.workload, spec.enrich_batch, observed_latency(client.http.endpoint_stats()))
+        spec.strategy = p.strategy
+        status.log(f"{stats.kept} contactos · {plan_text(p)} · ~{duration_text(p.seconds)} con todo el presupuesto")
+    return run_import(status, client, spec, journal, fp_store, deadletters, budget)
+
+
+def run_fanout(
+    status: JobStatus,
+    client: ZohoClient,
+    spec: ImportSpec,
+    targets: List[FanoutTarget],
+    journal: ImportJournal,
+    fp_store: FingerprintStore,
+    deadletters: Optional[DeadLetterStore] = None,
+    partition_col: Optional[str] = None,
+    plan: bool = True,
+    lists: int = FANOUT_LISTS,
+) -> Dict:
+    """
+    Carga `spec` en cada destino de `targets`, hasta `lists` a la vez, todas
+    bajo el SendBudget de la cuenta. Con plan=True cada lista usa la estrategia que
+    el planificador estima para sus filas; si no, la de `spec`. Una lista que
+    falla no detiene a las demás.
+    """
+    if spec.csv_hash is None:
+        # Una sola vez: todas las partes lo usan en su clave de bitácora
+        spec = dataclasses.replace(spec, csv_hash=content_hash(spec.source))
+    budget = SendBudget.of(client)
+    concurrent = max(min(lists, len(targets)), 1)
+    status.set_phase(f"Cargando {len(targets)} listas ({concurrent} a la vez)…")
+    status.set(lists_total=len(targets), lists_done=0)
+    status.log(f"Presupuesto de la cuenta compartido por todas las listas: {budget.bulk.max_rate:g} lotes/s y {budget.enrich.max_rate:g} upserts/s")
+    parts = [(t, status.add_part(t.label)) for t in targets]
+
+    def load(item):
+        target, part = item
+        if status.cancelled:
+            part.state = CANCELLED
+        else:
+            part.execute(import_part, client, part_spec(spec, target, partition_col), journal, fp_store, deadletters, budget, plan)
+        status.incr("lists_done")
+
+    with ThreadPoolExecutor(max_workers=concurrent, thread_name_prefix="fanout") as pool:
+        for _ in pool.map(load, parts):
+            pass
+
+    results = [
+        {"list": t.label, "listkey": p.result.get("listkey", t.listkey), "state": p.state,
+         "updated": p.result.get("updated", 0), "errors": p.result.get("errors", 0), "error": p.error}
+        for t, p in parts
+    ]
+    failed = [r for r in results if r["state"] == FAILED]
+    updated, errors = sum(r["updated"] for r in results), sum(r["errors"] for r in results)
+    status.log(f"Fan-out: {len(results) - len(failed)}/{len(results)} listas · Contactos cargados = {updated} · Errores = {errors}")
+    for r in failed:
+        status.log(f"La lista «{r['list']}» falló: {r['error']}", "error")
+    return {"lists": results, "updated": updated, "errors": errors, "failed_lists": len(failed)}
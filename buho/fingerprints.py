@@ -0,0 +1,114 @@
+"""
+Huellas por lista para sincronización incremental.
+
+Por cada (listkey, email) se guarda un hash del contactinfo que Zoho confirmó.
+En la siguiente carga de la misma lista, cada fila se clasifica como nueva,
+con cambios o sin cambios, y solo se envía lo que cambió.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from buho import DATA_DIR
+
+FINGERPRINTS_PATH = os.path.join(DATA_DIR, "fingerprints.sqlite")
+
+DELTA_NEW     = "new"       # email que nunca se cargó a esta lista
+DELTA_CHANGED = "changed"   # ya cargado, pero con otros valores mapeados
+DELTA_SAME    = "same"      # idéntico a lo ya confirmado: se omite
+
+_SQL_VARS = 500   # emails por consulta IN (...), bajo el límite de SQLite
+
+
+def fingerprint(payload: str) -> str:
+    """Hash del contactinfo ya codificado (incluye email y todos los campos mapeados)."""
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class DeltaStats:
+    new: int = 0
+    changed: int = 0
+    same: int = 0
+
+    def add(self, statuses: Iterable[str]) -> None:
+        for s in statuses:
+            setattr(self, s, getattr(self, s) + 1)
+
+
+class FingerprintStore:
+    """Tabla (listkey, email) -> fingerprint en SQLite; thread-safe, escrituras en buffer."""
+
+    def __init__(self, path: str = FINGERPRINTS_PATH, flush_every: int = 500):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                listkey TEXT NOT NULL,
+                email   TEXT NOT NULL,
+                fp      TEXT NOT NULL,
+                PRIMARY KEY (listkey, email)
+            ) WITHOUT ROWID
+        """)
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._buf: List[Tuple[str, str, str]] = []
+        self._flush_every = flush_every
+
+    def lookup(self, listkey: str, emails: List[str]) -> Dict[str, str]:
+        self.flush()
+        found = {}
+        with self._lock:
+            for i in range(0, len(emails), _SQL_VARS):
+                part = emails[i:i + _SQL_VARS]
+                rows = self._db.execute(
+                    f"SELECT email, fp FROM fingerprints WHERE listkey = ? AND email IN ({','.join('?' * len(part))})",
+                    [listkey, *part],
+                )
+                found.update(rows.fetchall())
+        return found
+
+    def diff(self, listkey: str, emails: List[str], payloads: List[str]) -> Tuple[List[str], List[str]]:
+        """Estado delta y fingerprint de cada (email, payload)."""
+        fps = [fingerprint(p) for p in payloads]
+        known = self.lookup(listkey, emails)
+        statuses = [
+            DELTA_NEW if e not in known else (DELTA_SAME if known[e] == fp else DELTA_CHANGED)
+            for e, fp in zip(emails, fps)
+        ]
+        return statuses, fps
+
+    def record(self, listkey: str, pairs: Iterable[Tuple[str, str]]) -> None:
+        """Guarda (email, fingerprint) ya confirmados por Zoho."""
+        with self._lock:
+            self._buf.extend((listkey, e, fp) for e, fp in pairs)
+            due = len(self._buf) >= self._flush_every
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._buf:
+                self._db.executemany(
+                    "INSERT INTO fingerprints (listkey, email, fp) VALUES (?, ?, ?) "
+                    "ON CONFLICT(listkey, email) DO UPDATE SET fp = excluded.fp",
+                    self._buf,
+                )
+                self._db.commit()
+                self._buf = []
+
+    def count(self, listkey: str) -> int:
+        self.flush()
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM fingerprints WHERE listkey = ?", (listkey,)).fetchone()[0]
+
+    def forget(self, listkey: str) -> None:
+        with self._lock:
+            self._buf = [b for b in self._buf if b[0] != listkey]
+            self._db.execute("DELETE FROM fingerprints WHERE listkey = ?", (listkey,))
+            self._db.commit()
@@ -0,0 +1,134 @@
+"""
+Cliente HTTP compartido para todas las llamadas a Zoho.
+
+Una sola requests.Session con pool de conexiones keep-alive (evita un
+handshake TCP+TLS por petición), reintentos a nivel de transporte para
+errores de conexión y 502/503/504, e instrumentación: tasa de reutilización
+de conexiones y latencia por endpoint.
+"""
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from buho.telemetry import HTTP, Telemetry
+
+POOL_CONNECTIONS = 4     # hosts distintos con pool propio (accounts, campaigns…)
+POOL_MAXSIZE     = 16    # conexiones keep-alive por host
+HTTP_RETRIES     = 3     # reintentos de transporte (no incluye 429: ver RateLimiter)
+LATENCY_SAMPLES  = 1000  # últimas latencias guardadas por endpoint (para percentiles)
+
+# /emailapi/v2/templates/123456 -> /emailapi/v2/templates/{id}
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_name(url: str) -> str:
+    return _ID_SEGMENT.sub("/{id}", urlsplit(url).path)
+
+
+class ZohoHttp:
+    """
+    requests.Session con pool y métricas. Es thread-safe: la usan a la vez
+    todos los workers de carga y enriquecimiento.
+
+    Los reintentos de transporte cubren fallos de conexión (la petición no
+    llegó) y 502/503/504; no se reintentan lecturas cortadas para no duplicar
+    POSTs que Zoho sí pudo haber procesado.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+        retries: int = HTTP_RETRIES,
+        backoff: float = 0.5,
+        telemetry: Optional[Telemetry] = None,
+    ):
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=None,          # también POST: 502/503/504 no llegan a procesarse
+            backoff_factor=backoff,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+        self._lock = threading.Lock()
+        self._latency: Dict[str, deque] = {}
+        self._counts: Dict[str, Dict[str, float]] = {}
+        # Eventos por petición (status, bytes, duración) para el panel de telemetría
+        self.telemetry = telemetry or Telemetry()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        t0 = time.perf_counter()
+        status, sent, recv = None, 0, 0
+        try:
+            r = self.session.request(method, url, **kwargs)
+            status = r.status_code
+            sent, recv = len(r.request.body or b""), len(r.content)
+            return r
+        finally:
+            key = f"{method} {endpoint_name(url)}"
+            elapsed = time.perf_counter() - t0
+            self._record(key, elapsed, status)
+            self.telemetry.record(HTTP, key, elapsed, status, sent, recv)
+
+    def _record(self, key: str, elapsed: float, status) -> None:
+        with self._lock:
+            c = self._counts.setdefault(key, {"requests": 0, "errors": 0, "total_s": 0.0, "max_s": 0.0})
+            c["requests"] += 1
+            c["total_s"] += elapsed
+            c["max_s"] = max(c["max_s"], elapsed)
+            if status is None or status >= 400:
+                c["errors"] += 1
+            self._latency.setdefault(key, deque(maxlen=LATENCY_SAMPLES)).append(elapsed)
+
+    def endpoint_stats(self) -> List[Dict]:
+        """Una fila por endpoint: peticiones, errores y latencia media/p50/p95/p99/máx en ms."""
+        with self._lock:
+            rows = []
+            for key, c in sorted(self._counts.items()):
+                samples = sorted(self._latency[key])
+                pct = lambda q: samples[min(int(q * len(samples)), len(samples) - 1)] * 1000
+                rows.append({
+                    "endpoint": key,
+                    "requests": int(c["requests"]),
+                    "errors": int(c["errors"]),
+                    "avg_ms": round(c["total_s"] / c["requests"] * 1000, 1),
+                    "p50_ms": round(pct(0.50), 1),
+                    "p95_ms": round(pct(0.95), 1),
+                    "p99_ms": round(pct(0.99), 1),
+                    "max_ms": round(c["max_s"] * 1000, 1),
+                })
+            return rows
+
+    def connection_stats(self) -> Dict:
+        """
+        Conexiones abiertas vs. peticiones servidas, según los contadores de
+        urllib3. reuse_rate = 1 - conexiones nuevas / peticiones.
+        """
+        new_conns = served = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():          # keys() copia bajo lock; iterar directo no es thread-safe
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            new_conns += pool.num_connections
+            served += pool.num_requests
+        return {
+            "requests": served,
+            "new_connections": new_conns,
+            "reuse_rate": (1 - new_conns / served) if served else 0.0,
+        }
@@ -0,0 +1,141 @@
+"""
+Lectura de CSV por partes para archivos muy grandes.
+
+La codificación se detecta una sola vez con una muestra de bytes, y el archivo
+se recorre en chunks de CSV_CHUNK_ROWS filas conservando solo las columnas
+mapeadas como str. Así la memoria pico no depende del tamaño del archivo.
+
+Un CSV ya cargado en memoria se recorre igual: se proyectan las columnas
+mapeadas como strings Arrow (compact_frame) y se corta en rebanadas sin copia
+(iter_slices).
+"""
+import codecs
+import hashlib
+import io
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Sequence, Union
+
+import pandas as pd
+
+from buho.payloads import STR_DTYPE
+
+CSV_CHUNK_ROWS = 50_000      # filas por chunk
+SAMPLE_BYTES   = 1 << 16     # bytes leídos para detectar la codificación
+PREVIEW_ROWS   = 1_000       # filas leídas para vista previa / mapeo
+
+CsvSource = Union[str, os.PathLike, BinaryIO]
+
+
+@contextmanager
+def _open(src: CsvSource):
+    """Abre una ruta, o rebobina un archivo ya abierto (p.ej. UploadedFile)."""
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, "rb") as fh:
+            yield fh
+    else:
+        src.seek(0)
+        try:
+            yield src
+        finally:
+            src.seek(0)
+
+
+def own_source(src: CsvSource) -> CsvSource:
+    """
+    La misma fuente con posición de lectura propia, para recorrer el CSV desde
+    varios hilos a la vez: las rutas se abren en cada lectura y los buffers en
+    memoria se comparten sin copiarse.
+    """
+    if isinstance(src, (str, os.PathLike)):
+        return src
+    if isinstance(src, io.BytesIO):
+        return io.BytesIO(src.getvalue())
+    return src.name
+
+
+def detect_encoding(src: CsvSource, sample_bytes: int = SAMPLE_BYTES) -> str:
+    """utf-8 (con o sin BOM) si la muestra decodifica; si no, latin-1."""
+    with _open(src) as fh:
+        sample = fh.read(sample_bytes)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False: la muestra puede cortar un carácter multibyte al final
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def _read_csv(fh: BinaryIO, encoding: str, **kwargs):
+    return pd.read_csv(fh, encoding=encoding, dtype=str, keep_default_na=False, **kwargs)
+
+
+def read_csv_sample(src: CsvSource, encoding: str, nrows: int = PREVIEW_ROWS) -> pd.DataFrame:
+    """Primeras `nrows` filas (todas las columnas) para vista previa y mapeo."""
+    with _open(src) as fh:
+        return _read_csv(fh, encoding, nrows=nrows)
+
+
+def estimate_rows(src: CsvSource, block: int = 1 << 20) -> int:
+    """
+    Cuenta filas por saltos de línea sin parsear el CSV. Es una estimación
+    (un campo entrecomillado con saltos de línea cuenta de más); sirve para
+    barras de progreso.
+    """
+    lines, last = 0, b"\n"
+    with _open(src) as fh:
+        while True:
+            buf = fh.read(block)
+            if not buf:
+                break
+            lines += buf.count(b"\n")
+            last = buf[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)  # sin la cabecera
+
+
+def iter_csv_chunks(
+    src: CsvSource,
+    encoding: str,
+    usecols: Optional[Sequence[str]] = None,
+    chunksize: int = CSV_CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Recorre el CSV en DataFrames de `chunksize` filas, solo con `usecols`, todo como str."""
+    with _open(src) as fh:
+        with _read_csv(fh, encoding, usecols=list(usecols) if usecols else None, chunksize=chunksize) as reader:
+            yield from reader
+
+
+def compact_frame(df: pd.DataFrame, cols: Sequence[str]) -> pd.DataFrame:
+    """
+    Solo las columnas `cols`, como strings respaldados por Arrow. Las que ya
+    lo son se comparten con `df` (sin copiar los buffers).
+    """
+    return pd.DataFrame(
+        {c: df[c] if df[c].dtype == STR_DTYPE else df[c].astype(STR_DTYPE) for c in cols},
+        index=df.index, copy=False,
+    )
+
+
+def iter_slices(df: pd.DataFrame, rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Rebanadas de `rows` filas con el índice original. Con columnas Arrow son
+    vistas de los mismos buffers: ni copia ni listas de Python por fila.
+    """
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def content_hash(src: CsvSource, block: int = 1 << 20) -> str:
+    """sha256 del contenido del CSV, leído por bloques (no carga el archivo entero)."""
+    h = hashlib.sha256()
+    with _open(src) as fh:
+        while True:
+            buf = fh.read(block)
+            if not buf:
+                break
+            h.update(buf)
+    return h.hexdigest()
@@ -0,0 +1,196 @@
+"""
+Ejecución de cargas en segundo plano, fuera del ciclo de reruns de Streamlit.
+
+Un JobRunner por proceso ejecuta las cargas en su propio pool de hilos; cada
+carga publica su avance en un JobStatus que la UI (de cualquier sesión) solo
+lee. Así la carga no depende de la conexión del navegador y los reruns no
+esperan a la red.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+IMPORT_JOBS = 4       # cargas simultáneas por proceso
+KEEP_FINISHED = 50    # cargas terminadas que se conservan para consulta
+LOG_LINES = 200       # últimas líneas de log por carga
+
+log = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobStatus:
+    """
+    Estado observable de una carga. El hilo de la carga escribe; la UI lee con
+    counters()/tail(). cancel() pide detenerse: el pipeline lo consulta entre envíos.
+
+    Una carga puede tener partes (add_part, p.ej. una por lista en un fan-out):
+    comparten la cancelación, su log se copia aquí con el título de la parte y
+    counters() suma los contadores de todas.
+    """
+
+    def __init__(self, title: str, owner: str = ""):
+        self.id = uuid.uuid4().hex[:8]
+        self.title = title
+        self.owner = owner
+        self.state = QUEUED
+        self.phase = ""
+        self.error: Optional[str] = None
+        self.result: Dict = {}
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._counters: Dict[str, float] = {}
+        self._phases: List[tuple] = []   # (inicio, fase)
+        self._stages: Dict[str, float] = {}   # etapa con avance propio (bulk, enrich) -> inicio
+        self._log: deque = deque(maxlen=LOG_LINES)
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._parts: List["JobStatus"] = []
+        self._parent: Optional["JobStatus"] = None
+
+    # --- escritura (hilo de la carga) ---
+    def set_phase(self, phase: str) -> None:
+        self.phase = phase
+        with self._lock:
+            self._phases.append((time.time(), phase))
+        self.log(phase)
+
+    def log(self, msg: str, level: str = "info") -> None:
+        # También a `logging`, para corridas sin UI (cron, CLI)
+        log.log(logging.getLevelName(level.upper()), "[%s] %s", self.id, msg)
+        self._append(time.time(), level, msg)
+
+    def _append(self, ts: float, level: str, msg: str) -> None:
+        with self._lock:
+            self._log.append((ts, level, msg))
+        if self._parent is not None:
+            self._parent._append(ts, level, f"[{self.title}] {msg}")
+
+    def start_stage(self, stage: str) -> None:
+        """Marca el inicio de una etapa con contadores propios, para medir su ritmo (ver stage_elapsed)."""
+        with self._lock:
+            self._stages[stage] = time.time()
+
+    def set(self, **counters: float) -> None:
+        with self._lock:
+            self._counters.update(counters)
+
+    def incr(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def add_part(self, title: str) -> "JobStatus":
+        part = JobStatus(title, self.owner)
+        part._cancel = self._cancel
+        part._parent = self
+        with self._lock:
+            self._parts.append(part)
+        return part
+
+    def execute(self, fn: Callable[..., Dict], *args) -> None:
+        """Corre `fn(self, *args)` en este hilo y deja estado, resultado o error."""
+        self.state, self.started = RUNNING, time.time()
+        try:
+            self.result = fn(self, *args) or {}
+            self.state = CANCELLED if self.cancelled else DONE
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.log(self.error, "error")
+            self.state = FAILED
+        finally:
+            self.finished = time.time()
+
+    # --- control ---
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def running(self) -> bool:
+        return self.state in (QUEUED, RUNNING)
+
+    # --- lectura (UI) ---
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            out, parts = dict(self._counters), list(self._parts)
+        for part in parts:
+            for k, v in part.counters().items():
+                out[k] = out.get(k, 0) + v
+        return out
+
+    def stage_started(self, stage: str) -> Optional[float]:
+        """Inicio de `stage` aquí o en la primera parte que llegó a ella."""
+        with self._lock:
+            starts, parts = [self._stages[stage]] if stage in self._stages else [], list(self._parts)
+        starts += [t for t in (p.stage_started(stage) for p in parts) if t is not None]
+        return min(starts) if starts else None
+
+    def stage_elapsed(self, stage: str) -> float:
+        """Segundos en `stage` hasta ahora (o hasta el fin de la carga)."""
+        t0 = self.stage_started(stage)
+        if t0 is None:
+            return 0.0
+        return (self.finished or time.time()) - t0
+
+    def parts(self) -> List["JobStatus"]:
+        with self._lock:
+            return list(self._parts)
+
+    def tail(self, n: int = 20) -> List[tuple]:
+        with self._lock:
+            return list(self._log)[-n:]
+
+    def phase_times(self) -> Dict[str, float]:
+        """Segundos en cada fase (la actual cuenta hasta ahora)."""
+        with self._lock:
+            marks = list(self._phases)
+        end = self.finished or time.time()
+        out: Dict[str, float] = {}
+        for (t0, phase), (t1, _) in zip(marks, marks[1:] + [(end, "")]):
+            out[phase] = out.get(phase, 0.0) + (t1 - t0)
+        return out
+
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobRunner:
+    """Pool de hilos compartido por todas las sesiones, con registro de cargas."""
+
+    def __init__(self, max_workers: int = IMPORT_JOBS, keep_finished: int = KEEP_FINISHED):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import")
+        self._jobs: "OrderedDict[str, JobStatus]" = OrderedDict()
+        self._keep = keep_finished
+        self._lock = threading.Lock()
+
+    def submit(self, title: str, fn: Callable[..., Dict], *args, owner: str = "") -> JobStatus:
+        """Encola `fn(status, *args)`; lo que devuelva queda en status.result."""
+        status = JobStatus(title, owner)
+        with self._lock:
+            self._jobs[status.id] = status
+            self._prune()
+        self._pool.submit(status.execute, fn, *args)
+        return status
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if not j.running]
+        for j in finished[:max(len(finished) - self._keep, 0)]:
+            del self._jobs[j.id]
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner: Optional[str] = None) -> List[JobStatus]:
+        with self._lock:
+            return [j for j in self._jobs.values() if owner is None or j.owner == owner]
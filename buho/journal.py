@@ -0,0 +1,107 @@
+"""
+Bitácora persistente (SQLite) de lo que Zoho ya confirmó en cada carga.
+
+Una carga se identifica por (hash del CSV, listkey, mapeo). Para cada una se
+guardan los índices de lote del bulk y las posiciones de fila del
+enriquecimiento que ya respondieron OK, de modo que al reanudar tras un
+rerun/recarga se salta todo lo confirmado.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Set
+
+from buho import DATA_DIR
+
+JOURNAL_PATH = os.path.join(DATA_DIR, "journal.sqlite")
+
+STAGE_BULK   = "bulk"     # índice de lote en addlistsubscribersinbulk
+STAGE_ENRICH = "enrich"   # posición de fila en json/listsubscribe
+
+
+def job_key(csv_hash: str, listkey: str, mapping: Dict) -> str:
+    """Id estable de una carga: mismo CSV + misma lista + mismo mapeo."""
+    raw = json.dumps([csv_hash, listkey, mapping], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ImportJournal:
+    """
+    Registro append-only de índices confirmados. Es thread-safe; las marcas se
+    acumulan en memoria y se escriben en una transacción cada `flush_every`
+    índices o `flush_secs` segundos (y siempre en flush()).
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH, flush_every: int = 500, flush_secs: float = 1.0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id  TEXT PRIMARY KEY,
+                meta    TEXT NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS done (
+                job_id TEXT NOT NULL,
+                stage  TEXT NOT NULL,
+                idx    INTEGER NOT NULL,
+                PRIMARY KEY (job_id, stage, idx)
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._buf = []
+        self._flush_every = flush_every
+        self._flush_secs = flush_secs
+        self._last_flush = time.monotonic()
+
+    def start(self, job_id: str, meta: Dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (job_id, meta, created, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET updated = excluded.updated",
+                (job_id, json.dumps(meta, ensure_ascii=False), now, now),
+            )
+            self._db.commit()
+
+    def done(self, job_id: str, stage: str) -> Set[int]:
+        self.flush()
+        with self._lock:
+            rows = self._db.execute("SELECT idx FROM done WHERE job_id = ? AND stage = ?", (job_id, stage))
+            return {r[0] for r in rows}
+
+    def counts(self, job_id: str) -> Dict[str, int]:
+        self.flush()
+        with self._lock:
+            rows = self._db.execute("SELECT stage, COUNT(*) FROM done WHERE job_id = ? GROUP BY stage", (job_id,))
+            return dict(rows.fetchall())
+
+    def mark(self, job_id: str, stage: str, idxs: Iterable[int]) -> None:
+        with self._lock:
+            self._buf.extend((job_id, stage, int(i)) for i in idxs)
+            due = len(self._buf) >= self._flush_every or time.monotonic() - self._last_flush >= self._flush_secs
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._buf:
+                self._db.executemany("INSERT OR IGNORE INTO done (job_id, stage, idx) VALUES (?, ?, ?)", self._buf)
+                self._db.execute("UPDATE jobs SET updated = ? WHERE job_id = ?", (time.time(), self._buf[-1][0]))
+                self._db.commit()
+                self._buf = []
+            self._last_flush = time.monotonic()
+
+    def reset(self, job_id: str) -> None:
+        """Olvida lo confirmado para empezar la carga de cero."""
+        with self._lock:
+            self._buf = [b for b in self._buf if b[0] != job_id]
+            self._db.execute("DELETE FROM done WHERE job_id = ?", (job_id,))
+            self._db.commit()
@@ -0,0 +1,101 @@
+"""
+Paginación automática de endpoints de catálogo (listas, plantillas).
+
+Los endpoints de Zoho no informan el total: una página llena indica que puede
+haber más. A partir de ahí se piden las siguientes `workers` páginas en
+paralelo y se corta en la primera página incompleta.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+PAGE_WORKERS = 4      # páginas pedidas en paralelo
+MAX_PAGES    = 500    # tope de seguridad si un endpoint ignora la paginación
+
+
+def iter_pages(
+    fetch_page: Callable[[int, int], List],
+    page_size: int,
+    workers: int = PAGE_WORKERS,
+    max_pages: int = MAX_PAGES,
+) -> Iterator[List]:
+    """
+    `fetch_page(start, size)` devuelve los items desde `start` (base 1).
+    Produce las páginas en orden; como mucho se desperdician `workers - 1`
+    peticiones especulativas tras la última página.
+    """
+    first = fetch_page(1, page_size)
+    yield first
+    if len(first) < page_size:
+        return
+    start, fetched = 1 + page_size, 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pages") as pool:
+        while fetched < max_pages:
+            n = min(workers, max_pages - fetched)
+            futs = [pool.submit(fetch_page, start + k * page_size, page_size) for k in range(n)]
+            start += n * page_size
+            fetched += n
+            for f in futs:
+                page = f.result()
+                if page:
+                    yield page
+                if len(page) < page_size:
+                    for rest in futs:
+                        rest.cancel()
+                    return
+
+
+class BackgroundPages:
+    """
+    Recorre un iterador de páginas en un hilo de fondo. `items` crece a medida
+    que llegan las páginas (cada lectura ve una lista completa, nunca una a
+    medio construir); `done` y `error` indican el final.
+    """
+
+    def __init__(self, pages: Optional[Iterator[List]] = None, on_done: Optional[Callable[[List], None]] = None):
+        self.items: List = []
+        self.error: Optional[Exception] = None
+        self.done = pages is None
+        if pages is not None:
+            threading.Thread(target=self._run, args=(pages, on_done), daemon=True, name="pages-bg").start()
+
+    @classmethod
+    def finished(cls, items: List) -> "BackgroundPages":
+        bp = cls()
+        bp.items = items
+        return bp
+
+    def _run(self, pages, on_done) -> None:
+        try:
+            for page in pages:
+                self.items = self.items + page
+            if on_done:
+                on_done(self.items)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+
+class LoaderRegistry:
+    """Una carga en curso por clave, compartida entre sesiones/reruns."""
+
+    def __init__(self):
+        self._loaders: Dict[str, BackgroundPages] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, start: Callable[[], BackgroundPages]) -> BackgroundPages:
+        """
+        Carga en curso (o la última, si falló) para `key`; arranca una nueva si
+        no hay o si la anterior terminó bien (su resultado ya expiró de la caché).
+        Una carga fallida se conserva para mostrar el error hasta discard().
+        """
+        with self._lock:
+            bp = self._loaders.get(key)
+            if bp is None or (bp.done and bp.error is None):
+                bp = self._loaders[key] = start()
+            return bp
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._loaders.pop(key, None)
@@ -0,0 +1,92 @@
+"""
+Construcción columnar de payloads `contactinfo` para json/listsubscribe.
+
+En vez de recorrer el DataFrame con iterrows() y hacer str()/strip() celda por
+celda, se limpian las columnas mapeadas completas con operaciones de string de
+pandas y se arma el JSON de todas las filas en una sola pasada.
+"""
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# Caracteres que json.dumps escapa como \uXXXX o secuencias cortas
+_CONTROL = r"[\x00-\x1f]"
+
+# Strings respaldados por Arrow: strip/replace/concat corren en C++, no en Python
+STR_DTYPE = pd.StringDtype("pyarrow")
+
+
+def clean_column(df: pd.DataFrame, col: Optional[str]) -> pd.Series:
+    """Columna como str sin espacios a los lados; "" si no existe o no está mapeada."""
+    if not col or col not in df.columns:
+        return pd.Series("", index=df.index, dtype=STR_DTYPE)
+    return df[col].astype(STR_DTYPE).fillna("").str.strip()
+
+
+def _json_str(values: pd.Series) -> pd.Series:
+    """Equivalente vectorizado de json.dumps(v, ensure_ascii=False) para una Series de str."""
+    out = '"' + values.str.replace("\\", "\\\\", regex=False).str.replace('"', '\\"', regex=False) + '"'
+    # Los controles (\n, \t, …) son raros: para esas filas se delega en json.dumps
+    ctrl = values.str.contains(_CONTROL)
+    if ctrl.any():
+        out[ctrl] = values[ctrl].map(lambda v: json.dumps(v, ensure_ascii=False)).astype(STR_DTYPE)
+    return out
+
+
+def contact_field_columns(
+    m_email: str,
+    m_first: Optional[str] = None,
+    m_last: Optional[str] = None,
+    m_full: Optional[str] = None,
+    extra_maps: Sequence[Dict[str, str]] = (),
+) -> List[Tuple[str, str]]:
+    """Pares (campo Zoho, columna CSV) en el orden en que se arma el contactinfo."""
+    pairs = [("Contact Email", m_email)]
+    if m_first:
+        pairs.append(("First Name", m_first))
+    if m_last:
+        pairs.append(("Last Name", m_last))
+    if m_full:
+        pairs.append(("Full Name", m_full))
+    for m in extra_maps:
+        if m["zoho"] != "Contact Email":
+            pairs.append((m["zoho"], m["csv"]))
+    return pairs
+
+
+def build_contactinfo_payloads(
+    df: pd.DataFrame,
+    m_email: str,
+    m_first: Optional[str] = None,
+    m_last: Optional[str] = None,
+    m_full: Optional[str] = None,
+    extra_maps: Sequence[Dict[str, str]] = (),
+) -> pd.Series:
+    """
+    Devuelve una Series de payloads `contactinfo` ya codificados en JSON, con el
+    mismo índice que `df` pero solo para las filas con email válido.
+
+    El resultado es idéntico a armar el dict fila por fila (valores vacíos
+    omitidos, un campo Zoho repetido en extras se queda con el último valor no
+    vacío) y pasarlo por json.dumps(..., ensure_ascii=False).
+    """
+    email = clean_column(df, m_email)
+    valid = (email != "") & email.str.contains("@", regex=False)
+    if not valid.any():
+        return pd.Series([], dtype=object)
+
+    # Un mismo campo Zoho puede venir de varias columnas: gana el último no vacío
+    fields: Dict[str, pd.Series] = {}
+    for zf, cf in contact_field_columns(m_email, m_first, m_last, m_full, extra_maps):
+        col = clean_column(df, cf)[valid]
+        prev = fields.get(zf)
+        fields[zf] = col if prev is None else col.where(col != "", prev)
+
+    # "Contact Email" va primero y nunca es vacío: el resto lleva ", " delante
+    body = pd.Series("", index=email.index[valid], dtype=STR_DTYPE)
+    for k, (zf, col) in enumerate(fields.items()):
+        sep = "" if k == 0 else ", "
+        frag = sep + json.dumps(zf, ensure_ascii=False) + ": " + _json_str(col)
+        body = body + frag.where(col != "", "")
+    return ("{" + body + "}").astype(object)
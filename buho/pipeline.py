@@ -0,0 +1,463 @@
+"""
+Pipeline de importación CSV → Zoho: (crear lista) → bulk de emails nuevos →
+enriquecimiento por contacto, según la estrategia elegida por buho.planner.
+Lo que Zoho rechaza va a la cola de fallos (buho.deadletter) y se puede
+reintentar aparte con run_retry.
+
+No depende de Streamlit: informa su avance en un JobStatus (fase, contadores y
+log, que también va a `logging`) y consulta status.cancelled entre envíos. La
+app lo ejecuta en un JobRunner; el CLI (buho.cli), en primer plano.
+"""
+import itertools
+import json
+import math
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from buho.deadletter import DeadLetterStore
+from buho.emails import PreflightStats, preflight_frames
+from buho.engine import BATCH_SIZE, BULK_WORKERS, ENRICH_WORKERS, RateLimiter, SendBudget, chunked, enrich_contacts, enrich_contacts_batched, upload_batches
+from buho.fingerprints import DELTA_NEW, DELTA_SAME, DeltaStats, FingerprintStore, fingerprint
+from buho.ingest import compact_frame, content_hash, iter_csv_chunks, iter_slices
+from buho.jobs import JobStatus
+from buho.journal import STAGE_BULK, STAGE_ENRICH, ImportJournal, job_key
+from buho.payloads import build_contactinfo_payloads
+from buho.planner import STRATEGY_BULK, STRATEGY_HYBRID, STRATEGY_LABELS, STRATEGY_UPSERT, Plan, Workload, email_only_payload, is_email_only
+from buho.telemetry import STAGE, Telemetry
+from buho.zoho import ZohoClient
+
+
+@dataclass
+class ImportSpec:
+    """Todo lo que una carga necesita, independiente de la sesión de Streamlit."""
+    csv_name: str
+    source: Optional[BinaryIO]        # bytes del CSV (hash y, en streaming, lectura por chunks)
+    df: Optional[pd.DataFrame]        # columnas mapeadas ya cargadas (modo normal); None en streaming
+    encoding: Optional[str]
+    total_rows: int                   # filas del CSV (estimadas en streaming)
+    total_emails: int                 # emails válidos y únicos (estimados en streaming)
+    m_email: str
+    m_first: Optional[str] = None
+    m_last: Optional[str] = None
+    m_full: Optional[str] = None
+    extra_maps: List[Dict[str, str]] = field(default_factory=list)
+    has_full_name: bool = False
+    resume: bool = True
+    delta: bool = True
+    csv_hash: Optional[str] = None              # ingest.content_hash(source), si ya se calculó
+    enrich_batch: int = 0                       # >0: enriquecer en grupos de N contactos
+    strategy: str = STRATEGY_HYBRID             # ver buho.planner
+    workload: Optional[Workload] = None         # conteo previo (solo para el avance)
+    listkey: Optional[str] = None               # lista existente…
+    new_list: Optional[Dict[str, str]] = None   # …o {"listname", "description", "signupform"}
+    partition_col: Optional[str] = None         # fan-out: solo las filas cuya columna…
+    partition_values: List[str] = field(default_factory=list)   # …tiene uno de estos valores
+
+    @property
+    def mapped_cols(self) -> List[str]:
+        cols = [self.m_email, self.m_first, self.m_last, self.m_full] + [m["csv"] for m in self.extra_maps]
+        return list(dict.fromkeys(c for c in cols if c))
+
+    @property
+    def read_cols(self) -> List[str]:
+        """Columnas que se leen del CSV: las mapeadas y la de partición."""
+        return list(dict.fromkeys(self.mapped_cols + ([self.partition_col] if self.partition_col else [])))
+
+    @property
+    def mapping(self) -> Dict:
+        m = {"email": self.m_email, "first": self.m_first, "last": self.m_last, "full": self.m_full, "extra": self.extra_maps}
+        if self.partition_col:
+            # Otra partición del mismo CSV es otra carga (bitácora propia)
+            m["partition"] = {"col": self.partition_col, "values": sorted(self.partition_values)}
+        return m
+
+
+def spec_frames(spec: ImportSpec, stats: Optional[PreflightStats] = None) -> Iterator[pd.DataFrame]:
+    """
+    CSV completo en frames con solo las columnas mapeadas (chunks del archivo,
+    o rebanadas sin copia del df ya cargado) tras el pre-chequeo: email
+    normalizado, válido y sin repetir. Los frames conservan el índice original
+    de fila. Con partición, solo las filas de sus valores (sin espacios a los
+    lados) pasan al pre-chequeo.
+    """
+    if spec.df is None:
+        raw = iter_csv_chunks(spec.source, spec.encoding, usecols=spec.read_cols)
+    else:
+        raw = iter_slices(compact_frame(spec.df, spec.read_cols))
+    if spec.partition_col:
+        values = {v.strip() for v in spec.partition_values}
+        raw = (f[f[spec.partition_col].str.strip().isin(values)] for f in raw)
+    return preflight_frames(raw, spec.m_email, stats if stats is not None else PreflightStats())
+
+
+def delta_rows(
+    spec: ImportSpec,
+    fp_store: FingerprintStore,
+    listkey: Optional[str],
+    stats: Optional[PreflightStats] = None,
+    delta_stats: Optional[DeltaStats] = None,
+    telemetry: Optional[Telemetry] = None,
+) -> Iterator[Tuple[int, str, str, str, str]]:
+    """
+    (fila, email, payload, estado delta, fingerprint) por contacto. Sin listkey
+    (lista aún no creada) o sin modo incremental, todo es nuevo.
+
+    Con `telemetry`, mide por frame la lectura + pre-chequeo, el armado de
+    payloads y la comparación delta.
+    """
+    tele = telemetry or Telemetry(max_events=0)
+    for f in tele.timed_iter("csv + pre-chequeo", spec_frames(spec, stats)):
+        with tele.span(STAGE, "payloads"):
+            payloads = build_contactinfo_payloads(
+                f, spec.m_email, spec.m_first, spec.m_last, spec.m_full if spec.has_full_name else None, spec.extra_maps,
+            )
+            emails = f[spec.m_email].loc[payloads.index].tolist()
+            plist = payloads.tolist()
+        with tele.span(STAGE, "delta"):
+            if spec.delta and listkey:
+                statuses, fps = fp_store.diff(listkey, emails, plist)
+            else:
+                statuses, fps = [DELTA_NEW] * len(plist), [fingerprint(p) for p in plist]
+        if delta_stats is not None:
+            delta_stats.add(statuses)
+        # El índice es la posición de fila en el CSV (RangeIndex de read_csv)
+        yield from zip(payloads.index.tolist(), emails, plist, statuses, fps)
+
+
+def goes_to_bulk(spec: ImportSpec, email: str, payload: str, status: str) -> bool:
+    """
+    Solo los contactos que Zoho aún no tiene en la lista van al bulk: todos con
+    la estrategia bulk, los que no traen campos con la híbrida, ninguno con upsert.
+    """
+    if status != DELTA_NEW or spec.strategy == STRATEGY_UPSERT:
+        return False
+    return spec.strategy == STRATEGY_BULK or is_email_only(payload, email)
+
+
+def bulk_items(
+    spec: ImportSpec,
+    fp_store: FingerprintStore,
+    listkey: Optional[str],
+    stats: Optional[PreflightStats] = None,
+    telemetry: Optional[Telemetry] = None,
+) -> Iterator[Tuple[str, str]]:
+    """
+    (email, fingerprint) de los contactos que van al bulk. La huella es la de
+    lo que el bulk carga, solo el email: si la fila trae campos (estrategia
+    bulk), una carga posterior con upsert los ve como cambios y los envía.
+    """
+    if spec.strategy == STRATEGY_UPSERT:
+        return
+    for _, email, payload, status, fp in delta_rows(spec, fp_store, listkey, stats, telemetry=telemetry):
+        if goes_to_bulk(spec, email, payload, status):
+            yield email, fp if is_email_only(payload, email) else fingerprint(email_only_payload(email))
+
+
+def payload_of(contactinfo) -> str:
+    return contactinfo if isinstance(contactinfo, str) else json.dumps(contactinfo, ensure_ascii=False)
+
+
+def plan_text(plan: Plan) -> str:
+    return f"Estrategia: {plan.label} · {plan.bulk_requests} lotes + {plan.upsert_requests} upserts"
+
+
+def preflight_text(stats: PreflightStats) -> str:
+    return (
+        f"Pre-chequeo de emails: {stats.kept} válidos y únicos de {stats.rows} filas · "
+        f"{stats.invalid} inválidos · {stats.duplicates} duplicados · "
+        f"~{stats.calls_saved(BATCH_SIZE)} llamadas API ahorradas"
+    )
+
+
+def run_bulk(
+    status: JobStatus,
+    client: ZohoClient,
+    listkey: str,
+    items: Iterable[Tuple[str, str]],
+    total_emails: int,
+    journal: ImportJournal,
+    job_id: str,
+    fp_store: FingerprintStore,
+    deadletters: Optional[DeadLetterStore] = None,
+    csv_name: str = "",
+    skip_done: bool = True,
+    budget: Optional[SendBudget] = None,
+) -> int:
+    """
+    Sube los emails de `items` (email, fingerprint) en lotes y guarda las huellas
+    de los lotes confirmados; devuelve cuántos lotes hay (enviados + ya
+    confirmados antes).
+
+    Con skip_done=False no se saltan lotes por índice: sirve cuando `items` ya
+    excluye lo confirmado (modo incremental) y la numeración cambió. Los lotes
+    salen bajo el limitador de `budget`; por defecto, el de la cuenta.
+    """
+    total_batches = max(math.ceil(total_emails / BATCH_SIZE), 1)
+    done = journal.done(job_id, STAGE_BULK) if skip_done else set()
+    status.set_phase("Cargando emails en lotes…")
+    status.start_stage(STAGE_BULK)
+    status.set(bulk_total=total_batches, bulk_done=len(done), bulk_failed=0)
+    fps: Dict[int, List[Tuple[str, str]]] = {}   # lotes en vuelo: índice -> (email, fp)
+
+    def batches():
+        for i, chunk in enumerate(chunked(items, BATCH_SIZE)):
+            if i not in done:
+                fps[i] = chunk
+            yield [email for email, _ in chunk]
+
+    sent = 0
+    for i, batch, resp, err in upload_batches(client, listkey, batches(), limiter=(budget or SendBudget.of(client)).bulk, skip=done):
+        sent += 1
+        pairs = fps.pop(i)
+        if err is not None:
+            status.incr("bulk_failed")
+            status.log(f"Lote {i+1} FALLÓ: {err} — continúo…", "warning")
+            if deadletters is not None:
+                deadletters.add(job_id, listkey, csv_name, STAGE_BULK, [(None, e, json.dumps(batch), fp) for e, fp in pairs], err)
+        else:
+            journal.mark(job_id, STAGE_BULK, [i])
+            fp_store.record(listkey, pairs)
+            status.log(f"Lote {i+1}/{total_batches} OK: {resp.get('message') or resp.get('status') or resp}")
+        status.set(bulk_done=i + 1)
+        if status.cancelled:
+            break
+    journal.flush()
+    fp_store.flush()
+    if deadletters is not None:
+        deadletters.flush()
+    return sent + len(done)
+
+
+def run_enrich(
+    status: JobStatus,
+    client: ZohoClient,
+    spec: ImportSpec,
+    listkey: str,
+    journal: ImportJournal,
+    fp_store: FingerprintStore,
+    job_id: str,
+    deadletters: Optional[DeadLetterStore] = None,
+    budget: Optional[SendBudget] = None,
+) -> Tuple[int, int]:
+    status.set_phase("Enriqueciendo campos por contacto…")
+    status.start_stage(STAGE_ENRICH)
+    updated, errors = 0, 0
+    total_rows = max(spec.total_rows, 1)
+    status.set(enrich_total=total_rows, enrich_done=0, enrich_ok=0, enrich_errors=0)
+
+    # Payloads de cada frame/chunk en una pasada columnar; los workers los
+    # consumen perezosamente en el orden original de las filas
+    done_rows = journal.done(job_id, STAGE_ENRICH)
+    delta_stats = DeltaStats()
+
+    def contacts():
+        for pos, email, payload, delta, fp in delta_rows(spec, fp_store, listkey, delta_stats=delta_stats, telemetry=client.telemetry):
+            # Lo que ya entró por bulk con todos sus datos no necesita upsert
+            if delta != DELTA_SAME and pos not in done_rows and not goes_to_bulk(spec, email, payload, delta):
+                yield pos, payload, email, fp
+
+    limiter = (budget or SendBudget.of(client)).enrich
+    if spec.enrich_batch:
+        # En bloque los resultados llegan por grupo: el avance es la fila más lejana vista
+        results = enrich_contacts_batched(client, listkey, contacts(), spec.enrich_batch, limiter=limiter)
+    else:
+        results = ((item, True, err) for _, item, _resp, err in enrich_contacts(client, listkey, contacts(), limiter=limiter))
+    done_pos, fallback = 0, 0
+    for (pos, ci, email, fp), single, err in results:
+        if err is None:
+            updated += 1
+            journal.mark(job_id, STAGE_ENRICH, [pos])
+            fp_store.record(listkey, [(email, fp)])
+        else:
+            errors += 1
+            if errors == 1:
+                status.log(f"Primer contacto rechazado ({email}): {err}", "warning")
+            if deadletters is not None:
+                deadletters.add(job_id, listkey, spec.csv_name, STAGE_ENRICH, [(pos, email, payload_of(ci), fp)], err)
+        fallback += single and bool(spec.enrich_batch)
+        done_pos = max(done_pos, pos + 1)
+        status.set(enrich_done=done_pos, enrich_ok=updated, enrich_errors=errors, enrich_fallback=fallback)
+        if status.cancelled:
+            break
+    if not status.cancelled:
+        status.set(enrich_done=total_rows)
+    journal.flush()
+    fp_store.flush()
+    if deadletters is not None:
+        deadletters.flush()
+    if spec.enrich_batch and fallback:
+        status.log(f"Enriquecimiento en bloque: {fallback} contactos reintentados uno por uno", "warning")
+    if spec.delta:
+        status.log(f"Delta: {delta_stats.new} nuevos · {delta_stats.changed} con cambios · {delta_stats.same} sin cambios (omitidos)")
+    return updated, errors
+
+
+def run_import(
+    status: JobStatus,
+    client: ZohoClient,
+    spec: ImportSpec,
+    journal: ImportJournal,
+    fp_store: FingerprintStore,
+    deadletters: Optional[DeadLetterStore] = None,
+    budget: Optional[SendBudget] = None,
+) -> Dict:
+    """
+    Carga completa: (crear lista) → bulk de emails nuevos → enriquecimiento.
+    Sin `budget`, usa el de la cuenta (SendBudget.of): las cargas simultáneas
+    con el mismo cliente se reparten su límite de peticiones.
+    """
+    status.log(f"Estrategia: {STRATEGY_LABELS[spec.strategy]}")
+    budget = budget or SendBudget.of(client)
+    status.set_phase("Calculando huella del CSV…")
+    with client.telemetry.span(STAGE, "hash csv"):
+        # Antes de empezar a leer frames: en streaming el hash rebobina el
+        # mismo handle que recorren bulk_items/delta_rows
+        csv_hash = spec.csv_hash or content_hash(spec.source)
+    bulk_stats = PreflightStats()
+    # Contactos esperados en el bulk (para el avance); sin conteo previo, una cota
+    total_emails = spec.total_emails
+    if spec.strategy == STRATEGY_HYBRID and spec.workload is not None:
+        total_emails = spec.workload.email_only
+    elif spec.strategy == STRATEGY_UPSERT:
+        total_emails = 0
+    if spec.new_list:
+        status.set_phase("Creando lista en Zoho…")
+        items = bulk_items(spec, fp_store, None, bulk_stats, client.telemetry)
+        first_batch = list(itertools.islice(items, 10))
+        # Sin contactos para el bulk, la lista se crea con los primeros emails
+        # (el upsert los completa igual)
+        first_emails = [e for e, _ in first_batch] or [e for _, e, *_ in itertools.islice(delta_rows(spec, fp_store, None), 10)]
+        nl = spec.new_list
+        listkey, created = client.create_list(nl["listname"], nl.get("description", ""), first_emails, signupform=nl.get("signupform", "private"))
+        if created:
+            fp_store.record(listkey, first_batch)
+            total_emails = max(total_emails - len(first_batch), 0)
+            first_batch = []
+            status.log("Lista creada ✅")
+        else:
+            # Ya existía (p.ej. al reanudar): Zoho no agregó los primeros
+            # emails, se envían como un lote más antes del bulk
+            status.log("La lista ya existía: se usa la existente ✅")
+    else:
+        listkey = spec.listkey
+        items = bulk_items(spec, fp_store, listkey, bulk_stats, client.telemetry)
+        first_batch = []
+
+    # La estrategia cambia qué filas van a cada etapa: es parte de la clave
+    job_id = job_key(csv_hash, listkey, {**spec.mapping, "strategy": spec.strategy})
+    if spec.resume:
+        c = journal.counts(job_id)
+        if c:
+            status.log(f"Reanudando carga previa: se saltan {c.get(STAGE_BULK, 0)} lotes y {c.get(STAGE_ENRICH, 0)} filas ya confirmados por Zoho.")
+    else:
+        journal.reset(job_id)
+    journal.start(job_id, {"listkey": listkey, "csv": spec.csv_name, "mapping": spec.mapping})
+    if deadletters is not None:
+        # Lo no confirmado se reenvía en esta corrida: sus fallos previos ya no aplican
+        deadletters.discard_job(job_id)
+    if first_batch:
+        batch = [email for email, _ in first_batch]
+        try:
+            client.bulk_add_emails(listkey, batch, budget.bulk)
+            fp_store.record(listkey, first_batch)
+        except Exception as err:
+            status.log(f"Primer lote FALLÓ: {err} — continúo…", "warning")
+            if deadletters is not None:
+                deadletters.add(job_id, listkey, spec.csv_name, STAGE_BULK, [(None, e, json.dumps(batch), fp) for e, fp in first_batch], err)
+
+    if spec.strategy != STRATEGY_UPSERT:
+        # En modo incremental sobre una lista existente, lo ya confirmado sale
+        # de `items` por su huella y los índices de lote de la corrida anterior
+        # ya no corresponden
+        skip_done = not (spec.delta and not spec.new_list)
+        if not run_bulk(status, client, listkey, items, total_emails, journal, job_id, fp_store, deadletters, spec.csv_name, skip_done, budget):
+            status.log("No hay correos nuevos para cargar en bulk.")
+        if spec.df is None:
+            status.log(preflight_text(bulk_stats))
+    if status.cancelled or spec.strategy == STRATEGY_BULK:
+        return {"listkey": listkey, "updated": 0, "errors": 0}
+
+    updated, errors = run_enrich(status, client, spec, listkey, journal, fp_store, job_id, deadletters, budget)
+    status.log(f"Contactos cargados = {updated} · Errores = {errors}")
+    if errors and deadletters is not None:
+        status.log(f"{errors} contactos quedaron en la cola de fallos: se pueden reintentar o descargar.", "warning")
+    return {"listkey": listkey, "updated": updated, "errors": errors}
+
+
+def run_retry(
+    status: JobStatus,
+    client: ZohoClient,
+    deadletters: DeadLetterStore,
+    fp_store: FingerprintStore,
+    listkey: str,
+    rps: float,
+    enrich_batch: int = 0,
+    budget: Optional[SendBudget] = None,
+) -> Dict:
+    """
+    Reenvía solo los contactos en la cola de fallos de `listkey`, a lo sumo
+    `rps` peticiones/s por etapa y dentro del presupuesto de la cuenta (o de
+    `budget`), que comparte con las cargas en curso. Los emails del bulk se
+    reagrupan en lotes completos; los del enriquecimiento, con
+    enrich_batch > 0, en bloques. Lo que vuelve a fallar queda en la cola con
+    un intento más.
+    """
+    bulk_rows = {r["email"]: r for r in deadletters.pending(listkey, STAGE_BULK)}
+    enrich_rows = deadletters.pending(listkey, STAGE_ENRICH)
+    status.log(f"Reintentando {len(bulk_rows)} emails del bulk y {len(enrich_rows)} contactos del enriquecimiento a {rps:g} peticiones/s")
+    updated, errors = 0, 0
+    budget = budget or SendBudget.of(client)
+
+    if bulk_rows:
+        status.set_phase("Reintentando lotes fallidos…")
+        status.start_stage(STAGE_BULK)
+        total = math.ceil(len(bulk_rows) / BATCH_SIZE)
+        status.set(bulk_total=total, bulk_done=0, bulk_failed=0)
+        limiter = RateLimiter(rps, burst=min(BULK_WORKERS, max(int(rps), 1)), name="retry bulk", telemetry=client.telemetry, parent=budget.bulk)
+        for i, batch, resp, err in upload_batches(client, listkey, chunked(list(bulk_rows), BATCH_SIZE), limiter=limiter):
+            rows = [bulk_rows[e] for e in batch]
+            if err is None:
+                deadletters.resolve(listkey, STAGE_BULK, batch)
+                fp_store.record(listkey, [(r["email"], r["fp"]) for r in rows])
+                updated += len(batch)
+            else:
+                errors += len(batch)
+                status.incr("bulk_failed")
+                for r in rows:
+                    deadletters.add(r["job_id"], listkey, r["csv"], STAGE_BULK, [(None, r["email"], json.dumps(batch), r["fp"])], err)
+            status.set(bulk_done=i + 1)
+            if status.cancelled:
+                break
+
+    if enrich_rows and not status.cancelled:
+        status.set_phase("Reintentando contactos fallidos…")
+        status.start_stage(STAGE_ENRICH)
+        status.set(enrich_total=len(enrich_rows), enrich_done=0, enrich_ok=0, enrich_errors=0)
+        by_email = {r["email"]: r for r in enrich_rows}
+        items = ((r["row"], r["payload"], r["email"], r["fp"]) for r in enrich_rows)
+        limiter = RateLimiter(rps, burst=min(ENRICH_WORKERS, max(int(rps), 1)), name="retry enrich", telemetry=client.telemetry, parent=budget.enrich)
+        if enrich_batch:
+            results = enrich_contacts_batched(client, listkey, items, enrich_batch, limiter=limiter)
+        else:
+            results = ((item, True, err) for _, item, _resp, err in enrich_contacts(client, listkey, items, limiter=limiter))
+        done = 0
+        for (_pos, _ci, email, fp), _single, err in results:
+            r = by_email[email]
+            if err is None:
+                deadletters.resolve(listkey, STAGE_ENRICH, [email])
+                fp_store.record(listkey, [(email, fp)])
+                updated += 1
+            else:
+                errors += 1
+                deadletters.add(r["job_id"], listkey, r["csv"], STAGE_ENRICH, [(r["row"], email, r["payload"], fp)], err)
+            done += 1
+            status.set(enrich_done=done, enrich_ok=updated, enrich_errors=errors)
+            if status.cancelled:
+                break
+
+    deadletters.flush()
+    fp_store.flush()
+    status.log(f"Reintento: {updated} contactos cargados · {errors} siguen fallando")
+    return {"listkey": listkey, "updated": updated, "errors": errors}
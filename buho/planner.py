@@ -0,0 +1,146 @@
+"""
+Planificador de la carga: elige cómo llegar a Zoho con menos peticiones/tiempo.
+
+json/listsubscribe ya suscribe el contacto a la lista, así que pasar primero
+por addlistsubscribersinbulk solo se justifica para filas sin campos aparte
+del email. Estrategias:
+
+- bulk:   solo email, en lotes de BATCH_SIZE (el mapeo no aporta campos).
+- upsert: una sola pasada de upsert (uno por contacto o en bloque) para todos.
+- hybrid: bulk para las filas sin campos y upsert para las que traen campos.
+
+La estimación usa las tasas y workers de buho.engine y, si hay, la latencia
+observada por endpoint (ZohoHttp.endpoint_stats).
+"""
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from buho import engine
+from buho.fingerprints import DELTA_NEW, DELTA_SAME
+from buho.zoho import BATCH_UPSERT_PATH
+
+STRATEGY_BULK   = "bulk"
+STRATEGY_UPSERT = "upsert"
+STRATEGY_HYBRID = "hybrid"
+
+STRATEGY_LABELS = {
+    STRATEGY_BULK: "Solo emails en lotes (bulk)",
+    STRATEGY_UPSERT: "Una sola pasada de upsert",
+    STRATEGY_HYBRID: "Híbrida: bulk sin campos + upsert con campos",
+}
+
+# Latencia supuesta (s) por petición si aún no hay mediciones
+LATENCY_GUESS = {"bulk": 0.35, "upsert": 0.30, "batch": 0.80}
+
+_ENDPOINTS = {
+    "bulk": "POST /api/v1.1/addlistsubscribersinbulk",
+    "upsert": "POST /api/v1.1/json/listsubscribe",
+    "batch": f"POST /api/v1.1/{BATCH_UPSERT_PATH}",
+}
+
+
+@dataclass
+class Workload:
+    """Lo que hay que enviar: contactos a sincronizar y cuántos traen solo el email."""
+    contacts: int = 0        # nuevos o con cambios (los idénticos se omiten)
+    new: int = 0             # de esos, nuevos en la lista
+    email_only: int = 0      # de los nuevos, sin campos aparte del email
+    same: int = 0            # idénticos a lo ya cargado (no se envían)
+    estimated: bool = False  # True si se extrapoló de una muestra
+
+    def scaled(self, factor: float) -> "Workload":
+        return Workload(*(round(getattr(self, k) * factor) for k in ("contacts", "new", "email_only", "same")), estimated=True)
+
+
+@dataclass
+class Plan:
+    strategy: str
+    bulk_requests: int
+    upsert_requests: int
+    seconds: float
+    alternatives: List["Plan"] = field(default_factory=list)
+
+    @property
+    def requests(self) -> int:
+        return self.bulk_requests + self.upsert_requests
+
+    @property
+    def label(self) -> str:
+        return STRATEGY_LABELS[self.strategy]
+
+
+def email_only_payload(email: str) -> str:
+    """Payload de un contacto sin más campo que el email: lo único que carga el bulk."""
+    return '{"Contact Email": ' + json.dumps(email, ensure_ascii=False) + "}"
+
+
+def is_email_only(payload: str, email: str) -> bool:
+    """El payload no trae más campo que el email (todas las demás celdas vacías)."""
+    return payload == email_only_payload(email)
+
+
+def workload_from_rows(rows: Iterable[tuple]) -> Workload:
+    """Cuenta filas (fila, email, payload, estado delta, fingerprint) de pipeline.delta_rows."""
+    w = Workload()
+    for _, email, payload, status, _ in rows:
+        if status == DELTA_SAME:
+            w.same += 1
+            continue
+        w.contacts += 1
+        if status == DELTA_NEW:
+            w.new += 1
+            w.email_only += is_email_only(payload, email)
+    return w
+
+
+def observed_latency(endpoint_stats: List[Dict]) -> Dict[str, float]:
+    """p50 medido (s) por tipo de petición, a partir de ZohoHttp.endpoint_stats()."""
+    by_name = {row["endpoint"]: row for row in endpoint_stats}
+    return {kind: by_name[ep]["p50_ms"] / 1000 for kind, ep in _ENDPOINTS.items() if ep in by_name and by_name[ep]["requests"] >= 5}
+
+
+def _stage_seconds(requests: int, rps: float, workers: int, latency: float) -> float:
+    # Techo: la tasa del limitador o lo que dan `workers` peticiones en vuelo
+    return requests / max(min(rps, workers / max(latency, 1e-3)), 1e-6)
+
+
+def estimate(strategy: str, w: Workload, enrich_batch: int = 0, latency: Optional[Dict[str, float]] = None) -> Plan:
+    lat = {**LATENCY_GUESS, **(latency or {})}
+    if strategy == STRATEGY_BULK:
+        bulk_contacts, upsert_contacts = w.new, 0
+    elif strategy == STRATEGY_UPSERT:
+        bulk_contacts, upsert_contacts = 0, w.contacts
+    else:
+        bulk_contacts, upsert_contacts = w.email_only, w.contacts - w.email_only
+    bulk_req = math.ceil(bulk_contacts / engine.BATCH_SIZE)
+    if enrich_batch:
+        upsert_req, upsert_lat = math.ceil(upsert_contacts / enrich_batch), lat["batch"]
+    else:
+        upsert_req, upsert_lat = upsert_contacts, lat["upsert"]
+    seconds = (
+        _stage_seconds(bulk_req, engine.BULK_RPS, engine.BULK_WORKERS, lat["bulk"])
+        + _stage_seconds(upsert_req, engine.ENRICH_RPS, engine.ENRICH_WORKERS, upsert_lat)
+    )
+    return Plan(strategy, bulk_req, upsert_req, seconds)
+
+
+def plan_import(w: Workload, enrich_batch: int = 0, latency: Optional[Dict[str, float]] = None) -> Plan:
+    """
+    La estrategia más rápida (a igual tiempo, la de menos peticiones; a igual
+    costo, la más simple). bulk solo es candidata si ninguna fila trae campos:
+    si no, se perderían datos.
+    """
+    candidates = [STRATEGY_UPSERT, STRATEGY_HYBRID]
+    if w.contacts == w.email_only:
+        candidates.insert(0, STRATEGY_BULK)
+    plans = [estimate(s, w, enrich_batch, latency) for s in candidates]
+    best = min(plans, key=lambda p: (round(p.seconds, 1), p.requests))
+    best.alternatives = plans
+    return best
+
+
+def duration_text(seconds: float) -> str:
+    s = int(round(seconds))
+    return f"{s // 3600:d}:{s % 3600 // 60:02d}:{s % 60:02d}"
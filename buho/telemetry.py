@@ -0,0 +1,109 @@
+"""
+Telemetría de carga: un registro por petición HTTP y por etapa del pipeline,
+más acumuladores de tiempo dormido (limitador de tasa, back-off de 429).
+
+Responde "¿en qué se va el tiempo?": lectura del CSV, armado de payloads,
+red, esperas por 429 o sleeps del limitador. Los eventos se guardan en un
+buffer acotado y se exportan en crudo (CSV/JSON) para análisis offline.
+"""
+import csv
+import io
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+
+EVENTS_MAX = 200_000   # eventos guardados (los más viejos se descartan)
+
+HTTP  = "http"    # una petición: endpoint, status, bytes, duración
+STAGE = "stage"   # trabajo local del pipeline: csv, payloads, delta…
+WAIT  = "wait"    # esperas: sleep del limitador, pausa por 429
+
+FIELDS = ["ts", "kind", "name", "seconds", "status", "bytes_sent", "bytes_recv", "thread"]
+
+
+class Telemetry:
+    """
+    Registro thread-safe de eventos (ts, tipo, nombre, duración, …) y de
+    totales por (tipo, nombre), que no se pierden al rotar el buffer.
+    """
+
+    def __init__(self, max_events: int = EVENTS_MAX):
+        self._events: deque = deque(maxlen=max_events)
+        self._totals: Dict[tuple, List[float]] = {}   # (tipo, nombre) -> [n, segundos, bytes]
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def record(
+        self,
+        kind: str,
+        name: str,
+        seconds: float,
+        status: Optional[int] = None,
+        bytes_sent: int = 0,
+        bytes_recv: int = 0,
+        ts: Optional[float] = None,
+    ) -> None:
+        ev = (ts if ts is not None else time.time() - seconds, kind, name, seconds, status,
+              bytes_sent, bytes_recv, threading.current_thread().name)
+        with self._lock:
+            self._events.append(ev)
+            t = self._totals.setdefault((kind, name), [0, 0.0, 0])
+            t[0] += 1
+            t[1] += seconds
+            t[2] += bytes_sent
+
+    @contextmanager
+    def span(self, kind: str, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, time.perf_counter() - t0)
+
+    def timed_iter(self, name: str, items: Iterable) -> Iterator:
+        """Itera `items` midiendo cuánto tarda cada next() (p.ej. leer y parsear un chunk)."""
+        it = iter(items)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.record(STAGE, name, time.perf_counter() - t0)
+            yield item
+
+    # --- lectura ---
+    def events(self, since: float = 0.0) -> List[Dict]:
+        with self._lock:
+            evs = [e for e in self._events if e[0] >= since] if since else list(self._events)
+        return [dict(zip(FIELDS, e)) for e in evs]
+
+    def totals(self) -> List[Dict]:
+        """Una fila por (tipo, nombre): eventos, segundos acumulados y bytes enviados."""
+        with self._lock:
+            items = sorted(self._totals.items())
+        return [
+            {"kind": k, "name": n, "count": int(c), "seconds": round(s, 3), "bytes_sent": int(b)}
+            for (k, n), (c, s, b) in items
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._events.clear()
+            self._totals.clear()
+            self.started = time.time()
+
+    # --- exportación ---
+    def to_csv(self, since: float = 0.0) -> bytes:
+        buf = io.StringIO()
+        w = csv.DictWriter(buf, fieldnames=FIELDS)
+        w.writeheader()
+        w.writerows(self.events(since))
+        return buf.getvalue().encode("utf-8")
+
+    def to_json(self, since: float = 0.0) -> bytes:
+        return json.dumps({"events": self.events(since), "totals": self.totals()}, ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,363 @@
+"""
+Cliente de la API de Zoho Campaigns (v1.1 y Email API v2), sin dependencias de UI.
+
+Agrupa credenciales, pool HTTP, caché de token y catálogo de una cuenta. La
+app de Streamlit crea uno por proceso; el CLI y los scripts, el suyo.
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import requests
+
+from buho.auth import TokenCache
+from buho.catalog import CatalogCache, ListDirectory
+from buho.http import ZohoHttp
+from buho.pagination import iter_pages
+from buho.telemetry import WAIT
+
+log = logging.getLogger(__name__)
+
+RETRY_429_MAX       = 5     # reintentos exponenciales ante 429
+LISTS_PAGE_SIZE     = 200   # listas por página en getmailinglists
+TEMPLATES_PAGE_SIZE = 200   # plantillas por página en emailapi/v2/templates
+# Import multi-contacto (contactinfo = arreglo JSON). SIN VERIFICAR: no figura
+# en la API pública de Campaigns y tanto la ruta como la respuesta
+# ({"imported": n, "failed": [emails]}) solo se probaron contra
+# benchmarks/mock_zoho.py. Queda apagado salvo BUHO_BATCH_UPSERT=1; si está
+# apagado, la cuenta no lo expone (404/405) o la respuesta no cuadra con lo
+# enviado, el motor vuelve a json/listsubscribe.
+BATCH_UPSERT_PATH   = "json/importcontacts"
+BATCH_UPSERT_ENABLED = os.environ.get("BUHO_BATCH_UPSERT") == "1"
+
+# Catálogo mínimo si Zoho no deja leer contact/allfields
+MIN_FIELDS = {"Contact Email", "First Name", "Last Name", "Full Name", "Title", "Job Title"}
+
+_JSON_ACCEPT = {"Accept": "application/json"}
+_FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+
+
+class BatchUnsupported(RuntimeError):
+    """La cuenta no acepta el import multi-contacto (BATCH_UPSERT_PATH)."""
+
+
+class ZohoRejected(RuntimeError):
+    """
+    Zoho respondió 2xx pero con {"status": "error"} en el cuerpo (listkey
+    inválido, email rechazado…). Lleva la respuesta, como los HTTPError, para
+    que la cola de fallos guarde status y cuerpo.
+    """
+
+    def __init__(self, what: str, data: Dict, response: requests.Response):
+        super().__init__(f"Zoho rechazó {what}: {data}")
+        self.response = response
+
+
+def _accepted(r: requests.Response, what: str) -> Dict:
+    """Cuerpo JSON de una respuesta que Zoho aceptó; si no, HTTPError o ZohoRejected."""
+    r.raise_for_status()
+    data = r.json()
+    if data.get("status") != "success":
+        raise ZohoRejected(what, data, r)
+    return data
+
+
+class ZohoClient:
+    """
+    Helpers de la API de Zoho Campaigns para una cuenta. Es thread-safe: los
+    workers de carga comparten el mismo cliente (y su pool de conexiones).
+
+    Los limitadores de tasa (RateLimiter de buho.engine) son opcionales: sin
+    ellos, un 429 se reintenta con espera exponencial en el propio hilo.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        refresh_token: str,
+        dc: str = "com",
+        http: Optional[ZohoHttp] = None,
+        catalog: Optional[CatalogCache] = None,
+        accounts_url: Optional[str] = None,
+        campaigns_url: Optional[str] = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.accounts = accounts_url or f"https://accounts.zoho.{dc}"
+        campaigns = campaigns_url or f"https://campaigns.zoho.{dc}"
+        self.base = f"{campaigns}/api/v1.1"
+        self.emailapi_base = f"{campaigns}/emailapi/v2"
+        self.http = http or ZohoHttp()
+        self.catalog = catalog or CatalogCache(path=None)
+        self.tokens = TokenCache(self.fetch_access_token)
+        self.telemetry = self.http.telemetry
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "ZohoClient":
+        """Credenciales desde ZOHO_CLIENT_ID, ZOHO_CLIENT_SECRET, ZOHO_REFRESH_TOKEN y ZOHO_DC (y URLs opcionales)."""
+        missing = [v for v in ("ZOHO_CLIENT_ID", "ZOHO_CLIENT_SECRET", "ZOHO_REFRESH_TOKEN") if not os.environ.get(v)]
+        if missing:
+            raise RuntimeError(f"Faltan variables de entorno: {', '.join(missing)}")
+        return cls(
+            os.environ["ZOHO_CLIENT_ID"],
+            os.environ["ZOHO_CLIENT_SECRET"],
+            os.environ["ZOHO_REFRESH_TOKEN"],
+            dc=os.environ.get("ZOHO_DC", "com"),
+            accounts_url=os.environ.get("ZOHO_ACCOUNTS_URL"),     # p.ej. el servidor simulado
+            campaigns_url=os.environ.get("ZOHO_CAMPAIGNS_URL"),   # de benchmarks/mock_zoho.py
+            **kwargs,
+        )
+
+    # =========================
+    # Autenticación
+    # =========================
+    def fetch_access_token(self) -> Tuple[str, int]:
+        """Canjea el refresh token. Devuelve (access_token, expires_in)."""
+        r = self.http.request(
+            "POST",
+            f"{self.accounts}/oauth/v2/token",
+            headers=_FORM,
+            data={
+                "refresh_token": self.refresh_token,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "grant_type": "refresh_token",
+            },
+            timeout=30,
+        )
+        r.raise_for_status()
+        data = r.json()
+        tok = data.get("access_token")
+        if not tok:
+            raise RuntimeError(f"No access_token: {data}")
+        return tok, int(data.get("expires_in", 3600))
+
+    def get_access_token(self) -> str:
+        return self.tokens.get()
+
+    def _authed(self, method: str, url: str, headers: Optional[Dict] = None, **kwargs) -> requests.Response:
+        """
+        Petición autenticada con el token cacheado. Ante un 401 invalida ese token
+        y reintenta una vez con uno nuevo (si otro hilo ya lo renovó, lo reutiliza).
+        """
+        for attempt in range(2):
+            tok = self.tokens.get()
+            h = {"Authorization": f"Zoho-oauthtoken {tok}", **(headers or {})}
+            r = self.http.request(method, url, headers=h, **kwargs)
+            if r.status_code != 401 or attempt:
+                return r
+            self.tokens.invalidate(tok)
+
+    # =========================
+    # Catálogos (campos y listas)
+    # =========================
+    def get_all_fields(self) -> Set[str]:
+        names = self.catalog.get_or_load("fields", self._fetch_all_fields)
+        if names is None:
+            return set(MIN_FIELDS)
+        return set(names)
+
+    def _fetch_all_fields(self) -> Optional[List[str]]:
+        r = self._authed("GET", f"{self.base}/contact/allfields?type=json", timeout=30)
+        if r.status_code == 401:
+            return None   # no se cachea: get_all_fields devuelve el catálogo mínimo
+        r.raise_for_status()
+        data = r.json()
+        names = set()
+        for f in data.get("response", {}).get("fieldnames", {}).get("fieldname", []):
+            dn = f.get("DISPLAY_NAME")
+            if dn:
+                names.add(dn)
+        if not names:
+            names = {"Contact Email", "First Name", "Last Name", "Full Name"}
+        return sorted(names)
+
+    def get_mailing_lists(self) -> ListDirectory:
+        """Todas las listas (todas las páginas), cacheadas e indexadas por nombre."""
+        return self.catalog.get_or_load(
+            "lists:all",
+            lambda: [it for page in iter_pages(self.fetch_mailing_lists_page, LISTS_PAGE_SIZE) for it in page],
+            wrap=ListDirectory,
+        )
+
+    def fetch_mailing_lists_page(self, start: int, range_: int) -> List[Dict]:
+        url = f"{self.base}/getmailinglists?resfmt=JSON&fromindex={start}&range={range_}&sort=asc"
+        r = self._authed("GET", url, timeout=30)
+        r.raise_for_status()
+        data = r.json()
+        items = data.get("list_of_details", [])
+        return [{"listname": it.get("listname"), "listkey": it.get("listkey"), "is_public": it.get("is_public")} for it in items]
+
+    # =========================
+    # Listas y contactos
+    # =========================
+    def create_list_and_contacts(self, listname: str, description: str, emails_first_batch: List[str], signupform: str = "private") -> str:
+        """Crea la lista con `emails_first_batch`; si ya existía, agrega esos emails en bulk. Devuelve el listkey."""
+        listkey, created = self.create_list(listname, description, emails_first_batch, signupform)
+        if not created and emails_first_batch:
+            self.bulk_add_emails(listkey, emails_first_batch)
+        return listkey
+
+    def create_list(self, listname: str, description: str, emails_first_batch: List[str], signupform: str = "private") -> Tuple[str, bool]:
+        """
+        (listkey, creada). Si la lista ya existía (código 2205) devuelve su
+        listkey con creada=False: en ese caso Zoho NO agregó `emails_first_batch`.
+        """
+        params = {
+            "resfmt": "JSON",
+            "listname": listname,
+            "signupform": signupform,   # "private" recomendado (evita confirmaciones)
+            "mode": "newlist",
+            "listdescription": description or "",
+            "emailids": ",".join(emails_first_batch) if emails_first_batch else "",
+        }
+        r = self._authed("POST", f"{self.base}/addlistandcontacts", headers=_FORM, data=params, timeout=60)
+        if r.status_code == 400:
+            raise RuntimeError(f"Error al crear lista (HTTP 400): {r.text}")
+        r.raise_for_status()
+        data = r.json()
+
+        if data.get("status") == "success" and data.get("listkey"):
+            self.catalog.invalidate("lists:")
+            return data["listkey"], True
+
+        if data.get("code") in ("2205", 2205):
+            # La lista ya existe; si el directorio cacheado no la tiene, está viejo
+            lk = self.get_mailing_lists().lookup(listname)
+            if not lk:
+                self.catalog.invalidate("lists:")
+                lk = self.get_mailing_lists().lookup(listname)
+            if lk:
+                return lk, False
+
+        raise RuntimeError(f"No se pudo obtener listkey. Respuesta: {data}")
+
+    def bulk_add_emails(self, listkey: str, emails: List[str], limiter=None) -> Dict:
+        assert 1 <= len(emails) <= 10
+        payload = {"listkey": listkey, "resfmt": "JSON", "emailids": json.dumps(emails)}
+        retries = 0
+        while True:
+            if limiter:
+                limiter.acquire()
+            r = self._authed("POST", f"{self.base}/addlistsubscribersinbulk", headers=_FORM, data=payload, timeout=60)
+            if r.status_code == 429 and retries < RETRY_429_MAX:
+                wait = 2 ** retries
+                retries += 1
+                self.telemetry.record(WAIT, "429 bulk", wait, 429, ts=time.time())
+                if limiter:
+                    # Pausa global: frena a TODOS los workers, no solo a este
+                    limiter.throttle(wait)
+                else:
+                    log.warning("[429] Rate limit. Reintentando en %ss…", wait)
+                    time.sleep(wait)
+                continue
+            if limiter and 200 <= r.status_code < 300:
+                limiter.success()
+            if r.status_code == 401:
+                raise RuntimeError("401 en bulk aun con token renovado; revisa credenciales.")
+            return _accepted(r, "el lote")
+
+    def upsert_contact_fields(self, listkey: str, contactinfo: Union[Dict, str], limiter=None) -> Dict:
+        # contactinfo puede venir ya codificado (ver buho.payloads)
+        if not isinstance(contactinfo, str):
+            contactinfo = json.dumps(contactinfo, ensure_ascii=False)
+        payload = {"listkey": listkey, "resfmt": "JSON", "contactinfo": contactinfo}
+        r = self._post_limited("json/listsubscribe", payload, limiter)
+        return _accepted(r, "el contacto")
+
+    def upsert_contacts(self, listkey: str, contactinfos: Sequence[Union[Dict, str]], limiter=None) -> List[int]:
+        """
+        Varios contactos (mismo conjunto de campos) en una sola petición.
+        Devuelve los índices de `contactinfos` que Zoho rechazó; el resto quedó
+        actualizado. Lanza BatchUnsupported si está desactivado
+        (BATCH_UPSERT_ENABLED) o la cuenta no expone el endpoint, y ValueError
+        si la respuesta no da cuenta de cada contacto enviado.
+        """
+        if not BATCH_UPSERT_ENABLED:
+            raise BatchUnsupported("desactivado (BUHO_BATCH_UPSERT=1 para probarlo)")
+        infos = [ci if isinstance(ci, str) else json.dumps(ci, ensure_ascii=False) for ci in contactinfos]
+        payload = {"listkey": listkey, "resfmt": "JSON", "contactinfo": "[" + ",".join(infos) + "]"}
+        r = self._post_limited(BATCH_UPSERT_PATH, payload, limiter)
+        if r.status_code in (404, 405):
+            raise BatchUnsupported(f"HTTP {r.status_code} en {BATCH_UPSERT_PATH}")
+        data = _accepted(r, "el import")
+        # Formato sin verificar: si no cuadra, mejor reenviar uno por uno que
+        # dar por cargadas filas que quizá no entraron
+        failed, imported = data.get("failed"), data.get("imported")
+        if not isinstance(failed, list) or imported != len(infos) - len(failed):
+            raise ValueError(f"respuesta inesperada de {BATCH_UPSERT_PATH}: {str(data)[:200]}")
+        failed = set(failed)   # emails rechazados individualmente
+        if not failed:
+            return []
+        return [i for i, ci in enumerate(infos) if json.loads(ci).get("Contact Email") in failed]
+
+    def _post_limited(self, path: str, payload: Dict, limiter=None) -> requests.Response:
+        """POST bajo el limitador; un 429 pausa a todos los workers y se reintenta."""
+        retries = 0
+        while True:
+            if limiter:
+                limiter.acquire()
+            r = self._authed("POST", f"{self.base}/{path}", headers=_FORM, data=payload, timeout=60)
+            if r.status_code == 429 and limiter and retries < RETRY_429_MAX:
+                self.telemetry.record(WAIT, "429 enrich", 2 ** retries, 429, ts=time.time())
+                limiter.throttle(2 ** retries)
+                retries += 1
+                continue
+            if limiter and 200 <= r.status_code < 300:
+                limiter.success()
+            return r
+
+    # =========================
+    # Email API (Templates v2)
+    # =========================
+    def list_templates(self, start_index: int = 1, end_index: int = 200) -> List[Dict]:
+        """
+        Devuelve [{'template_id','template_name', ...}] o lanza Exception con detalle
+        si la respuesta no es JSON (p.ej. HTML por 401/403/404).
+        """
+        url = f"{self.emailapi_base}/templates?start_index={start_index}&end_index={end_index}"
+        r = self._authed("GET", url, headers=_JSON_ACCEPT, timeout=30)
+
+        # Guarda datos útiles para depurar
+        status = r.status_code
+        ctype = r.headers.get("Content-Type", "")
+
+        if not r.ok:
+            # Levanta error pero con cuerpo adjunto
+            raise RuntimeError(f"HTTP {status} {url}\nContent-Type: {ctype}\nBody:\n{r.text[:800]}")
+
+        # Intenta parsear JSON; si no, muestra "body" crudo
+        try:
+            data = r.json()
+        except ValueError:
+            raise RuntimeError(f"Respuesta no-JSON (HTTP {status}, {ctype}). Body (primeros 800 chars):\n{r.text[:800]}")
+
+        templates = data.get("templates", [])
+        return templates or []
+
+    def fetch_templates_page(self, start: int, size: int) -> List[Dict]:
+        return self.list_templates(start_index=start, end_index=start + size - 1)
+
+    def get_all_templates(self) -> List[Dict]:
+        """Todas las plantillas (todas las páginas), cacheadas."""
+        return self.catalog.get_or_load(
+            "templates:all",
+            lambda: [t for page in iter_pages(self.fetch_templates_page, TEMPLATES_PAGE_SIZE) for t in page],
+        )
+
+    def get_template_html(self, template_id: str) -> str:
+        url = f"{self.emailapi_base}/templates/{template_id}"
+        r = self._authed("GET", url, headers=_JSON_ACCEPT, timeout=30)
+        status = r.status_code
+        ctype = r.headers.get("Content-Type", "")
+        if not r.ok:
+            raise RuntimeError(f"HTTP {status} {url}\nContent-Type: {ctype}\nBody:\n{r.text[:800]}")
+        try:
+            info = r.json()
+        except ValueError:
+            raise RuntimeError(f"Respuesta no-JSON (HTTP {status}, {ctype}). Body:\n{r.text[:800]}")
+        return info.get("content") if info.get("content_type") == "html" else ""
@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# buho lee BUHO_DATA_DIR al importarse: las pruebas nunca tocan .buho/ del repo
+os.environ["BUHO_DATA_DIR"] = tempfile.mkdtemp(prefix="buho-tests-")
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from buho.deadletter import DeadLetterStore  # noqa: E402
+from buho.fingerprints import FingerprintStore  # noqa: E402
+from buho.http import ZohoHttp  # noqa: E402
+from buho.ingest import detect_encoding, estimate_rows  # noqa: E402
+from buho.jobs import JobStatus  # noqa: E402
+from buho.journal import ImportJournal  # noqa: E402
+from buho.pipeline import ImportSpec  # noqa: E402
+from buho.zoho import ZohoClient  # noqa: E402
+from mock_zoho import MockConfig, MockZoho  # noqa: E402
+
+
+@pytest.fixture
+def mock():
+    with MockZoho(MockConfig(seed=1)) as m:
+        yield m
+
+
+@pytest.fixture
+def client(mock):
+    return ZohoClient("test", "secret", "refresh", accounts_url=mock.url, campaigns_url=mock.url, http=ZohoHttp(retries=0))
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return ImportJournal(str(tmp_path / "journal.sqlite"))
+
+
+@pytest.fixture
+def fp_store(tmp_path):
+    return FingerprintStore(str(tmp_path / "fingerprints.sqlite"))
+
+
+@pytest.fixture
+def deadletters(tmp_path):
+    return DeadLetterStore(str(tmp_path / "deadletter.sqlite"))
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """write_csv(filas, nombre) -> ruta; filas = [(email, nombre)], nombre vacío = solo email."""
+    def write(rows, name="contactos.csv"):
+        path = tmp_path / name
+        path.write_text("email,nombre\n" + "".join(f"{e},{n}\n" for e, n in rows), encoding="utf-8")
+        return str(path)
+    return write
+
+
+def make_spec(path: str, listkey: str, **kwargs) -> ImportSpec:
+    """ImportSpec en streaming (como la CLI) para `path`, mapeando email y nombre."""
+    fields = dict(
+        csv_name=os.path.basename(path), source=path, df=None, encoding=detect_encoding(path),
+        total_rows=estimate_rows(path), total_emails=0, m_email="email", m_first="nombre", listkey=listkey,
+    )
+    fields.update(kwargs)
+    return ImportSpec(**fields)
+
+
+def new_status(title: str = "prueba") -> JobStatus:
+    status = JobStatus(title)
+    status.started = 0.0
+    return status
+
+
+def requests_to(mock: MockZoho, endpoint: str) -> int:
+    """Peticiones que recibió el servidor simulado en un endpoint (p.ej. "listsubscribe")."""
+    return sum(n for ep, n in mock.stats()["requests"].items() if ep.endswith(endpoint))
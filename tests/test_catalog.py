@@ -0,0 +1,64 @@
+import threading
+import time
+
+from buho.catalog import CatalogCache
+
+
+def test_slow_load_does_not_block_other_keys():
+    cache = CatalogCache()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return ["lento"]
+
+    t = threading.Thread(target=cache.get_or_load, args=("listas", slow))
+    t.start()
+    started.wait(5)
+    t0 = time.monotonic()
+    assert cache.get_or_load("campos", lambda: ["rápido"]) == ["rápido"]
+    assert cache.peek("listas") is None
+    assert time.monotonic() - t0 < 1
+    release.set()
+    t.join()
+    assert cache.peek("listas") == ["lento"]
+
+
+def test_concurrent_loads_of_one_key_hit_the_loader_once():
+    cache = CatalogCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"v": 1}
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.get_or_load("k", loader))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert out == [{"v": 1}] * 8
+
+
+def test_invalidate_during_load_is_not_cached():
+    cache = CatalogCache()
+    started, release = threading.Event(), threading.Event()
+
+    def stale():
+        started.set()
+        release.wait(5)
+        return ["sin la lista nueva"]
+
+    out = []
+    t = threading.Thread(target=lambda: out.append(cache.get_or_load("listas", stale)))
+    t.start()
+    started.wait(5)
+    cache.invalidate("listas")   # p.ej. se creó una lista mientras cargaba
+    release.set()
+    t.join()
+    assert out == [["sin la lista nueva"]]
+    assert cache.peek("listas") is None
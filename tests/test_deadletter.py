@@ -0,0 +1,63 @@
+import csv
+import io
+
+from buho.journal import STAGE_BULK, STAGE_ENRICH
+from buho.pipeline import run_import, run_retry
+from conftest import make_spec, new_status, requests_to
+
+
+def test_add_counts_attempts_and_resolve_removes(deadletters):
+    err = RuntimeError("falló")
+    deadletters.add("job", "lk", "a.csv", STAGE_ENRICH, [(3, "a@x.com", "{}", "fp")], err)
+    deadletters.add("job", "lk", "a.csv", STAGE_ENRICH, [(3, "a@x.com", "{}", "fp")], err)
+    deadletters.add("job", "lk", "a.csv", STAGE_BULK, [(None, "b@x.com", "[]", "fp")], err)
+    pending = deadletters.pending("lk")
+    assert [(r["stage"], r["email"], r["attempts"]) for r in pending] == [(STAGE_BULK, "b@x.com", 1), (STAGE_ENRICH, "a@x.com", 2)]
+    assert deadletters.summary()[0]["enrich"] == 1
+
+    deadletters.resolve("lk", STAGE_ENRICH, ["a@x.com"])
+    assert [r["email"] for r in deadletters.pending("lk")] == ["b@x.com"]
+    rows = list(csv.DictReader(io.StringIO(deadletters.to_csv("lk").decode("utf-8"))))
+    assert [(r["email"], r["error"]) for r in rows] == [("b@x.com", "RuntimeError: falló")]
+
+
+def test_failed_rows_are_queued_and_retry_drives_them(mock, client, journal, fp_store, deadletters, write_csv):
+    path = write_csv([(f"u{i}@example.com", f"Nombre {i}" if i % 2 else "") for i in range(30)])
+    listkey = client.create_list_and_contacts("dlq", "", [])
+    mock.state.config.p500 = 1.0
+    first = run_import(new_status(), client, make_spec(path, listkey), journal, fp_store, deadletters)
+    assert first["updated"] == 0 and first["errors"] == 15
+    pending = deadletters.pending(listkey)
+    assert sum(r["stage"] == STAGE_BULK for r in pending) == 15
+    assert sum(r["stage"] == STAGE_ENRICH for r in pending) == 15
+    assert all(r["http_status"] == 500 for r in pending)
+    assert fp_store.count(listkey) == 0
+
+    mock.state.config.p500 = 0.0
+    upserts = requests_to(mock, "listsubscribe")
+    retry = run_retry(new_status(), client, deadletters, fp_store, listkey, rps=50)
+    assert retry == {"listkey": listkey, "updated": 30, "errors": 0}
+    assert deadletters.pending(listkey) == []
+    assert fp_store.count(listkey) == 30
+    # Solo los fallidos: nada se reenvía del CSV completo
+    assert requests_to(mock, "listsubscribe") - upserts == 15
+    assert mock.stats()["lists"][listkey]["contacts"] == 30
+
+
+def test_error_bodies_are_queued_and_retried(mock, client, journal, fp_store, deadletters, write_csv):
+    # Zoho rechaza con HTTP 200 y {"status": "error"}: la lista aún no existe
+    path = write_csv([(f"u{i}@example.com", f"Nombre {i}" if i % 2 else "") for i in range(20)])
+    listkey = "mocklist-tarde"
+    first = run_import(new_status(), client, make_spec(path, listkey), journal, fp_store, deadletters)
+    assert first == {"listkey": listkey, "updated": 0, "errors": 10}
+    pending = deadletters.pending(listkey)
+    assert len(pending) == 20
+    assert {(r["http_status"], "2502" in r["body"]) for r in pending} == {(200, True)}
+    assert fp_store.count(listkey) == 0
+
+    with mock.state.lock:
+        mock.state.lists[listkey] = {"listname": "tarde", "is_public": False, "contacts": {}}
+    retry = run_retry(new_status(), client, deadletters, fp_store, listkey, rps=50)
+    assert retry == {"listkey": listkey, "updated": 20, "errors": 0}
+    assert deadletters.pending(listkey) == []
+    assert mock.stats()["lists"][listkey]["contacts"] == 20
@@ -0,0 +1,57 @@
+from buho.fingerprints import DELTA_CHANGED, DELTA_NEW, DELTA_SAME, DeltaStats, fingerprint
+from buho.pipeline import delta_rows, run_import
+from buho.planner import STRATEGY_BULK, STRATEGY_UPSERT
+from conftest import make_spec, new_status, requests_to
+
+
+def test_diff_classifies_new_changed_same(fp_store):
+    fp_store.record("lk", [("a@x.com", fingerprint("A")), ("b@x.com", fingerprint("B"))])
+    statuses, fps = fp_store.diff("lk", ["a@x.com", "b@x.com", "c@x.com"], ["A", "B2", "C"])
+    assert statuses == [DELTA_SAME, DELTA_CHANGED, DELTA_NEW]
+    assert fps == [fingerprint(p) for p in ("A", "B2", "C")]
+    # Las huellas son por lista
+    assert fp_store.diff("otra", ["a@x.com"], ["A"])[0] == [DELTA_NEW]
+
+
+def test_delta_rows_without_listkey_is_all_new(fp_store, write_csv):
+    path = write_csv([("a@x.com", "Ana"), ("b@x.com", "")])
+    fp_store.record("lk", [("a@x.com", "cualquiera")])
+    stats = DeltaStats()
+    rows = list(delta_rows(make_spec(path, None), fp_store, None, delta_stats=stats))
+    assert [(r[0], r[1], r[3]) for r in rows] == [(0, "a@x.com", DELTA_NEW), (1, "b@x.com", DELTA_NEW)]
+    assert (stats.new, stats.changed, stats.same) == (2, 0, 0)
+
+
+def test_second_import_sends_only_changes(mock, client, journal, fp_store, write_csv):
+    rows = [(f"u{i}@example.com", f"Nombre {i}" if i % 2 else "") for i in range(20)]
+    listkey = client.create_list_and_contacts("delta", "", [])
+    run_import(new_status(), client, make_spec(write_csv(rows, "v1.csv"), listkey), journal, fp_store)
+    bulk, upserts = requests_to(mock, "addlistsubscribersinbulk"), requests_to(mock, "listsubscribe")
+
+    # Otro CSV (otra carga en la bitácora): 2 nombres cambiados, 1 email nuevo
+    rows[1] = (rows[1][0], "Cambiado")
+    rows[2] = (rows[2][0], "Ahora con nombre")
+    rows.append(("nuevo@example.com", ""))
+    spec = make_spec(write_csv(rows, "v2.csv"), listkey)
+    stats = DeltaStats()
+    list(delta_rows(spec, fp_store, listkey, delta_stats=stats))
+    assert (stats.new, stats.changed, stats.same) == (1, 2, 18)
+
+    result = run_import(new_status(), client, spec, journal, fp_store)
+    assert result["updated"] == 2
+    assert requests_to(mock, "listsubscribe") - upserts == 2
+    assert requests_to(mock, "addlistsubscribersinbulk") - bulk == 1
+
+
+def test_bulk_strategy_leaves_fields_for_a_later_upsert(mock, client, journal, fp_store, write_csv):
+    rows = [(f"u{i}@example.com", f"Nombre {i}") for i in range(20)]
+    path = write_csv(rows)
+    listkey = client.create_list_and_contacts("solo-bulk", "", [])
+    run_import(new_status(), client, make_spec(path, listkey, strategy=STRATEGY_BULK), journal, fp_store)
+    assert mock.stats()["lists"][listkey]["contacts"] == 20
+
+    # El bulk no cargó los nombres: para el upsert son cambios, no filas iguales
+    result = run_import(new_status(), client, make_spec(path, listkey, strategy=STRATEGY_UPSERT), journal, fp_store)
+    assert result["updated"] == 20
+    contacts = mock.state.lists[listkey]["contacts"]
+    assert all(contacts[e].get("First Name") == n for e, n in rows)
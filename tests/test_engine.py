@@ -0,0 +1,126 @@
+import json
+import random
+import threading
+import time
+
+import pytest
+import requests
+
+import buho.zoho as zoho
+import mock_zoho
+from buho.engine import RateLimiter, SendBudget, enrich_contacts_batched, run_pool
+from buho.http import ZohoHttp
+from buho.zoho import BATCH_UPSERT_PATH, ZohoClient
+from conftest import requests_to
+
+
+def test_run_pool_keeps_input_order_and_reports_errors():
+    def work(n):
+        time.sleep(random.random() / 100)
+        if n % 7 == 3:
+            raise ValueError(n)
+        return n * n
+
+    out = list(run_pool(work, range(50), workers=8))
+    assert [i for i, *_ in out] == list(range(50))
+    for i, item, result, err in out:
+        assert item == i
+        if i % 7 == 3:
+            assert result is None and isinstance(err, ValueError)
+        else:
+            assert result == i * i and err is None
+
+
+def test_run_pool_consumes_items_lazily():
+    produced = []
+
+    def items():
+        for n in range(1000):
+            produced.append(n)
+            yield n
+
+    gen = run_pool(lambda n: n, items(), workers=4)
+    next(gen)
+    assert len(produced) <= 2 * 4
+    gen.close()
+
+
+def test_run_pool_stops_sending_when_consumer_stops():
+    calls = []
+    lock = threading.Lock()
+
+    def work(n):
+        with lock:
+            calls.append(n)
+        time.sleep(0.05)
+        return n
+
+    gen = run_pool(work, range(100), workers=2)
+    assert next(gen)[0] == 0
+    gen.close()   # como st.stop() o una cancelación a mitad de carga
+    time.sleep(0.3)
+    # Los encolados se cancelan; solo terminan los que ya estaban corriendo
+    assert len(calls) <= 2 * 2
+
+
+def test_send_budget_is_one_per_client(client, mock):
+    assert SendBudget.of(client) is SendBudget.of(client)
+    other = ZohoClient("otra", "secret", "refresh", accounts_url=mock.url, campaigns_url=mock.url, http=ZohoHttp())
+    assert SendBudget.of(other) is not SendBudget.of(client)
+
+
+def test_child_limiter_forwards_to_parent():
+    parent = RateLimiter(100, burst=1)
+    child = RateLimiter(100, burst=1, parent=parent)
+    child.acquire()
+    assert parent._tokens < 1   # el token también salió del padre
+    for _ in range(3):          # 429 de peticiones en vuelo: una sola reducción
+        child.throttle(0.01)
+    assert parent.rate == child.rate == 50
+    time.sleep(0.02)
+    child.success()
+    assert parent.rate == child.rate == 60
+
+
+def http_error(status_code: int) -> requests.HTTPError:
+    resp = requests.Response()
+    resp.status_code = status_code
+    return requests.HTTPError(f"HTTP {status_code}", response=resp)
+
+
+@pytest.mark.parametrize("failure, batch_calls", [
+    (ValueError("respuesta no JSON"), 1),   # se repetiría: se deja el import multi-contacto
+    (http_error(400), 1),
+    (http_error(500), 4),                   # pasajero: solo ese grupo va por contacto
+])
+def test_batched_enrich_falls_back_to_single(monkeypatch, mock, client, failure, batch_calls):
+    listkey = client.create_list_and_contacts("bloque", "", [])
+    calls = []
+
+    def upsert_contacts(listkey, infos, limiter=None):
+        calls.append(len(infos))
+        raise failure
+
+    monkeypatch.setattr(client, "upsert_contacts", upsert_contacts)
+    contacts = [(i, json.dumps({"Contact Email": f"u{i}@example.com", "First Name": "Ana"}), f"u{i}@example.com", "fp") for i in range(40)]
+    out = list(enrich_contacts_batched(client, listkey, contacts, batch_size=10, workers=1))
+    assert len(calls) == batch_calls
+    assert len(out) == 40 and all(single and err is None for _, single, err in out)
+    assert mock.stats()["lists"][listkey]["contacts"] == 40
+
+
+def test_unverified_batch_endpoint_is_off_and_checked(monkeypatch, mock, client):
+    listkey = client.create_list_and_contacts("bloque-sin-verificar", "", [])
+    contacts = [(i, json.dumps({"Contact Email": f"u{i}@example.com", "First Name": "Ana"}), f"u{i}@example.com", "fp") for i in range(20)]
+    monkeypatch.setattr(zoho, "BATCH_UPSERT_ENABLED", False)
+    out = list(enrich_contacts_batched(client, listkey, contacts[:10], batch_size=10, workers=1))
+    assert all(single and err is None for _, single, err in out)
+    assert requests_to(mock, BATCH_UPSERT_PATH) == 0
+
+    # Activado, pero la respuesta no dice qué filas entraron: nada se da por cargado sin confirmar
+    monkeypatch.setattr(zoho, "BATCH_UPSERT_ENABLED", True)
+    monkeypatch.setitem(mock_zoho._ROUTES, ("POST", f"/api/v1.1/{BATCH_UPSERT_PATH}"), lambda state, p, path: (200, {"status": "success", "code": "0"}))
+    out = list(enrich_contacts_batched(client, listkey, contacts[10:], batch_size=10, workers=1))
+    assert requests_to(mock, BATCH_UPSERT_PATH) == 1
+    assert all(single and err is None for _, single, err in out)
+    assert mock.stats()["lists"][listkey]["contacts"] == 20
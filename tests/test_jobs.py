@@ -0,0 +1,22 @@
+import time
+
+from buho.jobs import JobStatus
+
+
+def test_stage_elapsed_counts_from_the_stage_not_the_job():
+    job = JobStatus("carga")
+    job.started = time.time() - 60   # creación de lista, hash, bulk…
+    assert job.stage_elapsed("enrich") == 0.0
+    job.start_stage("enrich")
+    assert job.stage_elapsed("enrich") < 1
+
+
+def test_stage_starts_with_the_first_part():
+    job = JobStatus("fan-out")
+    first, second = job.add_part("Norte"), job.add_part("Sur")
+    first.start_stage("bulk")
+    time.sleep(0.05)
+    second.start_stage("bulk")
+    assert job.stage_started("bulk") == first.stage_started("bulk")
+    job.finished = first.stage_started("bulk") + 10
+    assert job.stage_elapsed("bulk") == 10
@@ -0,0 +1,81 @@
+import buho.engine as engine
+from buho.ingest import CSV_CHUNK_ROWS
+from buho.journal import STAGE_BULK, STAGE_ENRICH, ImportJournal, job_key
+from buho.pipeline import run_import
+from conftest import make_spec, new_status, requests_to
+
+
+def test_job_key_depends_on_csv_list_and_mapping():
+    base = job_key("h1", "lk", {"email": "email"})
+    assert base == job_key("h1", "lk", {"email": "email"})
+    assert base != job_key("h2", "lk", {"email": "email"})
+    assert base != job_key("h1", "otra", {"email": "email"})
+    assert base != job_key("h1", "lk", {"email": "correo"})
+
+
+def test_marks_survive_reopen_and_reset_forgets(tmp_path):
+    path = str(tmp_path / "journal.sqlite")
+    j = ImportJournal(path, flush_every=1000, flush_secs=3600)
+    j.start("job", {"csv": "a.csv"})
+    j.mark("job", STAGE_BULK, [0, 1, 2])
+    j.mark("job", STAGE_ENRICH, [5])
+    j.mark("job", STAGE_BULK, [1])   # repetido: no cuenta dos veces
+    j.flush()
+
+    reopened = ImportJournal(path)
+    assert reopened.done("job", STAGE_BULK) == {0, 1, 2}
+    assert reopened.counts("job") == {STAGE_BULK: 3, STAGE_ENRICH: 1}
+    reopened.reset("job")
+    assert reopened.counts("job") == {}
+
+
+def test_resume_skips_what_zoho_confirmed(mock, client, journal, fp_store, write_csv):
+    # Mitad solo email (bulk), mitad con nombre (enriquecimiento)
+    path = write_csv([(f"u{i}@example.com", f"Nombre {i}" if i % 2 else "") for i in range(40)])
+    listkey = client.create_list_and_contacts("resume", "", [])
+    first = run_import(new_status(), client, make_spec(path, listkey, delta=False), journal, fp_store)
+    assert first == {"listkey": listkey, "updated": 20, "errors": 0}
+    bulk, upserts = requests_to(mock, "addlistsubscribersinbulk"), requests_to(mock, "listsubscribe")
+    assert (bulk, upserts) == (2, 20)
+
+    again = run_import(new_status(), client, make_spec(path, listkey, delta=False), journal, fp_store)
+    assert again["updated"] == 0
+    assert requests_to(mock, "addlistsubscribersinbulk") == bulk
+    assert requests_to(mock, "listsubscribe") == upserts
+
+    # resume=False olvida la bitácora y reenvía todo
+    run_import(new_status(), client, make_spec(path, listkey, delta=False, resume=False), journal, fp_store)
+    assert requests_to(mock, "addlistsubscribersinbulk") == 2 * bulk
+    assert requests_to(mock, "listsubscribe") == 2 * upserts
+
+
+def test_resume_resends_only_failures(mock, client, journal, fp_store, write_csv):
+    path = write_csv([(f"u{i}@example.com", f"Nombre {i}") for i in range(60)])
+    listkey = client.create_list_and_contacts("resume-fallos", "", [])
+    mock.state.config.p500 = 0.3
+    first = run_import(new_status(), client, make_spec(path, listkey, delta=False), journal, fp_store)
+    assert first["errors"] > 0
+    assert first["updated"] + first["errors"] == 60
+
+    mock.state.config.p500 = 0.0
+    before = requests_to(mock, "listsubscribe")
+    again = run_import(new_status(), client, make_spec(path, listkey, delta=False), journal, fp_store)
+    assert again == {"listkey": listkey, "updated": first["errors"], "errors": 0}
+    assert requests_to(mock, "listsubscribe") - before == first["errors"]
+
+
+def test_streaming_handle_is_read_once(monkeypatch, mock, client, journal, fp_store, write_csv):
+    # La CLI pasa un solo handle abierto y sin csv_hash: calcular el hash no
+    # debe rebobinar la lectura que ya empezó para crear la lista. Hace falta
+    # más de un chunk para que el lector tenga algo pendiente.
+    monkeypatch.setattr(engine, "BULK_RPS", 10_000.0)
+    n = CSV_CHUNK_ROWS + 5_000
+    path = write_csv([(f"u{i}@example.com", "") for i in range(n)])
+    with open(path, "rb") as source:
+        spec = make_spec(path, None, source=source, new_list={"listname": "stream"})
+        status = new_status()
+        result = run_import(status, client, spec, journal, fp_store)
+    assert any(f"{n} válidos y únicos de {n} filas" in msg for *_, msg in status.tail(50))
+    assert mock.stats()["lists"][result["listkey"]]["contacts"] == n
+    assert requests_to(mock, "addlistsubscribersinbulk") == (n - 10) // 10   # los 10 primeros, al crear la lista
+    assert fp_store.count(result["listkey"]) == n
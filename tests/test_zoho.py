@@ -0,0 +1,50 @@
+import pytest
+
+from buho.ingest import content_hash
+from buho.journal import job_key
+from buho.pipeline import run_import
+from buho.zoho import ZohoRejected
+from conftest import make_spec, new_status
+
+
+def test_error_bodies_raise(client):
+    # Zoho responde 200 con {"status": "error"} ante un listkey inválido
+    with pytest.raises(ZohoRejected) as exc:
+        client.bulk_add_emails("BOGUS", ["a@example.com"])
+    assert exc.value.response.status_code == 200
+    with pytest.raises(ZohoRejected):
+        client.upsert_contact_fields("BOGUS", {"Contact Email": "a@example.com", "First Name": "Ana"})
+
+
+def test_import_into_invalid_list_confirms_nothing(client, journal, fp_store, write_csv):
+    path = write_csv([(f"u{i}@example.com", f"Nombre {i}" if i % 2 else "") for i in range(20)])
+    spec = make_spec(path, "BOGUS")
+    status = new_status()
+    result = run_import(status, client, spec, journal, fp_store)
+    assert result == {"listkey": "BOGUS", "updated": 0, "errors": 10}
+    assert status.counters()["bulk_failed"] == 1
+    assert fp_store.count("BOGUS") == 0
+    # Nada quedó como confirmado: reanudar vuelve a enviarlo todo
+    job_id = job_key(content_hash(path), "BOGUS", {**spec.mapping, "strategy": spec.strategy})
+    assert journal.counts(job_id) == {}
+
+
+def test_existing_list_reports_not_created(mock, client):
+    listkey, created = client.create_list("dup", "", ["a@example.com"])
+    assert created
+    assert client.create_list("dup", "", ["b@example.com"]) == (listkey, False)
+    assert mock.stats()["lists"][listkey]["contacts"] == 1
+    # create_list_and_contacts agrega igual los emails a la lista existente
+    assert client.create_list_and_contacts("dup", "", ["b@example.com"]) == listkey
+    assert mock.stats()["lists"][listkey]["contacts"] == 2
+
+
+def test_new_list_that_already_exists_loads_first_batch(mock, client, journal, fp_store, write_csv):
+    # "Crear lista nueva" con un nombre que ya existe (código 2205), p.ej. al reanudar
+    listkey = client.create_list_and_contacts("ya-existe", "", [])
+    path = write_csv([(f"u{i}@example.com", "") for i in range(30)])
+    for _ in range(2):
+        result = run_import(new_status(), client, make_spec(path, None, new_list={"listname": "ya-existe"}), journal, fp_store)
+        assert result["listkey"] == listkey
+        assert mock.stats()["lists"][listkey]["contacts"] == 30
+        assert fp_store.count(listkey) == 30